@@ -0,0 +1,351 @@
+import os
+import sys
+import json
+import asyncio
+import hashlib
+from typing import Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Depends, Request, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, and_
+from sqlalchemy.orm import defer
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import (
+    SessionLocal, Recording, Transcript, RECORDING_FAILED, init_db, find_transcript_by_hash,
+    get_segments_by_index, get_segments_in_range,
+)
+from job_queue import enqueue_job, get_job, count_jobs_ahead, pipeline_config
+from config_service import get_settings
+from search_service import search_transcripts, search_segments
+from metrics import render_prometheus
+import model_registry
+
+# 헤드리스 수집/조회 API (휴대폰, 스크립트에서 직접 녹음 업로드)
+# 실행: uvicorn api:app --host 0.0.0.0 --port 8000
+UPLOAD_DIR = "data/temp"
+OUTPUT_FOLDER = "data/storage"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a")
+API_TOKEN = os.getenv("MEMORA_API_TOKEN") # 설정되어 있으면 X-API-Token 헤더 필수
+MAX_PAGE_SIZE = 200
+
+app = FastAPI(title="MemoRa API")
+
+@app.on_event("startup")
+def _startup():
+    init_db()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+def _check_token(x_api_token: Optional[str] = Header(None)):
+    if API_TOKEN and x_api_token != API_TOKEN:
+        raise HTTPException(status_code=401, detail="유효하지 않은 API 토큰")
+
+# --- 1. 업로드 (청크 단위로 디스크에 기록) ---
+def _reserve_path(filename):
+    """
+    업로드 파일명을 정리하고, 같은 이름의 파일이 이미 있으면 번호를 붙여 자리를 확보합니다.
+    """
+    name = os.path.basename(filename or "")
+    stem, ext = os.path.splitext(name)
+    if not stem or ext.lower() not in AUDIO_EXTENSIONS:
+        raise HTTPException(status_code=415, detail=f"지원하지 않는 파일 형식: {name} ({', '.join(AUDIO_EXTENSIONS)})")
+    for n in range(1000):
+        candidate = os.path.join(UPLOAD_DIR, name if n == 0 else f"{stem}_{n}{ext}")
+        try:
+            # O_EXCL: 동시에 같은 이름으로 올라온 업로드끼리 덮어쓰지 않도록
+            os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return candidate
+        except FileExistsError:
+            continue
+    raise HTTPException(status_code=409, detail="같은 이름의 업로드가 너무 많습니다.")
+
+async def _save_stream(chunks, filename):
+    """
+    비동기 청크 스트림을 .part 파일에 기록하면서 SHA-256을 계산하고, 완료되면 최종 이름으로 옮깁니다.
+    (감시 폴더는 .part 파일을 무시하므로 쓰는 도중에 작업이 등록되지 않음)
+    """
+    final_path = _reserve_path(filename)
+    part_path = final_path + ".part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(part_path, "wb") as f:
+            async for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                await run_in_threadpool(f.write, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="빈 파일입니다.")
+        os.replace(part_path, final_path)
+    except BaseException:
+        for path in (part_path, final_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return final_path, digest.hexdigest(), size
+
+def _submit(path, content_hash, size):
+    """
+    이미 분석된 내용이면 기존 결과를, 아니면 분석 작업을 등록하여 반환합니다.
+    """
+    existing = find_transcript_by_hash(content_hash)
+    if existing and existing[1]:
+        os.remove(path)
+        return {"duplicate": True, "recording_id": existing[0], "transcript_id": existing[1]}
+
+    job_id = enqueue_job("analyze", {
+        "input_path": path,
+        "output_folder": OUTPUT_FOLDER,
+        "content_hash": content_hash,
+        "config": pipeline_config(get_settings()),
+    })
+    return {"duplicate": False, "job_id": job_id, "filename": os.path.basename(path), "size": size}
+
+async def _iter_upload(file: UploadFile):
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+@app.post("/recordings", status_code=202, dependencies=[Depends(_check_token)])
+async def upload_recording(file: UploadFile = File(...)):
+    """
+    multipart/form-data 업로드
+    """
+    path, content_hash, size = await _save_stream(_iter_upload(file), file.filename)
+    return await run_in_threadpool(_submit, path, content_hash, size)
+
+@app.put("/recordings/{filename}", status_code=202, dependencies=[Depends(_check_token)])
+async def upload_recording_raw(filename: str, request: Request):
+    """
+    요청 본문을 그대로 파일로 받는 업로드 (multipart 파싱/임시 버퍼 없이 스트리밍)
+    예: curl -T memo.m4a http://host:8000/recordings/memo.m4a
+    """
+    path, content_hash, size = await _save_stream(request.stream(), filename)
+    return await run_in_threadpool(_submit, path, content_hash, size)
+
+# --- 2. 작업 상태 ---
+@app.get("/jobs/{job_id}", dependencies=[Depends(_check_token)])
+def job_status(job_id: int):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "stage": job["result"].get("stage"),
+        "queue_position": count_jobs_ahead(job_id) if job["status"] == "queued" else 0,
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "recording_id": job["result"].get("recording_id"),
+        "transcript_id": job["result"].get("transcript_id"),
+        "checkpoint": job["result"].get("checkpoint"),
+    }
+
+# --- 3. 기록 조회 (keyset 페이지네이션) ---
+def _transcript_summary(rec, trans):
+    return {
+        "recording_id": rec.id,
+        "transcript_id": trans.id if trans else None,
+        "filename": rec.filename,
+        "created_at": rec.created_at,
+        "file_size_mb": rec.file_size,
+        "duration": rec.duration,
+        "processed": rec.processed == 1,
+        "failed": rec.processed == RECORDING_FAILED,
+        "version": trans.version if trans else None,
+        "summary": trans.summary if trans else None,
+    }
+
+@app.get("/recordings", dependencies=[Depends(_check_token)])
+def list_recordings(cursor: Optional[int] = None, limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    최신 녹음부터 반환합니다. 다음 페이지는 응답의 next_cursor를 cursor로 넘겨 조회합니다.
+    """
+    db = SessionLocal()
+    try:
+        latest = (
+            db.query(Transcript.recording_id, func.max(Transcript.version).label("version"))
+            .group_by(Transcript.recording_id)
+            .subquery()
+        )
+        query = (
+            db.query(Recording, Transcript)
+            .outerjoin(latest, latest.c.recording_id == Recording.id)
+            .outerjoin(Transcript, and_(Transcript.recording_id == latest.c.recording_id, Transcript.version == latest.c.version))
+            .options(defer(Transcript.full_text), defer(Transcript.segments_json))
+        )
+        if cursor:
+            query = query.filter(Recording.id < cursor)
+        rows = query.order_by(Recording.id.desc()).limit(limit + 1).all()
+        items = [_transcript_summary(rec, trans) for rec, trans in rows[:limit]]
+        next_cursor = rows[limit - 1][0].id if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+    finally:
+        db.close()
+
+@app.get("/transcripts/{transcript_id}", dependencies=[Depends(_check_token)])
+def get_transcript(transcript_id: int, include_text: bool = False):
+    db = SessionLocal()
+    try:
+        trans = db.get(Transcript, transcript_id)
+        if trans is None:
+            raise HTTPException(status_code=404, detail="기록을 찾을 수 없습니다.")
+        rec = db.get(Recording, trans.recording_id)
+        result = {**_transcript_summary(rec, trans), "tags": trans.tags, "updated_at": trans.updated_at}
+        if include_text:
+            result["full_text"] = trans.full_text
+        return result
+    finally:
+        db.close()
+
+@app.get("/transcripts/{transcript_id}/segments", dependencies=[Depends(_check_token)])
+def list_segments(
+    transcript_id: int,
+    after: int = Query(-1, ge=-1, description="이 순번 다음 세그먼트부터"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    start: Optional[float] = Query(None, ge=0, description="시간 구간 조회 시작(초)"),
+    end: Optional[float] = Query(None, gt=0, description="시간 구간 조회 끝(초)"),
+):
+    """
+    순번 기준 페이지(after/limit) 또는 시간 구간(start/end)으로 세그먼트를 조회합니다.
+    """
+    if start is not None or end is not None:
+        segments = get_segments_in_range(transcript_id, start or 0.0, end if end is not None else float("inf"))
+        return {"items": segments[:limit], "truncated": len(segments) > limit}
+    segments = get_segments_by_index(transcript_id, after + 1, after + limit)
+    next_after = segments[-1]["index"] if len(segments) == limit else None
+    return {"items": segments, "next_after": next_after}
+
+@app.get("/search", dependencies=[Depends(_check_token)])
+def search(q: str, limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE)):
+    recordings = search_transcripts(q, limit=limit)
+    hits = search_segments(q, [r["transcript_id"] for r in recordings], limit=MAX_PAGE_SIZE) if recordings else []
+    return {"recordings": recordings, "segments": hits}
+
+# --- 4. 실시간 변환 (16kHz mono PCM 스트림 -> partial/final 세그먼트) ---
+def _open_live_session(pcm_format, language, save):
+    from worker import get_model_args
+    from autotune import apply_profile
+    from streaming_stt import LiveSession
+    model = model_registry.get_model(get_model_args(apply_profile(get_settings(), live=True)))
+    return LiveSession(model, pcm_format=pcm_format, language=language, save=save, output_folder=OUTPUT_FOLDER)
+
+def _finish_live_session(session):
+    # 실패하면 finish()가 저장 모드 기록을 RECORDING_FAILED로 표시하고 예외를 다시 던짐
+    return session.finish(pipeline_config(get_settings()))
+
+@app.websocket("/live")
+async def live_transcribe(
+    websocket: WebSocket, format: str = "s16le", language: Optional[str] = "ko", save: bool = False, token: Optional[str] = None,
+):
+    """
+    바이너리 프레임으로 PCM을 보내면 {"type": "partial"|"final", start, end, text}를 JSON으로 돌려줍니다.
+    텍스트 프레임 "end"를 보내면 남은 세그먼트와 {"type": "done", ...}을 보내고 연결을 닫습니다.
+    save=true면 변환 결과와 오디오를 일반 기록으로 저장합니다.
+    """
+    if API_TOKEN and (websocket.headers.get("x-api-token") or token) != API_TOKEN:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        session = await run_in_threadpool(_open_live_session, format, language, save)
+    except ValueError as e:
+        await websocket.close(code=1003, reason=str(e))
+        return
+
+    queue = asyncio.Queue()
+    connected = True
+
+    async def _reader():
+        nonlocal connected
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    connected = False
+                    break
+                if message.get("bytes"):
+                    await queue.put(message["bytes"])
+                elif (message.get("text") or "").strip() == "end":
+                    break
+        except WebSocketDisconnect:
+            connected = False
+        await queue.put(None)
+
+    async def _send(events):
+        for event in events:
+            if connected:
+                await websocket.send_json(event)
+
+    reader = asyncio.create_task(_reader())
+    try:
+        with model_registry.hold():
+            ended = False
+            while not ended:
+                # 디코딩하는 동안 쌓인 프레임은 한 번에 넣어 처리 지연이 누적되지 않도록 함
+                chunks = [await queue.get()]
+                while not queue.empty():
+                    chunks.append(queue.get_nowait())
+                ended = None in chunks
+                data = b"".join(c for c in chunks if c)
+                if data:
+                    events = await run_in_threadpool(session.feed, data)
+                    try:
+                        await _send(events)
+                    except (WebSocketDisconnect, RuntimeError):
+                        connected = False
+            reader.cancel()
+
+            # 연결이 끊겨도 저장 모드면 지금까지 받은 내용으로 기록을 완료
+            if not connected and not save:
+                return
+            events, result = await run_in_threadpool(_finish_live_session, session)
+    except BaseException:
+        # 저장 모드 기록이 '변환 진행 중'으로 남지 않도록 실패 처리 (취소된 태스크에서도 실행되도록 동기 호출)
+        session.abort()
+        raise
+    if connected:
+        await _send(events + [{"type": "done", **(result or {})}])
+        await websocket.close()
+
+@app.post("/live", dependencies=[Depends(_check_token)])
+async def live_transcribe_chunked(request: Request, format: str = "s16le", language: Optional[str] = "ko", save: bool = False):
+    """
+    chunked 요청 본문으로 PCM을 받아 이벤트를 NDJSON으로 스트리밍합니다.
+    예: ffmpeg -i mic -f s16le -ac 1 -ar 16000 - | curl -T - -X POST http://host:8000/live
+    """
+    try:
+        session = await run_in_threadpool(_open_live_session, format, language, save)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    async def _events():
+        try:
+            with model_registry.hold():
+                async for chunk in request.stream():
+                    if chunk:
+                        for event in await run_in_threadpool(session.feed, chunk):
+                            yield json.dumps(event, ensure_ascii=False) + "\n"
+                events, result = await run_in_threadpool(_finish_live_session, session)
+        except BaseException:
+            # 클라이언트가 끊거나 변환이 실패하면 저장 모드 기록을 실패로 표시
+            session.abort()
+            raise
+        for event in events + [{"type": "done", **(result or {})}]:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+# --- 5. 지표 (Prometheus scrape) ---
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("MEMORA_API_PORT", "8000")))
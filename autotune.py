@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import time
+import difflib
+import platform
+import argparse
+import resource
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Whisper 성능 자동 튜닝
+# 이 서버에서 기준 클립으로 (정밀도, 스레드 수, 워커 수, beam 크기) 조합을 직접 측정하고,
+# 정확도가 기준 결과와 크게 다르지 않은 조합 중 단일 변환 지연(RTF)이 가장 낮은 것을 SystemConfig에 프로필로 저장합니다.
+# 분석 워커는 한 번에 한 파일만 변환하므로 num_workers=1 조합(best)을, 여러 세션이 한 모델을 공유하는
+# 실시간/API 경로는 동시 처리량까지 고려한 조합(live)을 적용합니다 (whisper_autotune이 켜져 있을 때).
+#   python autotune.py --clip data/storage/meeting_optimized.mp3 --seconds 60
+#   python autotune.py --threads 2,4 --beams 1,5 --dry-run
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILE_KEY_PREFIX = "_whisper_profile:" # + 모델:장치
+REFERENCE_SECONDS = 60
+MIN_SIMILARITY = 0.9 # 기준(가장 정밀한 설정) 대비 단어 일치율 하한
+COMPUTE_TYPES = {"cpu": ("int8", "int8_float32", "float32"), "cuda": ("int8_float16", "float16"), "auto": ("int8", "float16")}
+# 정밀도 순서 (기준 결과는 가장 정밀한 정밀도 + 가장 큰 beam)
+PRECISION_ORDER = ("int8", "int8_float32", "int8_float16", "float16", "float32")
+LIVE_MAX_SLOWDOWN = 1.2 # live 조합: 단일 변환 RTF가 best 대비 이 배수 이내인 조합 중 동시 처리량이 가장 좋은 것
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or None
+
+def host_fingerprint():
+    """
+    프로필이 측정된 하드웨어인지 판별하는 값 (다른 서버로 옮기면 프로필을 쓰지 않음)
+    컨테이너마다 호스트 이름이 다르므로 이름 대신 CPU 정보를 사용 (UI/워커 컨테이너가 같은 프로필을 인식)
+    """
+    return {"machine": platform.machine(), "cpu": _cpu_model(), "cpu_count": os.cpu_count()}
+
+def profile_key(model, device):
+    return f"{PROFILE_KEY_PREFIX}{model}:{device}"
+
+# --- 1. 프로필 조회/적용 ---
+def load_profile(model, device):
+    from database import get_setting
+    value = get_setting(profile_key(model, device))
+    return json.loads(value) if value else None
+
+def uses_profile_compute(config):
+    """
+    정밀도가 'auto'(기본값)일 때만 프로필의 정밀도를 따르고, 직접 고른 값은 그대로 둡니다.
+    """
+    return config.get("whisper_compute", "auto") == "auto"
+
+def apply_profile(config, live=False):
+    """
+    자동 튜닝이 켜져 있고 이 호스트에서 측정한 프로필이 있으면 정밀도/스레드/워커/beam을 덮어쓴 설정을 반환합니다.
+    정밀도는 설정이 'auto'일 때만 덮어씁니다.
+    live=False(분석 작업)는 항상 num_workers=1, live=True(실시간/API)는 프로필의 live 조합을 사용합니다.
+    """
+    if not config.get("whisper_autotune", True):
+        return config
+    model, device = config.get("whisper_model", "base"), config.get("whisper_device", "cpu")
+    try:
+        profile = load_profile(model, device)
+    except Exception as e:
+        print(f"⚠️ 튜닝 프로필 조회 실패: {e}")
+        return config
+    if not profile or profile.get("host") != host_fingerprint():
+        return config
+    best = profile.get("live", profile["best"]) if live else profile["best"]
+    return {
+        **config,
+        "whisper_compute": best["compute_type"] if uses_profile_compute(config) else config["whisper_compute"],
+        "whisper_cpu_threads": best["cpu_threads"],
+        "whisper_num_workers": best["num_workers"] if live else 1,
+        "beam_size": best["beam_size"],
+    }
+
+# --- 2. 측정 (조합마다 새 프로세스: 모델 메모리와 peak RSS가 섞이지 않도록) ---
+def _measure(model, device, candidate, audio, queue):
+    try:
+        from faster_whisper import WhisperModel
+        started = time.perf_counter()
+        whisper = WhisperModel(
+            model, device=device, compute_type=candidate["compute_type"],
+            cpu_threads=candidate["cpu_threads"], num_workers=candidate["num_workers"],
+        )
+        load_seconds = time.perf_counter() - started
+
+        def _run(_):
+            segments, _info = whisper.transcribe(audio, beam_size=candidate["beam_size"], vad_filter=False)
+            return " ".join(seg.text.strip() for seg in segments)
+
+        _run(None) # 워밍업 (첫 호출의 초기화 비용 제외)
+        audio_seconds = audio.size / 16000
+        # 순위 기준: 변환 하나가 끝나는 데 걸리는 시간 (분석 작업은 한 번에 한 파일)
+        started = time.perf_counter()
+        text = _run(None)
+        rtf = (time.perf_counter() - started) / audio_seconds
+        # num_workers > 1이면 동시 변환 처리량도 측정 (실시간/API 경로의 live 조합 선택에만 사용)
+        throughput_rtf = rtf
+        if candidate["num_workers"] > 1:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=candidate["num_workers"]) as pool:
+                list(pool.map(_run, range(candidate["num_workers"])))
+            throughput_rtf = (time.perf_counter() - started) / (audio_seconds * candidate["num_workers"])
+
+        queue.put({
+            "rtf": round(rtf, 4),
+            "throughput_rtf": round(throughput_rtf, 4),
+            "load_seconds": round(load_seconds, 2),
+            # Linux의 ru_maxrss는 KB 단위
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "text": text,
+        })
+    except Exception as e:
+        queue.put({"error": str(e)})
+
+def measure(model, device, candidate, audio, timeout=1800):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(model, device, candidate, audio, queue))
+    proc.start()
+    try:
+        result = queue.get(timeout=timeout)
+    except Exception:
+        result = {"error": "시간 초과"}
+    proc.join(5)
+    if proc.is_alive():
+        proc.terminate()
+    return result
+
+def similarity(reference, text):
+    return difflib.SequenceMatcher(None, reference.split(), text.split()).ratio()
+
+def candidates(device, compute_types=None, threads=None, workers=None, beams=None):
+    cpu = os.cpu_count() or 1
+    compute_types = compute_types or COMPUTE_TYPES.get(device, COMPUTE_TYPES["cpu"])
+    threads = threads or sorted({t for t in (1, 2, 4, 8, cpu) if t <= cpu})
+    # 분석용 best는 num_workers=1 조합에서 고르므로 1은 항상 포함
+    workers = sorted({1, *(workers or (2,))})
+    beams = beams or (1, 5)
+    return [
+        {"compute_type": c, "cpu_threads": t, "num_workers": w, "beam_size": b}
+        for c in compute_types for t in threads for w in workers for b in beams
+        # 동시 변환 스레드가 코어 수를 넘는 조합은 제외
+        if t * w <= cpu or device != "cpu"
+    ]
+
+def _reference_candidate(grid):
+    return max(grid, key=lambda c: (
+        PRECISION_ORDER.index(c["compute_type"]) if c["compute_type"] in PRECISION_ORDER else -1,
+        c["beam_size"], -c["num_workers"], c["cpu_threads"],
+    ))
+
+def autotune(audio, model, device, grid, min_similarity=MIN_SIMILARITY, budget_mb=None):
+    """
+    grid의 조합을 모두 측정하고 프로필(dict)을 반환합니다.
+    best: 정확도/메모리 조건을 만족하는 num_workers=1 조합 중 단일 변환 RTF가 가장 낮은 것 (분석 작업용)
+    live: best 대비 단일 변환 RTF가 LIVE_MAX_SLOWDOWN 배 이내인 조합 중 동시 처리량이 가장 좋은 것 (실시간/API용)
+    """
+    reference = _reference_candidate(grid)
+    ordered = [reference] + [c for c in grid if c is not reference]
+    results = []
+    reference_text = None
+    for i, candidate in enumerate(ordered, 1):
+        result = {**candidate, **measure(model, device, candidate, audio)}
+        if "error" in result:
+            print(f"⚠️ [{i}/{len(ordered)}] {candidate} 실패: {result['error']}")
+            results.append(result)
+            continue
+        if reference_text is None:
+            reference_text = result["text"]
+        result["similarity"] = round(similarity(reference_text, result.pop("text")), 3)
+        results.append(result)
+        print(
+            f"⏱️ [{i}/{len(ordered)}] {candidate['compute_type']} threads={candidate['cpu_threads']} "
+            f"workers={candidate['num_workers']} beam={candidate['beam_size']}: RTF {result['rtf']} "
+            f"(동시 {result['throughput_rtf']}), "
+            f"peak {result['peak_rss_mb']} MB, 일치율 {result['similarity']}"
+        )
+
+    eligible = [
+        r for r in results
+        if "error" not in r and r["similarity"] >= min_similarity and (not budget_mb or r["peak_rss_mb"] <= budget_mb)
+    ]
+    single = [r for r in eligible if r["num_workers"] == 1]
+    if not single:
+        return None
+    best = min(single, key=lambda r: (r["rtf"], r["peak_rss_mb"]))
+    live = min(
+        (r for r in eligible if r["rtf"] <= best["rtf"] * LIVE_MAX_SLOWDOWN),
+        key=lambda r: (r["throughput_rtf"], r["rtf"], r["peak_rss_mb"]),
+    )
+    fields = ("compute_type", "cpu_threads", "num_workers", "beam_size", "rtf", "throughput_rtf", "peak_rss_mb", "similarity")
+    return {
+        "host": host_fingerprint(),
+        "model": model,
+        "device": device,
+        "clip_seconds": round(audio.size / 16000, 1),
+        "min_similarity": min_similarity,
+        "measured_at": datetime.now().isoformat(timespec="seconds"),
+        "best": {k: best[k] for k in fields},
+        "live": {k: live[k] for k in fields},
+        "results": results,
+    }
+
+def save_profile(profile):
+    from database import save_setting
+    # 설정 버전이 올라가므로 워커/UI가 다음 설정 조회 때 새 프로필을 반영
+    save_setting(profile_key(profile["model"], profile["device"]), json.dumps(profile))
+
+# --- 3. 기준 클립 ---
+def _latest_archive():
+    from database import SessionLocal, Recording
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Recording.file_path).filter(Recording.processed == 1, Recording.file_path != "")
+            .order_by(Recording.created_at.desc()).limit(20).all()
+        )
+        return next((path for (path,) in rows if path and os.path.exists(path)), None)
+    finally:
+        db.close()
+
+def load_clip(path=None, seconds=REFERENCE_SECONDS):
+    from services import decode_audio
+    path = path or _latest_archive()
+    if not path:
+        raise RuntimeError("기준 클립이 없습니다. --clip으로 음성 파일을 지정하세요.")
+    audio = decode_audio(path)
+    return path, audio[:int(seconds * 16000)]
+
+def _csv(value, cast=str):
+    return tuple(cast(v.strip()) for v in value.split(",") if v.strip()) if value else None
+
+def main():
+    from database import init_db
+    from config_service import get_settings
+    from model_registry import MEMORY_BUDGET_MB
+
+    parser = argparse.ArgumentParser(description="Whisper 성능 자동 튜닝")
+    parser.add_argument("--clip", help="기준 음성 파일 (기본: 가장 최근 보관본)")
+    parser.add_argument("--seconds", type=float, default=REFERENCE_SECONDS, help="기준 클립 길이(초)")
+    parser.add_argument("--model", help="Whisper 모델 (기본: 설정값)")
+    parser.add_argument("--device", help="연산 장치 (기본: 설정값)")
+    parser.add_argument("--compute", help="정밀도 후보 (쉼표 구분)")
+    parser.add_argument("--threads", help="cpu_threads 후보 (쉼표 구분)")
+    parser.add_argument("--workers", help="num_workers 후보 (쉼표 구분, 1은 항상 포함)")
+    parser.add_argument("--beams", help="beam_size 후보 (쉼표 구분)")
+    parser.add_argument("--min-similarity", type=float, default=MIN_SIMILARITY)
+    parser.add_argument("--dry-run", action="store_true", help="측정만 하고 프로필은 저장하지 않음")
+    parser.add_argument("--output", help="전체 측정 결과를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    init_db()
+    settings = get_settings()
+    model = args.model or settings.get("whisper_model", "base")
+    device = args.device or settings.get("whisper_device", "cpu")
+    grid = candidates(device, _csv(args.compute), _csv(args.threads, int), _csv(args.workers, int), _csv(args.beams, int))
+
+    clip_path, audio = load_clip(args.clip, args.seconds)
+    print(f"🔧 {model} ({device}) 자동 튜닝: {os.path.basename(clip_path)} {audio.size / 16000:.0f}초, {len(grid)}개 조합")
+    profile = autotune(audio, model, device, grid, args.min_similarity, MEMORY_BUDGET_MB)
+    if profile is None:
+        print("❌ 조건을 만족하는 조합이 없습니다 (--min-similarity를 낮추거나 후보를 바꿔 보세요).")
+        sys.exit(1)
+
+    best = profile["best"]
+    print(
+        f"🏆 {best['compute_type']} threads={best['cpu_threads']} workers={best['num_workers']} beam={best['beam_size']}: "
+        f"RTF {best['rtf']} ({1 / best['rtf']:.1f}x 실시간), peak {best['peak_rss_mb']} MB"
+    )
+    live = profile["live"]
+    print(f"📡 실시간/API: workers={live['num_workers']} (threads={live['cpu_threads']}), 동시 RTF {live['throughput_rtf']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+    if not args.dry_run:
+        save_profile(profile)
+        print(f"💾 프로필 저장: {profile_key(model, device)}")
+
+if __name__ == "__main__":
+    main()
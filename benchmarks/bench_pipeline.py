@@ -0,0 +1,313 @@
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+import numpy as np
+
+# 파이프라인 단계별 벤치마크
+#   python benchmarks/bench_pipeline.py --lengths 30,300 --models tiny,base --output result.json
+#   python benchmarks/bench_pipeline.py --baseline benchmarks/baseline.json   # 기준 대비 회귀 확인
+# DB/저장 경로는 임시 작업 폴더에 만들어 실제 data/ 폴더를 건드리지 않습니다.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ("decode", "optimize", "encode", "stt", "db", "refine")
+# 높을수록 좋은 지표 (나머지는 낮을수록 좋음)
+HIGHER_IS_BETTER = {"x_realtime", "tokens_per_sec"}
+
+# --- 1. 합성 음성 ---
+def synth_speech(seconds, sample_rate=44100, seed=0):
+    """
+    음절(4~6Hz) 단위로 켜지고 꺼지는 유성음(기본 주파수 + 포먼트 강조 배음)과 단어 사이 무음,
+    약한 배경 잡음으로 이루어진 음성 유사 신호. 휴대폰 녹음처럼 44.1kHz 스테레오로 만듭니다.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    out = np.zeros(total, dtype=np.float32)
+    pos = 0
+    while pos < total:
+        # 한 단어: 음절 2~4개, 이어서 무음 0.1~0.8초
+        for _ in range(rng.integers(2, 5)):
+            length = int(rng.uniform(0.15, 0.25) * sample_rate)
+            if pos + length > total:
+                break
+            t = np.arange(length) / sample_rate
+            f0 = rng.uniform(100, 240) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(1, 3) * t))
+            phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+            formants = rng.uniform([300, 900, 2200], [800, 2000, 3000])
+            voiced = np.zeros(length, dtype=np.float32)
+            for h in range(1, 16):
+                freq = f0.mean() * h
+                gain = sum(np.exp(-((freq - f) / 150) ** 2) for f in formants) + 0.05
+                voiced += gain / h * np.sin(h * phase)
+            envelope = np.sin(np.pi * np.arange(length) / length) ** 2
+            out[pos:pos + length] = voiced * envelope
+            pos += length
+        pos += int(rng.uniform(0.1, 0.8) * sample_rate)
+    out += rng.normal(0, 0.005, total).astype(np.float32)
+    out *= 0.5 / max(float(np.max(np.abs(out))), 1e-6)
+    return np.stack([out, out * 0.9], axis=1), sample_rate
+
+def write_wav(path, audio, sample_rate):
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(audio.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+def synth_segments(seconds, segment_seconds=3.0):
+    count = int(np.ceil(seconds / segment_seconds))
+    return [
+        {
+            "start": round(i * segment_seconds, 2),
+            "end": round(min((i + 1) * segment_seconds, seconds), 2),
+            "text": f"합성 세그먼트 {i} 회의 예산 일정 담당자",
+        }
+        for i in range(count)
+    ]
+
+# --- 2. 측정 ---
+def timed(fn, repeat):
+    """
+    fn을 repeat번 실행하여 (중앙값 초, 마지막 반환값)
+    """
+    times, result = [], None
+    for i in range(repeat):
+        started = time.perf_counter()
+        result = fn(i)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+def bench_audio(wav_path, seconds, args, workdir):
+    from services import decode_audio, encode_archive, optimize_audio
+    results = []
+    params = {"length": seconds}
+
+    if "decode" in args.stages:
+        elapsed, audio = timed(lambda i: decode_audio(wav_path), args.repeat)
+        results.append(_result("decode", params, elapsed, seconds))
+    else:
+        audio = decode_audio(wav_path)
+
+    if "optimize" in args.stages:
+        # FFmpeg 필터 그래프 한 번으로 디코딩 + High-pass + loudnorm + 16kHz 리샘플 + 보관본 인코딩 전체
+        # optimize_audio는 입력을 지우므로 반복마다 원본 복사본을 넘김 (복사 시간은 측정에서 제외)
+        out_dir = os.path.join(workdir, "optimize")
+        src_dir = os.path.join(workdir, "optimize_src")
+        os.makedirs(src_dir, exist_ok=True)
+        copies = []
+        for i in range(args.repeat):
+            copies.append(os.path.join(src_dir, f"bench_{i}.wav"))
+            shutil.copyfile(wav_path, copies[-1])
+        elapsed, out_path = timed(lambda i: optimize_audio(copies[i], output_folder=out_dir), args.repeat)
+        assert out_path and os.path.exists(out_path), "optimize_audio 결과 파일이 없습니다"
+        results.append(_result("optimize", params, elapsed, seconds))
+
+    if "encode" in args.stages:
+        out_path = os.path.join(workdir, "encode", "bench.mp3")
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        elapsed, _ = timed(lambda i: encode_archive(audio, out_path), args.repeat)
+        results.append(_result("encode", params, elapsed, seconds))
+    return audio, results
+
+def bench_stt(audio, seconds, args):
+    from faster_whisper import WhisperModel
+    from services import transcribe_audio_stream
+    results = []
+    for size in args.models:
+        for compute in args.computes:
+            params = {"length": seconds, "model": size, "compute": compute, "device": args.device}
+            started = time.perf_counter()
+            model = WhisperModel(size, device=args.device, compute_type=compute)
+            load_seconds = time.perf_counter() - started
+            elapsed, segments = timed(lambda i: list(transcribe_audio_stream(model, audio)), args.repeat)
+            result = _result("stt", params, elapsed, seconds)
+            result["metrics"].update({"load_seconds": round(load_seconds, 3), "segments": len(segments)})
+            results.append(result)
+            del model
+    return results
+
+def bench_db(seconds, args, workdir):
+    from database import save_transcript, create_transcript, append_segments, finalize_recording
+    segments = synth_segments(seconds)
+    full_text = " ".join(seg["text"] for seg in segments)
+    archive = os.path.join(workdir, "db_archive.mp3")
+    with open(archive, "wb") as f:
+        f.write(b"\0" * 1024)
+    params = {"length": seconds, "segments": len(segments)}
+
+    # 한 번에 저장 (배치 작업 경로)
+    elapsed, _ = timed(lambda i: save_transcript(archive, full_text, segments), args.repeat)
+    results = [_result("db_save", params, elapsed)]
+
+    # 스트리밍 저장 (20개씩 append 후 finalize)
+    def _stream(i):
+        rec_id, trans_id = create_transcript(archive)
+        for start in range(0, len(segments), 20):
+            append_segments(trans_id, segments[start:start + 20])
+        finalize_recording(rec_id, trans_id, archive)
+    elapsed, _ = timed(_stream, args.repeat)
+    results.append(_result("db_stream", params, elapsed))
+    return results
+
+def bench_refine(args):
+    from ollama_stub import start_stub
+    from services import refine_text_stream, refine_long_text
+    stub = start_stub(latency=args.llm_latency, tokens_per_sec=args.llm_tokens_per_sec, num_tokens=args.llm_tokens)
+    config = {"ollama_url": stub.url, "ollama_model": "stub"}
+    params = {"latency": args.llm_latency, "tokens_per_sec": args.llm_tokens_per_sec, "tokens": args.llm_tokens}
+    results = []
+    try:
+        stats = {}
+        def _short(i):
+            stats.clear()
+            return "".join(refine_text_stream(f"[{i}] 짧은 회의록 교정 테스트", config, "fix", use_cache=False, stats=stats))
+        elapsed, _ = timed(_short, args.repeat)
+        result = _result("refine", params, elapsed)
+        result["metrics"].update({"ttft": stats.get("ttft"), "tokens_per_sec": stats.get("tokens_per_sec")})
+        results.append(result)
+
+        # 긴 스크립트 map-reduce (동시 요청 수와 reduce 단계 포함)
+        segments = synth_segments(args.long_refine_seconds)
+        def _long(i):
+            # 결과 캐시를 건너뛰어 반복마다 모든 map/reduce 요청이 실제로 실행되도록 함
+            return refine_long_text(segments, config, "summarize", use_cache=False)
+        elapsed, _ = timed(_long, args.repeat)
+        results.append(_result("refine_long", {**params, "length": args.long_refine_seconds}, elapsed))
+    finally:
+        stub.shutdown()
+    return results
+
+def _result(stage, params, elapsed, audio_seconds=None):
+    metrics = {"seconds": round(elapsed, 4)}
+    if audio_seconds:
+        metrics["rtf"] = round(elapsed / audio_seconds, 4)
+        metrics["x_realtime"] = round(audio_seconds / elapsed, 2) if elapsed > 0 else None
+    return {"stage": stage, "params": params, "metrics": metrics}
+
+# --- 3. 기준 비교 ---
+def _result_key(result):
+    return result["stage"] + "|" + json.dumps(result["params"], sort_keys=True)
+
+def compare(current, baseline, tolerance):
+    """
+    기준 결과 대비 tolerance(비율) 이상 나빠진 지표 목록을 반환합니다.
+    """
+    base = {_result_key(r): r["metrics"] for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = base.get(_result_key(result))
+        if not old:
+            continue
+        for name, value in result["metrics"].items():
+            before = old.get(name)
+            if name in ("segments", "load_seconds") or not isinstance(value, (int, float)) or not before:
+                continue
+            change = (value - before) / before
+            worse = -change if name in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append({
+                    "stage": result["stage"], "params": result["params"], "metric": name,
+                    "baseline": before, "current": value, "change": round(change, 4),
+                })
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoRa 파이프라인 벤치마크")
+    parser.add_argument("--lengths", default="30,300", help="합성 오디오 길이(초), 쉼표 구분")
+    parser.add_argument("--models", default="tiny,base", help="Whisper 모델 크기, 쉼표 구분")
+    parser.add_argument("--computes", default="int8", help="compute type, 쉼표 구분")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"실행할 단계 ({', '.join(STAGES)})")
+    parser.add_argument("--repeat", type=int, default=1, help="단계별 반복 횟수 (중앙값 사용)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="대역 LLM 첫 토큰 지연(초)")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=30.0)
+    parser.add_argument("--llm-tokens", type=int, default=64, help="대역 LLM 응답당 토큰 수")
+    parser.add_argument("--long-refine-seconds", type=int, default=3600, help="map-reduce 측정용 합성 스크립트 길이(초)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (없으면 stdout)")
+    parser.add_argument("--baseline", help="비교할 기준 결과 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="회귀로 볼 악화 비율")
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+    args.lengths = [int(x) for x in args.lengths.split(",") if x]
+    args.models = [x for x in args.models.split(",") if x]
+    args.computes = [x for x in args.computes.split(",") if x]
+    args.stages = [x for x in args.stages.split(",") if x]
+    # 작업 폴더로 이동하기 전에 결과/기준 경로를 절대 경로로 고정
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    workdir = tempfile.mkdtemp(prefix="memora-bench-")
+    os.chdir(workdir) # database.py는 현재 폴더 기준 data/db에 DB를 만듦
+    from database import init_db
+    init_db()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "keep_workdir")},
+        },
+        "results": [],
+        "errors": [],
+    }
+
+    def _run(name, fn, *fn_args):
+        try:
+            report["results"].extend(fn(*fn_args))
+        except Exception as e:
+            report["errors"].append({"stage": name, "error": f"{type(e).__name__}: {e}"})
+            print(f"⚠️ {name} 단계 실패: {e}", file=sys.stderr)
+
+    try:
+        for seconds in args.lengths:
+            print(f"🎧 {seconds}초 합성 오디오 측정 중...", file=sys.stderr)
+            wav_path = os.path.join(workdir, f"synth_{seconds}s.wav")
+            write_wav(wav_path, *synth_speech(seconds))
+            audio = None
+            if {"decode", "optimize", "encode", "stt"} & set(args.stages):
+                try:
+                    audio, results = bench_audio(wav_path, seconds, args, workdir)
+                    report["results"].extend(results)
+                except Exception as e:
+                    report["errors"].append({"stage": "audio", "error": f"{type(e).__name__}: {e}"})
+            if "stt" in args.stages and audio is not None:
+                _run("stt", bench_stt, audio, seconds, args)
+            if "db" in args.stages:
+                _run("db", bench_db, seconds, args, workdir)
+        if "refine" in args.stages:
+            _run("refine", bench_refine, args)
+    finally:
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.tolerance)
+        for r in report["regressions"]:
+            print(f"❌ 회귀: {r['stage']} {r['params']} {r['metric']} {r['baseline']} -> {r['current']} ({r['change']:+.0%})", file=sys.stderr)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
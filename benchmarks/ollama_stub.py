@@ -0,0 +1,128 @@
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 벤치마크용 Ollama 대역 서버
+# - /api/generate, /api/chat: 첫 토큰 지연(latency)과 초당 토큰 수(tokens_per_sec)를 흉내 내는 NDJSON 스트림
+# - /api/embed: 입력 텍스트 해시로 만든 결정적 벡터
+# - /api/tags: 연결 테스트용 모델 목록
+STUB_TEXT = "회의에서 다음 주 예산 검토 일정과 담당자를 정했습니다. 자료는 금요일까지 공유하기로 했습니다."
+EMBED_DIM = 768
+
+def _tokens(n):
+    words = STUB_TEXT.split()
+    return [(" " if i else "") + words[i % len(words)] for i in range(n)]
+
+def _embedding(text, dim=EMBED_DIM):
+    seed = hashlib.sha256(text.encode("utf-8")).digest()
+    return [((seed[i % len(seed)] + i) % 256) / 255.0 - 0.5 for i in range(dim)]
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": self.server.model_name}]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        payload = self._read_json()
+        self.server.requests += 1
+        if self.path == "/api/embed":
+            inputs = payload.get("input") or []
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            time.sleep(self.server.latency)
+            self._send_json({"model": payload.get("model"), "embeddings": [_embedding(t) for t in inputs]})
+        elif self.path in ("/api/generate", "/api/chat"):
+            self._stream(payload, chat=self.path == "/api/chat")
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _stream(self, payload, chat):
+        tokens = _tokens(self.server.num_tokens)
+        interval = 1.0 / self.server.tokens_per_sec if self.server.tokens_per_sec > 0 else 0.0
+
+        def chunk(token, done=False, **extra):
+            data = {"model": payload.get("model"), "done": done, **extra}
+            if chat:
+                data["message"] = {"role": "assistant", "content": token}
+            else:
+                data["response"] = token
+            return json.dumps(data).encode("utf-8") + b"\n"
+
+        if not payload.get("stream", True):
+            time.sleep(self.server.latency + interval * len(tokens))
+            self._send_json(json.loads(chunk("".join(tokens), done=True)))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        time.sleep(self.server.latency)
+        started = time.perf_counter()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(interval)
+            write(chunk(token))
+        eval_ns = int((time.perf_counter() - started) * 1e9)
+        write(chunk("", done=True, eval_count=len(tokens), eval_duration=eval_ns))
+        self.wfile.write(b"0\r\n\r\n")
+
+def start_stub(port=0, latency=0.2, tokens_per_sec=30.0, num_tokens=64, model_name="stub"):
+    """
+    백그라운드 스레드에서 대역 서버를 띄우고 서버 객체를 반환합니다. 주소는 server.url
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.tokens_per_sec = tokens_per_sec
+    server.num_tokens = num_tokens
+    server.model_name = model_name
+    server.requests = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="벤치마크용 Ollama 대역 서버")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.2, help="첫 토큰까지 지연(초)")
+    parser.add_argument("--tokens-per-sec", type=float, default=30.0)
+    parser.add_argument("--num-tokens", type=int, default=64, help="응답당 생성 토큰 수")
+    args = parser.parse_args()
+
+    server = start_stub(args.port, args.latency, args.tokens_per_sec, args.num_tokens)
+    print(f"🧪 Ollama stub: {server.url} (latency {args.latency}s, {args.tokens_per_sec} tok/s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# 실시간 변환 재생 테스트: 녹음 파일을 실제 속도로 흘려 보내며 partial/final 이벤트와 지연을 확인합니다.
+#   python benchmarks/replay_live.py meeting.m4a                          # 프로세스 안에서 LiveTranscriber 직접 사용
+#   python benchmarks/replay_live.py meeting.m4a --url ws://localhost:8000/live   # API 웹소켓으로 전송
+#   python benchmarks/replay_live.py meeting.m4a --speed 2 --output live.json
+# 지연(lag) = 이벤트를 받은 시점까지 보낸 오디오 길이 - 이벤트 세그먼트 끝 시각
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+FRAME_SECONDS = 0.25 # 마이크 입력처럼 보내는 프레임 길이
+
+def load_pcm(path):
+    from services import decode_audio
+    audio = decode_audio(path)
+    return (np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes()
+
+def frames(pcm, speed):
+    """
+    (보낸 오디오 길이(초), 프레임) 을 실제 속도에 맞춰 yield
+    """
+    frame_bytes = int(FRAME_SECONDS * 16000) * 2
+    started = time.perf_counter()
+    for i in range(0, len(pcm), frame_bytes):
+        sent_seconds = (i + frame_bytes) / 2 / 16000
+        delay = started + (i / 2 / 16000) / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield min(sent_seconds, len(pcm) / 2 / 16000), pcm[i:i + frame_bytes]
+
+def replay_local(pcm, args):
+    import model_registry
+    from streaming_stt import LiveTranscriber
+
+    model = model_registry.get_model({
+        "model_size_or_path": args.model, "device": args.device, "compute_type": args.compute,
+    })
+    transcriber = LiveTranscriber(model, language=args.language)
+    for sent, frame in frames(pcm, args.speed):
+        for event in transcriber.feed(frame):
+            yield sent, event
+    for event in transcriber.finish():
+        yield len(pcm) / 2 / 16000, event
+
+def replay_websocket(pcm, args):
+    from websockets.sync.client import connect
+
+    url = f"{args.url}{'&' if '?' in args.url else '?'}language={args.language}"
+    with connect(url) as ws:
+        for sent, frame in frames(pcm, args.speed):
+            ws.send(frame)
+            # 받은 이벤트는 기다리지 않고 바로 꺼냄
+            while True:
+                try:
+                    yield sent, json.loads(ws.recv(timeout=0))
+                except TimeoutError:
+                    break
+        ws.send("end")
+        sent = len(pcm) / 2 / 16000
+        for message in ws:
+            event = json.loads(message)
+            yield sent, event
+            if event["type"] == "done":
+                return
+
+def main():
+    parser = argparse.ArgumentParser(description="실시간 변환 재생 테스트")
+    parser.add_argument("path", help="재생할 오디오 파일")
+    parser.add_argument("--url", help="API 웹소켓 주소 (예: ws://localhost:8000/live). 없으면 프로세스 안에서 실행")
+    parser.add_argument("--speed", type=float, default=1.0, help="재생 배속 (1 = 실제 속도)")
+    parser.add_argument("--language", default="ko")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute", default="int8")
+    parser.add_argument("--output", help="이벤트와 지연 요약을 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    pcm = load_pcm(args.path)
+    events = []
+    replay = replay_websocket if args.url else replay_local
+    for sent, event in replay(pcm, args):
+        lag = round(sent - event["end"], 2) if "end" in event else None
+        events.append({**event, "sent_seconds": round(sent, 2), "lag": lag})
+        if event["type"] == "final":
+            print(f"✅ [{event['start']:7.2f}-{event['end']:7.2f}] (지연 {lag:.2f}s) {event['text']}")
+        elif event["type"] == "partial":
+            print(f"   … {event['text'][-80:]}", end="\r")
+
+    final_lags = sorted(e["lag"] for e in events if e["type"] == "final")
+    partial_lags = sorted(e["lag"] for e in events if e["type"] == "partial")
+    summary = {
+        "audio_seconds": round(len(pcm) / 2 / 16000, 2),
+        "speed": args.speed,
+        "final_segments": len(final_lags),
+        "final_lag_p50": final_lags[len(final_lags) // 2] if final_lags else None,
+        "final_lag_max": final_lags[-1] if final_lags else None,
+        "partial_lag_p50": partial_lags[len(partial_lags) // 2] if partial_lags else None,
+    }
+    print(f"\n📊 {json.dumps(summary, ensure_ascii=False)}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "events": events}, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
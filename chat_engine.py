@@ -0,0 +1,77 @@
+import llm_client
+
+# 대화형 채팅 엔진 (Ollama /api/chat)
+# - 매 턴 전체 대화를 보내되, 앞부분(시스템 프롬프트 + 요약 + 이전 턴)을 그대로 유지하여
+#   Ollama가 이전 턴의 KV 캐시(prefix)를 재사용하도록 함 -> 새로 계산하는 것은 마지막 질문뿐
+# - keep_alive로 대화 중에는 모델을 메모리에 유지
+# - 이전 턴이 토큰 예산을 넘으면 오래된 턴을 요약(rolling summary)으로 접어서 프롬프트 길이를 일정하게 유지
+CHAT_KEEP_ALIVE = "30m"
+HISTORY_TOKEN_BUDGET = 3000 # 요약을 제외한 이전 턴의 추정 토큰 수 상한
+KEEP_RECENT_MESSAGES = 4 # 요약할 때도 원문으로 남길 최근 메시지 수 (질문/답변 2턴)
+SUMMARY_MAX_CHARS = 1500
+
+SYSTEM_PROMPT = (
+    "너는 MemoRa의 AI 비서야. 사용자가 저장한 음성 녹음 기록에 대한 질문에 한국어로 간결하고 정확하게 답해."
+)
+
+def new_conversation():
+    """
+    history: 모델에 실제로 보낸 메시지 (녹음 구간이 주입된 질문 포함)
+    """
+    return {"summary": "", "history": [], "compactions": 0}
+
+def estimate_tokens(text):
+    # 토크나이저 없이 쓰는 보수적 추정 (한국어는 대략 2~3자당 1토큰)
+    return len(text) // 2 + 1
+
+def history_tokens(conversation):
+    return sum(estimate_tokens(m["content"]) for m in conversation["history"])
+
+def _system_message(conversation):
+    content = SYSTEM_PROMPT
+    if conversation["summary"]:
+        content += f"\n\n지금까지의 대화 요약:\n{conversation['summary']}"
+    return {"role": "system", "content": content}
+
+def build_messages(conversation, user_content):
+    """
+    [시스템(+요약), 이전 턴..., 새 질문]. 요약이 바뀌기 전까지 앞부분은 매 턴 동일합니다.
+    """
+    return [_system_message(conversation), *conversation["history"], {"role": "user", "content": user_content}]
+
+def stream_reply(conversation, base_url, model, user_content, stats=None):
+    """
+    답변 토큰을 yield하고, 끝까지 받으면 질문과 답변을 history에 추가합니다.
+    """
+    messages = build_messages(conversation, user_content)
+    reply = ""
+    for token in llm_client.stream_chat(base_url, model, messages, stats=stats, keep_alive=CHAT_KEEP_ALIVE):
+        reply += token
+        yield token
+    conversation["history"] += [{"role": "user", "content": user_content}, {"role": "assistant", "content": reply}]
+
+def _summarize(base_url, model, summary, messages):
+    transcript = "\n".join(f"{'사용자' if m['role'] == 'user' else '비서'}: {m['content']}" for m in messages)
+    prompt = (
+        "다음은 이전 대화 요약과 그 이후 이어진 대화야. 이후 대화에 필요한 사실, 결정, 사용자의 요청을 빠짐없이 "
+        f"담아 하나의 요약으로 합쳐줘. {SUMMARY_MAX_CHARS}자 이내, 요약문만 출력해.\n\n"
+        f"[이전 요약]\n{summary or '(없음)'}\n\n[이어진 대화]\n{transcript}"
+    )
+    return llm_client.generate(base_url, model, prompt, keep_alive=CHAT_KEEP_ALIVE).strip()[:SUMMARY_MAX_CHARS]
+
+def compact(conversation, base_url, model, budget=HISTORY_TOKEN_BUDGET, keep_recent=KEEP_RECENT_MESSAGES):
+    """
+    이전 턴이 예산을 넘으면 최근 keep_recent개를 제외한 메시지를 요약에 합칩니다. 요약했으면 True
+    답변을 보여준 뒤에 호출하여 다음 질문의 첫 토큰 지연에 포함되지 않도록 합니다.
+    """
+    history = conversation["history"]
+    if history_tokens(conversation) <= budget or len(history) <= keep_recent:
+        return False
+    # 질문/답변 쌍이 갈라지지 않도록 짝수 개만 접음
+    cut = (len(history) - keep_recent) // 2 * 2
+    if cut <= 0:
+        return False
+    conversation["summary"] = _summarize(base_url, model, conversation["summary"], history[:cut])
+    conversation["history"] = history[cut:]
+    conversation["compactions"] += 1
+    return True
@@ -0,0 +1,50 @@
+import time
+import threading
+import database
+from database import load_all_settings, get_settings_version, get_init_stats
+
+# 프로세스 전역 설정 캐시
+# - 같은 프로세스의 save_setting은 database.settings_generation으로 즉시 감지
+# - 다른 프로세스(UI <-> 워커)의 변경은 DB 설정 버전을 주기적으로 확인하여 감지
+VERSION_CHECK_SECONDS = 5
+
+_lock = threading.Lock()
+_cache = {"settings": None, "version": None, "generation": -1, "checked_at": 0.0}
+_stats = {"loads": 0, "hits": 0, "version_checks": 0, "last_load_seconds": None}
+
+def get_settings():
+    """
+    기본값이 합쳐진 전체 설정 dict를 반환합니다. 바뀐 것이 없으면 DB를 조회하지 않습니다.
+    """
+    with _lock:
+        if _cache["settings"] is not None and _cache["generation"] == database.settings_generation:
+            now = time.monotonic()
+            if now - _cache["checked_at"] < VERSION_CHECK_SECONDS:
+                _stats["hits"] += 1
+                return dict(_cache["settings"])
+            _stats["version_checks"] += 1
+            _cache["checked_at"] = now
+            if get_settings_version() == _cache["version"]:
+                _stats["hits"] += 1
+                return dict(_cache["settings"])
+
+        started = time.perf_counter()
+        # 버전을 먼저 읽어야 로드 도중 바뀐 설정을 다음 확인 때 놓치지 않음
+        generation = database.settings_generation
+        version = get_settings_version()
+        settings = load_all_settings()
+        _cache.update(settings=settings, version=version, generation=generation, checked_at=time.monotonic())
+        _stats["loads"] += 1
+        _stats["last_load_seconds"] = round(time.perf_counter() - started, 4)
+        return dict(settings)
+
+def invalidate():
+    with _lock:
+        _cache["settings"] = None
+
+def get_stats():
+    """
+    설정 캐시와 스키마 초기화의 소요 시간/횟수
+    """
+    with _lock:
+        return {**_stats, "init": get_init_stats()}
@@ -1,7 +1,10 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, JSON, DateTime, inspect, text
+import time
+import threading
+from sqlalchemy import create_engine, event, func, cast, Column, Index, Integer, String, Float, Text, JSON, DateTime, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
 # SQLite DB 파일 경로 (Docker 볼륨 마운트 고려)
@@ -9,10 +12,21 @@ DB_DIR = "data/db"
 os.makedirs(DB_DIR, exist_ok=True)
 DATABASE_URL = f"sqlite:///{DB_DIR}/memora.db"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False, "timeout": 30})
+
+# UI 프로세스와 워커 프로세스가 같은 DB 파일을 동시에 쓰므로 WAL 모드 사용
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+RECORDING_FAILED = -1 # Recording.processed: 변환 작업이 재시도까지 모두 실패함
+
 # --- 모델 정의 (명세서 기반) ---
 class SystemConfig(Base):
     __tablename__ = "system_configs"
@@ -28,7 +42,11 @@ class Recording(Base):
     duration = Column(Float)
     file_size = Column(Float) # MB 단위
     created_at = Column(DateTime, default=datetime.utcnow)
-    processed = Column(Integer, default=0) # 0: 미처리, 1: 처리완료
+    processed = Column(Integer, default=0) # 0: 미처리, 1: 처리완료, -1(RECORDING_FAILED): 실패
+    content_hash = Column(String(64), unique=True, index=True) # 원본 파일 SHA-256 (중복 업로드 감지)
+
+    # History 페이지 keyset 페이지네이션 (created_at DESC, id DESC)
+    __table_args__ = (Index("ix_recordings_created_at_id", "created_at", "id"),)
 
 class Transcript(Base):
     __tablename__ = "transcripts"
@@ -38,12 +56,100 @@ class Transcript(Base):
     full_text = Column(Text)
     summary = Column(Text)
     tags = Column(String) 
-    segments_json = Column(JSON) # 타임스탬프: [{start, end, text}, ...]
+    segments_json = Column(JSON) # (구버전) 세그먼트 통째 저장. init_db에서 segments 테이블로 이전
     version = Column(Integer, default=1)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-# DB 초기화 함수
+
+    # 녹음별 최신 버전 조회용
+    __table_args__ = (Index("ix_transcripts_recording_version", "recording_id", "version"),)
+
+class Segment(Base):
+    __tablename__ = "segments"
+
+    id = Column(Integer, primary_key=True)
+    transcript_id = Column(Integer, nullable=False)
+    idx = Column(Integer, nullable=False) # Transcript 내 순번 (0부터)
+    start = Column(Float)
+    end = Column(Float)
+    text = Column(Text)
+
+    # 시각 기준 조회(재생 위치 이동, 구간 조회)와 순번 조회
+    __table_args__ = (
+        Index("ix_segments_transcript_start", "transcript_id", "start"),
+        Index("ux_segments_transcript_idx", "transcript_id", "idx", unique=True),
+    )
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, default="analyze")
+    status = Column(String, default="queued", index=True) # queued / running / done / failed
+    payload = Column(JSON) # 작업 입력 (input_path, config 등)
+    result = Column(JSON) # 진행 단계 및 결과 (stage, recording_id, transcript_id 등)
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    worker_id = Column(String)
+    lease_until = Column(DateTime) # 이 시각까지 갱신이 없으면 다른 워커가 다시 가져감
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RefineCacheEntry(Base):
+    __tablename__ = "refine_cache"
+
+    key = Column(String(64), primary_key=True) # sha256(text, prompt_type, engine, model)
+    prompt_type = Column(String)
+    engine = Column(String)
+    model = Column(String)
+    result = Column(Text)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class StageMetric(Base):
+    __tablename__ = "stage_metrics"
+
+    id = Column(Integer, primary_key=True)
+    stage = Column(String, nullable=False) # decode / encode / optimize / stt / db_write / refine / drive_sync ...
+    outcome = Column(String, default="ok") # ok / error / cached
+    duration = Column(Float) # 초
+    audio_seconds = Column(Float) # 처리한 오디오 길이 (실시간 배율 계산용)
+    bytes = Column(Integer)
+    job_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_stage_metrics_stage_created", "stage", "created_at"),)
+
+class MetricSample(Base):
+    __tablename__ = "metric_samples"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False) # 예: queue_depth
+    value = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_metric_samples_name_created", "name", "created_at"),)
+
+# DB 초기화 함수 (Streamlit rerun마다 호출되므로 프로세스당 한 번만 실제 실행)
+_init_lock = threading.Lock()
+_init_stats = {"done": False, "seconds": None, "skipped": 0}
+
 def init_db():
+    with _init_lock:
+        if _init_stats["done"]:
+            _init_stats["skipped"] += 1
+            return
+        started = time.perf_counter()
+        _init_schema()
+        _init_stats["done"] = True
+        _init_stats["seconds"] = round(time.perf_counter() - started, 4)
+        print(f"🗄️ DB 스키마 초기화 완료 ({_init_stats['seconds'] * 1000:.0f} ms)")
+
+def get_init_stats():
+    return dict(_init_stats)
+
+def _init_schema():
     Base.metadata.create_all(bind=engine)
     
     # --- Zero-Config Migration: missing columns check ---
@@ -56,6 +162,367 @@ def init_db():
             conn.commit()
             print("🚀 Migrated: Added 'updated_at' column to 'transcripts' table.")
 
+    rec_columns = [c['name'] for c in inspector.get_columns('recordings')]
+    if 'content_hash' not in rec_columns:
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE recordings ADD COLUMN content_hash VARCHAR(64)"))
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_recordings_content_hash ON recordings (content_hash)"))
+            conn.commit()
+            print("🚀 Migrated: Added 'content_hash' column to 'recordings' table.")
+
+    # create_all은 기존 테이블에 새 인덱스를 만들지 않으므로 직접 생성
+    with engine.connect() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_transcripts_recording_version ON transcripts (recording_id, version)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_recordings_created_at_id ON recordings (created_at, id)"))
+        conn.commit()
+
+    migrate_segments()
+    init_search_index()
+
+def migrate_segments():
+    """
+    segments_json 블롭에 남아 있는 세그먼트를 segments 테이블로 옮기고 블롭은 비웁니다.
+    """
+    with engine.connect() as conn:
+        # Transcript 삭제 시 세그먼트도 함께 삭제 (History 삭제, 중복 기록 정리 등)
+        conn.execute(text("""CREATE TRIGGER IF NOT EXISTS transcripts_segments_ad AFTER DELETE ON transcripts BEGIN
+            DELETE FROM segments WHERE transcript_id = old.id;
+        END"""))
+        moved = conn.execute(text("""
+            INSERT INTO segments (transcript_id, idx, start, "end", text)
+            SELECT t.id, CAST(j.key AS INTEGER), json_extract(j.value, '$.start'),
+                   json_extract(j.value, '$.end'), json_extract(j.value, '$.text')
+            FROM transcripts t, json_each(t.segments_json) j
+            WHERE t.segments_json IS NOT NULL AND t.segments_json != 'null'
+              AND NOT EXISTS (SELECT 1 FROM segments s WHERE s.transcript_id = t.id)
+        """)).rowcount
+        conn.execute(text("UPDATE transcripts SET segments_json = NULL WHERE segments_json IS NOT NULL"))
+        conn.commit()
+        if moved:
+            print(f"🚀 Migrated: Moved {moved} segments from 'segments_json' to 'segments' table.")
+
+# --- 전문 검색 (SQLite FTS5, trigram 토크나이저: 한국어 부분 일치 지원) ---
+# segments_fts는 segments 테이블을 원본으로 하는 external content 인덱스 (rowid = segments.id)
+
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(
+        full_text, content='transcripts', content_rowid='id', tokenize='trigram')""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+        text, content='segments', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS transcripts_fts_ai AFTER INSERT ON transcripts BEGIN
+        INSERT INTO transcripts_fts(rowid, full_text) VALUES (new.id, new.full_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transcripts_fts_ad AFTER DELETE ON transcripts BEGIN
+        INSERT INTO transcripts_fts(transcripts_fts, rowid, full_text) VALUES ('delete', old.id, old.full_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transcripts_fts_au AFTER UPDATE OF full_text ON transcripts BEGIN
+        INSERT INTO transcripts_fts(transcripts_fts, rowid, full_text) VALUES ('delete', old.id, old.full_text);
+        INSERT INTO transcripts_fts(rowid, full_text) VALUES (new.id, new.full_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS segments_fts_ai AFTER INSERT ON segments BEGIN
+        INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS segments_fts_ad AFTER DELETE ON segments BEGIN
+        INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS segments_fts_au AFTER UPDATE OF text ON segments BEGIN
+        INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+# segments_json을 직접 색인하던 이전 버전의 인덱스/트리거
+LEGACY_FTS_OBJECTS = [
+    "DROP TRIGGER IF EXISTS transcripts_fts_ai",
+    "DROP TRIGGER IF EXISTS transcripts_fts_ad",
+    "DROP TRIGGER IF EXISTS transcripts_segments_fts_au",
+    "DROP TABLE IF EXISTS segments_fts",
+]
+
+def init_search_index():
+    """
+    FTS5 검색 인덱스와 동기화 트리거를 만들고, 처음 만들어질 때 기존 데이터를 색인합니다.
+    """
+    with engine.connect() as conn:
+        existing = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'segments_fts'")).first()
+        rebuild = existing is None
+        try:
+            if existing and "content='segments'" not in existing[0]:
+                for statement in LEGACY_FTS_OBJECTS:
+                    conn.execute(text(statement))
+                rebuild = True
+            for statement in FTS_SCHEMA:
+                conn.execute(text(statement))
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ FTS5 검색 인덱스를 만들 수 없습니다 (SQLite 3.34+ 필요): {e}")
+            return
+        if rebuild:
+            conn.execute(text("INSERT INTO transcripts_fts(transcripts_fts) VALUES ('rebuild')"))
+            conn.execute(text("INSERT INTO segments_fts(segments_fts) VALUES ('rebuild')"))
+            print("🚀 Migrated: Built full-text search index.")
+        conn.commit()
+
+def find_transcript_by_hash(content_hash):
+    """
+    같은 내용의 원본이 이미 분석되었으면 (recording_id, transcript_id)를, 아니면 None을 반환합니다.
+    """
+    if not content_hash:
+        return None
+    db = SessionLocal()
+    try:
+        rec = db.query(Recording).filter(Recording.content_hash == content_hash).first()
+        if not rec:
+            return None
+        trans = db.query(Transcript).filter(Transcript.recording_id == rec.id).order_by(Transcript.version.desc()).first()
+        return rec.id, trans.id if trans else None
+    finally:
+        db.close()
+
+def save_transcript(optimized_path, full_text, segments_list, content_hash=None, duration=None):
+    """
+    최적화된 오디오와 STT 결과를 Recording/Transcript로 저장하고 (recording_id, transcript_id)를 반환합니다.
+    같은 content_hash가 동시에 저장된 경우 먼저 저장된 기록을 반환합니다.
+    """
+    db = SessionLocal()
+    try:
+        new_rec = Recording(
+            filename=os.path.basename(optimized_path),
+            file_path=optimized_path,
+            file_size=os.path.getsize(optimized_path) / (1024*1024),
+            duration=duration,
+            processed=1,
+            content_hash=content_hash
+        )
+        db.add(new_rec)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return find_transcript_by_hash(content_hash)
+        db.refresh(new_rec)
+
+        new_trans = Transcript(
+            recording_id=new_rec.id,
+            full_text=full_text,
+            version=1
+        )
+        db.add(new_trans)
+        db.flush()
+        _insert_segments(db, new_trans.id, segments_list)
+        db.commit()
+        return new_rec.id, new_trans.id
+    finally:
+        db.close()
+
+# --- 스트리밍 STT 저장 (처리 중 기록 생성 -> 세그먼트 배치 추가 -> 완료 처리) ---
+def create_transcript(file_path):
+    """
+    STT 시작 시점에 빈 Recording(processed=0)과 Transcript를 만들어 (recording_id, transcript_id)를 반환합니다.
+    content_hash는 완료 시점(finalize_recording)에만 기록하여 실패한 작업이 해시를 점유하지 않도록 합니다.
+    """
+    db = SessionLocal()
+    try:
+        new_rec = Recording(filename=os.path.basename(file_path), file_path=file_path, file_size=0, processed=0)
+        db.add(new_rec)
+        db.flush()
+        new_trans = Transcript(recording_id=new_rec.id, full_text="", version=1)
+        db.add(new_trans)
+        db.commit()
+        return new_rec.id, new_trans.id
+    finally:
+        db.close()
+
+def mark_recording_failed(recording_id):
+    """
+    처리 중(processed=0)인 기록을 실패로 표시합니다. 작업 큐를 거치지 않는 경로(실시간 저장 모드)용
+    """
+    db = SessionLocal()
+    try:
+        db.query(Recording).filter(Recording.id == recording_id, Recording.processed == 0).update(
+            {"processed": RECORDING_FAILED}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def append_segments(transcript_id, segments):
+    """
+    변환된 세그먼트 묶음을 Transcript 끝에 이어 붙이고, 마지막으로 저장된 시각(초)을 반환합니다.
+    """
+    db = SessionLocal()
+    try:
+        trans = db.get(Transcript, transcript_id)
+        last_idx = db.query(func.max(Segment.idx)).filter(Segment.transcript_id == transcript_id).scalar()
+        _insert_segments(db, transcript_id, segments, start_idx=0 if last_idx is None else last_idx + 1)
+        new_text = " ".join(seg["text"] for seg in segments)
+        trans.full_text = f"{trans.full_text} {new_text}".strip() if trans.full_text else new_text
+        db.commit()
+        return segments[-1]["end"] if segments else get_transcript_checkpoint(transcript_id)
+    finally:
+        db.close()
+
+def get_transcript_checkpoint(transcript_id):
+    """
+    마지막으로 저장된 세그먼트의 끝 시각(초). 중단된 작업은 이 지점부터 재개합니다.
+    """
+    db = SessionLocal()
+    try:
+        last = (
+            db.query(Segment.end).filter(Segment.transcript_id == transcript_id)
+            .order_by(Segment.idx.desc()).first()
+        )
+        return last[0] if last else 0.0
+    finally:
+        db.close()
+
+# --- 세그먼트 조회 (segments 테이블, (transcript_id, start) 인덱스 사용) ---
+def _insert_segments(db, transcript_id, segments, start_idx=0):
+    # 한 번의 executemany로 일괄 삽입
+    rows = [
+        {"transcript_id": transcript_id, "idx": start_idx + i, "start": seg["start"], "end": seg["end"], "text": seg["text"]}
+        for i, seg in enumerate(segments)
+    ]
+    if rows:
+        db.execute(Segment.__table__.insert(), rows)
+
+def _segment_to_dict(seg):
+    return {"index": seg.idx, "start": seg.start, "end": seg.end, "text": seg.text}
+
+def load_segments(transcript_id):
+    """
+    Transcript의 전체 세그먼트를 순서대로 반환합니다: [{index, start, end, text}, ...]
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(Segment).filter(Segment.transcript_id == transcript_id).order_by(Segment.idx).all()
+        return [_segment_to_dict(seg) for seg in rows]
+    finally:
+        db.close()
+
+def get_segment_at(transcript_id, t):
+    """
+    t초 시점에 재생 중인 세그먼트. 세그먼트 사이 무음 구간이면 None.
+    """
+    db = SessionLocal()
+    try:
+        seg = (
+            db.query(Segment)
+            .filter(Segment.transcript_id == transcript_id, Segment.start <= t)
+            .order_by(Segment.start.desc())
+            .first()
+        )
+        return _segment_to_dict(seg) if seg and seg.end > t else None
+    finally:
+        db.close()
+
+def get_segments_in_range(transcript_id, start, end):
+    """
+    [start, end) 구간과 겹치는 세그먼트만 읽어옵니다 (긴 녹음의 부분 로딩용).
+    """
+    db = SessionLocal()
+    try:
+        # start 직전에 시작한 세그먼트부터 읽어야 걸쳐 있는 세그먼트도 포함됨
+        lower = (
+            db.query(Segment.start)
+            .filter(Segment.transcript_id == transcript_id, Segment.start <= start)
+            .order_by(Segment.start.desc())
+            .limit(1)
+            .scalar()
+        )
+        rows = (
+            db.query(Segment)
+            .filter(
+                Segment.transcript_id == transcript_id,
+                Segment.start >= (lower if lower is not None else start),
+                Segment.start < end,
+                Segment.end > start,
+            )
+            .order_by(Segment.start)
+            .all()
+        )
+        return [_segment_to_dict(seg) for seg in rows]
+    finally:
+        db.close()
+
+def get_segments_by_index(transcript_id, first, last):
+    """
+    순번 first~last(포함) 세그먼트 (검색 결과 앞뒤 문맥 조회용)
+    """
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Segment)
+            .filter(Segment.transcript_id == transcript_id, Segment.idx >= first, Segment.idx <= last)
+            .order_by(Segment.idx)
+            .all()
+        )
+        return [_segment_to_dict(seg) for seg in rows]
+    finally:
+        db.close()
+
+def finalize_recording(recording_id, transcript_id, file_path, content_hash=None, duration=None):
+    """
+    처리 완료 표시와 함께 파일 크기/길이/해시를 기록합니다.
+    다른 작업이 같은 내용을 먼저 완료했다면 이번 기록을 지우고 기존 (recording_id, transcript_id)를 반환합니다.
+    """
+    db = SessionLocal()
+
+    def _complete(content_hash):
+        rec = db.get(Recording, recording_id)
+        rec.file_path = file_path
+        rec.filename = os.path.basename(file_path)
+        rec.file_size = os.path.getsize(file_path) / (1024*1024)
+        rec.content_hash = content_hash
+        if duration is not None:
+            rec.duration = duration
+        rec.processed = 1
+        db.commit()
+
+    try:
+        try:
+            _complete(content_hash)
+        except IntegrityError:
+            db.rollback()
+            existing = find_transcript_by_hash(content_hash)
+            if existing is None:
+                # 먼저 완료된 기록이 그사이 삭제됨: 이번 기록을 그대로 완료 (그래도 충돌하면 해시 없이 저장)
+                try:
+                    _complete(content_hash)
+                except IntegrityError:
+                    db.rollback()
+                    _complete(None)
+                return recording_id, transcript_id
+            db.query(Transcript).filter(Transcript.recording_id == recording_id).delete()
+            db.query(Recording).filter(Recording.id == recording_id).delete()
+            db.commit()
+            winner = db.get(Recording, existing[0])
+            # 이름이 달라 별도로 만들어진 보관본은 정리
+            if winner and winner.file_path != file_path and os.path.exists(file_path):
+                os.remove(file_path)
+            return existing
+        return recording_id, transcript_id
+    finally:
+        db.close()
+
+# AI Refiner 결과를 Transcript에 반영 (History에서 다시 생성하지 않도록)
+REFINE_RESULT_COLUMNS = {"summarize": "summary", "action_item": "tags"}
+
+def save_refine_result(transcript_id, prompt_type, result):
+    column = REFINE_RESULT_COLUMNS.get(prompt_type)
+    if not transcript_id or not column:
+        return False
+    db = SessionLocal()
+    try:
+        trans = db.get(Transcript, transcript_id)
+        if not trans:
+            return False
+        setattr(trans, column, result)
+        db.commit()
+        return True
+    finally:
+        db.close()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -63,6 +530,72 @@ def get_db():
     finally:
         db.close()
 
+# 설정 기본값 (DB에 값이 없을 때 사용)
+DEFAULT_SETTINGS = {
+    "whisper_model": "base",
+    "whisper_device": "cpu",
+    "whisper_compute": "auto", # auto: 튜닝 프로필의 정밀도 (프로필이 없으면 CTranslate2가 선택)
+    "whisper_autotune": "True", # autotune.py로 측정한 프로필(정밀도/스레드/워커/beam) 자동 적용
+    "long_audio_parallel": "True",
+    "ollama_url": os.getenv("OLLAMA_URL", "http://localhost:11434"),
+    "ollama_model": "gemma2:2b",
+    "embed_model": "nomic-embed-text",
+    "auto_delete": "True",
+    "api_key": "",
+    "gdrive_folder_id": "",
+    "watch_folders": "",
+    # 저장 공간 보존 정책 (retention.py)
+    "retention_enabled": "True",
+    "disk_high_watermark": "85", # 사용률(%)이 이 값을 넘으면 정리 시작
+    "disk_low_watermark": "75", # 이 값 아래로 내려갈 때까지 정리
+    "tier_after_days": "0", # 이보다 오래된 보관본은 Opus로 재인코딩 (0: 사용 안 함)
+    "temp_max_age_hours": "48",
+    "evict_policy": "none", # none / delete_audio
+}
+
+def load_all_settings():
+    """
+    DB 설정값을 기본값과 합쳐 반환합니다 ("True"/"False"는 bool로 변환).
+    """
+    db = SessionLocal()
+    try:
+        db_settings = {c.key: c.value for c in db.query(SystemConfig).all()}
+    finally:
+        db.close()
+
+    settings = {}
+    for key, default_val in DEFAULT_SETTINGS.items():
+        # DB에 있으면 DB값, 없으면 기본값 사용
+        val = db_settings.get(key, default_val)
+        # Boolean 처리
+        if val == "True": val = True
+        elif val == "False": val = False
+        settings[key] = val
+    return settings
+
+# 설정이 바뀔 때마다 증가하는 버전 (config_service 캐시 무효화용)
+SETTINGS_VERSION_KEY = "_settings_version"
+settings_generation = 0 # 이 프로세스에서 save_setting이 호출된 횟수
+
+def get_settings_version():
+    """
+    DB에 기록된 설정 버전. 다른 프로세스에서 바뀐 설정을 감지하는 데 사용합니다.
+    """
+    db = SessionLocal()
+    try:
+        config = db.get(SystemConfig, SETTINGS_VERSION_KEY)
+        return int(config.value) if config else 0
+    finally:
+        db.close()
+
+def get_setting(key, default=None):
+    db = SessionLocal()
+    try:
+        config = db.get(SystemConfig, key)
+        return config.value if config else default
+    finally:
+        db.close()
+
 def save_setting(key, value):
     db = SessionLocal()
     try:
@@ -71,6 +604,15 @@ def save_setting(key, value):
             config.value = str(value)
         else:
             db.add(SystemConfig(key=key, value=str(value)))
+        # 설정 값과 같은 트랜잭션에서 버전 증가
+        bumped = db.query(SystemConfig).filter(SystemConfig.key == SETTINGS_VERSION_KEY).update(
+            {"value": cast(SystemConfig.value, Integer) + 1}, synchronize_session=False
+        )
+        if not bumped:
+            db.add(SystemConfig(key=SETTINGS_VERSION_KEY, value="1"))
         db.commit()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+    global settings_generation
+    settings_generation += 1
\ No newline at end of file
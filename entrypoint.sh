@@ -10,5 +10,8 @@ echo "📥 Checking AI Model (gemma2:2b)..."
 # 모델 다운로드 요청
 curl -X POST http://ollama:11434/api/pull -d '{"name": "gemma2:2b"}'
 
+echo "📥 Checking Embedding Model (nomic-embed-text)..."
+curl -X POST http://ollama:11434/api/pull -d '{"name": "nomic-embed-text"}'
+
 echo "🚀 Starting MemoRa..."
 exec "$@"
\ No newline at end of file
@@ -1,15 +1,26 @@
 import os
+import json
 import pickle
-from google.auth.transport.requests import Request
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from google.auth.transport.requests import Request, AuthorizedSession
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import io
+from database import find_transcript_by_hash, get_setting, save_setting
+from metrics import stage_timer
 
 # If modifying these SCOPES, delete the file token.pickle.
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
-def get_gdrive_service():
+# Drive REST endpoint (overridable so a local fake Drive server can stand in)
+DRIVE_API_URL = os.getenv("GDRIVE_API_URL", "https://www.googleapis.com/drive/v3")
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a')
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 3
+MAX_DOWNLOAD_WORKERS = 4
+FILE_FIELDS = "id, name, mimeType, parents, trashed, size, md5Checksum, sha256Checksum"
+
+def get_credentials():
     creds = None
     # The file token.pickle stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
@@ -35,44 +46,181 @@ def get_gdrive_service():
         with open('token.pickle', 'wb') as token:
             pickle.dump(creds, token)
 
-    return build('drive', 'v3', credentials=creds)
+    return creds
+
+def get_gdrive_service():
+    return build('drive', 'v3', credentials=get_credentials())
+
+def _file_md5(path, block_size=DOWNLOAD_CHUNK_SIZE):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _is_audio(item):
+    return item.get('mimeType', '').startswith('audio/') or item.get('name', '').lower().endswith(AUDIO_EXTENSIONS)
+
+# --- Listing: full paginated listing (first sync) or Changes API deltas ---
+def list_folder(session, folder_id):
+    query = f"'{folder_id}' in parents and trashed = false"
+    items, page_token = [], None
+    while True:
+        params = {"q": query, "fields": f"nextPageToken, files({FILE_FIELDS})", "pageSize": 1000}
+        if page_token:
+            params["pageToken"] = page_token
+        response = session.get(f"{DRIVE_API_URL}/files", params=params, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        items.extend(data.get('files', []))
+        page_token = data.get('nextPageToken')
+        if not page_token:
+            return items
+
+def get_start_page_token(session):
+    response = session.get(f"{DRIVE_API_URL}/changes/startPageToken", timeout=30)
+    response.raise_for_status()
+    return response.json()['startPageToken']
+
+def list_changes(session, page_token, folder_id):
+    """
+    Returns (files changed inside folder_id since page_token, token to store for the next sync).
+    """
+    items = []
+    while True:
+        params = {
+            "pageToken": page_token,
+            "fields": f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))",
+            "pageSize": 1000,
+            "spaces": "drive",
+        }
+        response = session.get(f"{DRIVE_API_URL}/changes", params=params, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        for change in data.get('changes', []):
+            item = change.get('file')
+            if change.get('removed') or not item or item.get('trashed'):
+                continue
+            if folder_id in item.get('parents', []):
+                items.append(item)
+        if data.get('newStartPageToken'):
+            return items, data['newStartPageToken']
+        page_token = data['nextPageToken']
+
+# --- Download: streamed straight to disk, resumable via HTTP Range ---
+def download_file(session, item, target_dir):
+    file_path = os.path.join(target_dir, item['name'])
+    part_path = file_path + ".part"
+    expected_size = int(item['size']) if item.get('size') else None
+
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with session.get(f"{DRIVE_API_URL}/files/{item['id']}", params={"alt": "media"},
+                             headers=headers, stream=True, timeout=(10, 300)) as response:
+                if response.status_code == 416 and expected_size == offset:
+                    break # the partial file is already complete
+                response.raise_for_status()
+                # Server ignored the Range header: start over
+                mode = "ab" if offset and response.status_code == 206 else "wb"
+                # read1 returns whatever has arrived (up to the chunk size), so bytes received before a
+                # dropped connection are already on disk and the retry resumes from there
+                read = getattr(response.raw, "read1", response.raw.read)
+                with open(part_path, mode) as f:
+                    while True:
+                        chunk = read(DOWNLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        f.flush()
+            if expected_size is None or os.path.getsize(part_path) == expected_size:
+                break
+        except Exception as e:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+            print(f"Download of {item['name']} interrupted ({e}), resuming (attempt {attempt + 1})")
+    else:
+        raise IOError(f"Incomplete download: {item['name']}")
 
-def sync_from_gdrive(folder_id, target_dir="data/temp"):
+    os.replace(part_path, file_path)
+    return file_path
+
+def sync_from_gdrive(folder_id, target_dir="data/inbox", session=None, max_workers=MAX_DOWNLOAD_WORKERS):
+    """
+    Incremental sync: the first run lists the whole folder (all pages) and stores a Changes API
+    start page token; later runs only fetch what changed since that token.
+    Downloads run concurrently on a bounded pool. The token only advances when every download
+    succeeded, so failed files are picked up again on the next sync.
+    """
     if not folder_id:
         return "Folder ID is missing."
-    
+
+    with stage_timer("drive_sync") as info:
+        result = _sync(folder_id, target_dir, session, max_workers, info)
+        if result.startswith("Error"):
+            info["outcome"] = "error"
+        return result
+
+def _sync(folder_id, target_dir, session, max_workers, info):
     try:
-        service = get_gdrive_service()
+        session = session or AuthorizedSession(get_credentials())
         os.makedirs(target_dir, exist_ok=True)
-        
-        # List files in the folder
-        query = f"'{folder_id}' in parents and (mimeType contains 'audio/' or name contains '.mp3' or name contains '.wav' or name contains '.m4a')"
-        results = service.files().list(q=query, fields="files(id, name)").execute()
-        items = results.get('files', [])
 
-        if not items:
-            return "No audio files found in the specified folder."
+        token_key = f"gdrive_page_token:{folder_id}"
+        page_token = get_setting(token_key)
+        if page_token:
+            items, next_token = list_changes(session, page_token, folder_id)
+        else:
+            # Take the token before listing so changes made during the listing are not missed
+            next_token = get_start_page_token(session)
+            items = list_folder(session, folder_id)
+
+        # file id -> md5 of the version last downloaded (survives the inbox file being consumed)
+        synced_key = f"gdrive_synced:{folder_id}"
+        synced = json.loads(get_setting(synced_key) or "{}")
+        previously_synced = dict(synced)
 
-        count = 0
+        pending = []
         for item in items:
-            file_id = item['id']
-            file_name = item['name']
-            file_path = os.path.join(target_dir, file_name)
-            
-            if os.path.exists(file_path):
-                continue # Skip already downloaded files
-                
-            request = service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while done is False:
-                status, done = downloader.next_chunk()
-            
-            with open(file_path, "wb") as f:
-                f.write(fh.getvalue())
-            count += 1
+            if not _is_audio(item):
+                continue
+            md5 = item.get('md5Checksum')
+            if md5 and synced.get(item['id']) == md5:
+                continue # Unchanged since the last sync
+            local_path = os.path.join(target_dir, item['name'])
+            if os.path.exists(local_path):
+                if not md5 or _file_md5(local_path) == md5:
+                    synced[item['id']] = md5
+                    continue # Skip already downloaded files
+                # Same name but the content changed on Drive: download it again
+            # Skip files whose content is already archived (e.g. phones re-syncing the same recording)
+            if find_transcript_by_hash(item.get('sha256Checksum')):
+                continue
+            pending.append(item)
+
+        count, errors = 0, []
+        info["bytes"] = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(download_file, session, item, target_dir): item for item in pending}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    future.result()
+                    count += 1
+                    info["bytes"] += int(item.get('size') or 0)
+                    synced[item['id']] = item.get('md5Checksum')
+                except Exception as e:
+                    errors.append(f"{item['name']}: {e}")
+
+        if synced != previously_synced:
+            save_setting(synced_key, json.dumps(synced))
+        if errors:
+            return f"Error: synced {count} files, {len(errors)} failed ({'; '.join(errors)})"
 
+        save_setting(token_key, next_token)
+        if not pending:
+            return "No new audio files found in the specified folder."
         return f"Successfully synced {count} new files to {target_dir}."
     
     except Exception as e:
@@ -0,0 +1,227 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from database import SessionLocal, Job, Recording, RECORDING_FAILED
+
+# 워커가 이 시간 안에 lease를 갱신하지 않으면 작업이 죽은 것으로 보고 다시 큐에 넣음
+LEASE_SECONDS = 60
+ACTIVE_STATUSES = ("queued", "running")
+
+# 작업 등록 시점에 payload["config"]로 스냅샷하는 설정 키
+PIPELINE_CONFIG_KEYS = (
+    "whisper_model", "whisper_device", "whisper_compute", "whisper_autotune", "long_audio_parallel", "ollama_url", "embed_model",
+    "auto_delete",
+)
+
+def pipeline_config(settings):
+    """
+    설정(dict 또는 st.session_state)에서 워커에 넘길 STT 설정만 골라냅니다.
+    """
+    return {key: settings.get(key) for key in PIPELINE_CONFIG_KEYS}
+
+def _job_to_dict(job):
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "payload": job.payload or {},
+        "result": job.result or {},
+        "error": job.error,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+def _normalize_path(path):
+    # 상대 경로(data/temp/..)와 감시 폴더의 절대 경로가 같은 파일로 비교되도록
+    return os.path.realpath(path)
+
+def _normalize_payload(payload):
+    payload = dict(payload)
+    if payload.get("input_path"):
+        payload["input_path"] = _normalize_path(payload["input_path"])
+    if payload.get("input_paths"):
+        payload["input_paths"] = [_normalize_path(p) for p in payload["input_paths"]]
+    return payload
+
+# --- 1. UI 측: 등록 및 조회 ---
+def enqueue_job(kind, payload, max_attempts=3):
+    """
+    작업을 큐에 등록하고 job id를 반환합니다. 입력 경로는 절대 경로(realpath)로 저장됩니다.
+    """
+    db = SessionLocal()
+    try:
+        job = Job(kind=kind, status="queued", payload=_normalize_payload(payload), result={}, max_attempts=max_attempts)
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+def has_active_job(input_path=None, content_hash=None):
+    """
+    같은 입력 파일(단일/배치 작업 모두) 또는 같은 내용 해시로 대기/처리 중인 작업이 있는지 (감시 폴더 중복 등록 방지)
+    """
+    target = _normalize_path(input_path) if input_path else None
+    db = SessionLocal()
+    try:
+        # 활성 작업은 많지 않으므로 payload를 읽어 경로를 정규화한 뒤 비교 (이전에 상대 경로로 등록된 작업 포함)
+        rows = db.query(Job.payload, Job.result).filter(Job.status.in_(ACTIVE_STATUSES)).all()
+    finally:
+        db.close()
+    for payload, result in rows:
+        payload, result = payload or {}, result or {}
+        if target:
+            paths = [payload["input_path"]] if payload.get("input_path") else payload.get("input_paths") or []
+            if any(_normalize_path(p) == target for p in paths):
+                return True
+        if content_hash and content_hash in (payload.get("content_hash"), result.get("content_hash")):
+            return True
+    return False
+
+def get_job(job_id):
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        return _job_to_dict(job) if job else None
+    finally:
+        db.close()
+
+def count_jobs_ahead(job_id):
+    """
+    해당 작업보다 먼저 대기 중인 작업 수
+    """
+    db = SessionLocal()
+    try:
+        return db.query(Job).filter(Job.status == "queued", Job.id < job_id).count()
+    finally:
+        db.close()
+
+# --- 2. 워커 측: 점유(lease) / 갱신 / 완료 / 실패 ---
+def _claimable_filter(now):
+    return or_(
+        Job.status == "queued",
+        and_(Job.status == "running", Job.lease_until < now, Job.attempts < Job.max_attempts),
+    )
+
+def _mark_recording_failed(db, job):
+    """
+    실패한 작업이 STT 도중 만든 처리 중(processed=0) Recording을 실패로 표시합니다 (호출한 쪽에서 commit).
+    """
+    recording_id = (job.result or {}).get("recording_id")
+    if recording_id:
+        db.query(Recording).filter(Recording.id == recording_id, Recording.processed == 0).update(
+            {"processed": RECORDING_FAILED}, synchronize_session=False
+        )
+
+def _reap_expired(db, now):
+    # lease가 만료됐는데 재시도 횟수도 소진한 작업은 실패 처리
+    expired = db.query(Job).filter(
+        Job.status == "running", Job.lease_until < now, Job.attempts >= Job.max_attempts
+    ).all()
+    for job in expired:
+        job.status = "failed"
+        job.error = "워커 응답 없음 (lease 만료)"
+        job.worker_id = None
+        job.lease_until = None
+        _mark_recording_failed(db, job)
+    if expired:
+        db.commit()
+
+def claim_job(worker_id, lease_seconds=LEASE_SECONDS):
+    """
+    대기 중이거나 lease가 만료된 작업 하나를 원자적으로 점유합니다. 없으면 None.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        _reap_expired(db, now)
+
+        candidates = db.query(Job.id).filter(_claimable_filter(now)).order_by(Job.id).limit(5).all()
+        for (job_id,) in candidates:
+            # 조건부 UPDATE가 1건 반영된 워커만 작업을 가져감 (다른 프로세스와의 경쟁 방지)
+            claimed = db.query(Job).filter(Job.id == job_id, _claimable_filter(now)).update(
+                {
+                    "status": "running",
+                    "worker_id": worker_id,
+                    "lease_until": now + timedelta(seconds=lease_seconds),
+                    "attempts": Job.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            if claimed:
+                return _job_to_dict(db.get(Job, job_id))
+        return None
+    finally:
+        db.close()
+
+def renew_lease(job_id, worker_id, lease_seconds=LEASE_SECONDS):
+    """
+    lease를 연장합니다. 이미 다른 워커에게 넘어갔으면 False.
+    """
+    db = SessionLocal()
+    try:
+        updated = db.query(Job).filter(
+            Job.id == job_id, Job.worker_id == worker_id, Job.status == "running"
+        ).update(
+            {"lease_until": datetime.utcnow() + timedelta(seconds=lease_seconds)},
+            synchronize_session=False,
+        )
+        db.commit()
+        return bool(updated)
+    finally:
+        db.close()
+
+def update_job_result(job_id, worker_id, **fields):
+    """
+    진행 단계나 중간 산출물(optimized_path 등)을 result에 병합 저장합니다.
+    재시도 시 이미 끝난 단계를 건너뛰는 데 사용됩니다.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if not job or job.worker_id != worker_id:
+            return False
+        job.result = {**(job.result or {}), **fields}
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+def complete_job(job_id, worker_id, **fields):
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if not job or job.worker_id != worker_id:
+            return False
+        job.status = "done"
+        job.result = {**(job.result or {}), **fields, "stage": "done"}
+        job.error = None
+        job.lease_until = None
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+def fail_job(job_id, worker_id, error):
+    """
+    재시도 횟수가 남아 있으면 다시 queued로, 아니면 failed로 전환합니다.
+    failed가 되면 작업이 만든 처리 중 기록도 실패로 표시합니다.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if not job or job.worker_id != worker_id:
+            return False
+        job.status = "queued" if job.attempts < job.max_attempts else "failed"
+        job.error = str(error)
+        job.worker_id = None
+        job.lease_until = None
+        if job.status == "failed":
+            _mark_recording_failed(db, job)
+        db.commit()
+        return True
+    finally:
+        db.close()
@@ -0,0 +1,145 @@
+import json
+import time
+import threading
+from collections import deque
+from functools import lru_cache
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import openai
+
+# 공용 LLM 클라이언트: 커넥션 풀(keep-alive) + 재시도/백오프 + 스트리밍 + 호출별 지표
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 120
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+
+_session = None
+_session_lock = threading.Lock()
+_recent_calls = deque(maxlen=100)
+
+def get_session():
+    """
+    프로세스 전역에서 공유하는 requests.Session (호스트별 커넥션 재사용)
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=MAX_RETRIES,
+                backoff_factor=BACKOFF_FACTOR,
+                status_forcelist=[429, 502, 503, 504],
+                allowed_methods=["GET", "POST"],
+            )
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+def _timeout(timeout):
+    # 숫자 하나면 읽기 타임아웃으로 보고 연결 타임아웃은 짧게 유지
+    if timeout is None:
+        return (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if isinstance(timeout, (int, float)):
+        return (min(CONNECT_TIMEOUT, timeout), timeout)
+    return timeout
+
+def get_json(url, timeout=None):
+    response = get_session().get(url, timeout=_timeout(timeout))
+    response.raise_for_status()
+    return response.json()
+
+def post_json(url, payload, timeout=None):
+    response = get_session().post(url, json=payload, timeout=_timeout(timeout))
+    response.raise_for_status()
+    return response.json()
+
+# --- 호출 지표 (TTFT, tokens/sec) ---
+def _new_stats(engine, model, stats):
+    stats = stats if stats is not None else {}
+    stats.update({"engine": engine, "model": model, "started": time.perf_counter(), "ttft": None, "tokens": 0})
+    return stats
+
+def _on_token(stats):
+    if stats["ttft"] is None:
+        stats["ttft"] = round(time.perf_counter() - stats["started"], 3)
+    stats["tokens"] += 1
+
+def _finish(stats, eval_count=None, eval_duration_ns=None):
+    elapsed = time.perf_counter() - stats.pop("started")
+    stats["total_seconds"] = round(elapsed, 3)
+    if eval_count and eval_duration_ns:
+        # Ollama가 보고한 생성 토큰 수/시간이 있으면 그것을 사용
+        stats["tokens"] = eval_count
+        stats["tokens_per_sec"] = round(eval_count / (eval_duration_ns / 1e9), 2)
+    else:
+        generation = elapsed - (stats["ttft"] or 0)
+        stats["tokens_per_sec"] = round(stats["tokens"] / generation, 2) if generation > 0 else 0.0
+    _recent_calls.append(dict(stats))
+    return stats
+
+def get_recent_stats():
+    return list(_recent_calls)
+
+# --- Ollama ---
+def _stream_ollama(url, payload, extract, timeout, stats):
+    with get_session().post(url, json={**payload, "stream": True}, stream=True, timeout=_timeout(timeout)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line.decode("utf-8"))
+            if data.get("error"):
+                raise RuntimeError(data["error"])
+            token = extract(data)
+            if token:
+                _on_token(stats)
+                yield token
+            if data.get("done"):
+                # 이번 호출에서 새로 계산한 프롬프트 토큰 수 (KV 캐시를 재사용한 앞부분만큼 줄어듦)
+                stats["prompt_tokens"] = data.get("prompt_eval_count")
+                _finish(stats, data.get("eval_count"), data.get("eval_duration"))
+                return
+    _finish(stats)
+
+def stream_generate(base_url, model, prompt, timeout=None, stats=None, **extra):
+    """
+    Ollama /api/generate 토큰 스트림. stats dict에 ttft, tokens_per_sec 등이 기록됩니다.
+    """
+    stats = _new_stats("ollama", model, stats)
+    payload = {"model": model, "prompt": prompt, **extra}
+    yield from _stream_ollama(f"{base_url}/api/generate", payload, lambda d: d.get("response"), timeout, stats)
+
+def stream_chat(base_url, model, messages, timeout=None, stats=None, **extra):
+    """
+    Ollama /api/chat 토큰 스트림
+    """
+    stats = _new_stats("ollama", model, stats)
+    payload = {"model": model, "messages": messages, **extra}
+    yield from _stream_ollama(
+        f"{base_url}/api/chat", payload, lambda d: (d.get("message") or {}).get("content"), timeout, stats
+    )
+
+def generate(base_url, model, prompt, timeout=None, stats=None, **extra):
+    return "".join(stream_generate(base_url, model, prompt, timeout=timeout, stats=stats, **extra))
+
+# --- OpenAI (Fallback) ---
+@lru_cache(maxsize=8)
+def get_openai_client(api_key, timeout=READ_TIMEOUT):
+    # 클라이언트 내부 httpx 커넥션 풀을 재사용하도록 키별로 하나만 생성
+    return openai.OpenAI(api_key=api_key, timeout=timeout, max_retries=MAX_RETRIES)
+
+def stream_openai_chat(api_key, model, messages, timeout=None, stats=None):
+    stats = _new_stats("openai", model, stats)
+    client = get_openai_client(api_key)
+    response = client.chat.completions.create(
+        model=model, messages=messages, stream=True, timeout=_timeout(timeout)[1]
+    )
+    for chunk in response:
+        token = chunk.choices[0].delta.content if chunk.choices else None
+        if token:
+            _on_token(stats)
+            yield token
+    _finish(stats)
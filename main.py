@@ -1,52 +1,79 @@
 import streamlit as st
 import os
 import sys
+import time
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from views.analyze import analyze_page
 from views.chat import chat_page
 from views.history import history_page
+from views.search import search_page
 from views.settings import settings_page
-from database import SessionLocal, SystemConfig, Recording, init_db
+from database import SessionLocal, Recording, init_db
+import config_service
 
 st.set_page_config(page_title="MemoRa", page_icon="🧠", layout="wide")
 
-# DB 초기화
+# DB 초기화 (프로세스당 한 번만 실행되고 이후 rerun에서는 바로 반환)
+rerun_started = time.perf_counter()
 init_db()
 
 # === Zero-Config DB 영속성 관리 ===
 def load_settings():
-    db = SessionLocal()
-    try:
-        configs = db.query(SystemConfig).all()
-        db_settings = {c.key: c.value for c in configs}
-        
-        defaults = {
-            "whisper_model": "base",
-            "whisper_device": "cpu",
-            "whisper_compute": "int8",
-            "ollama_url": os.getenv("OLLAMA_URL", "http://localhost:11434"),
-            "ollama_model": "gemma2:2b",
-            "auto_delete": "True",
-            "api_key": "",
-            "gdrive_folder_id": ""
-        }
-        
-        for key, default_val in defaults.items():
-            # DB에 있으면 DB값, 없으면 기본값 사용
-            val = db_settings.get(key, default_val)
-            # Boolean 처리
-            if val == "True": val = True
-            elif val == "False": val = False
-            
-            if key not in st.session_state:
-                st.session_state[key] = val
-    finally:
-        db.close()
+    # 프로세스 전역 캐시에서 읽으므로 설정이 바뀌지 않았으면 DB 조회 없음
+    settings = config_service.get_settings()
+    for key, val in settings.items():
+        if key not in st.session_state:
+            st.session_state[key] = val
+
+def pipeline_dashboard():
+    """
+    단계별 처리 시간(p50/p95), 실시간 배율(RTF), 작업 큐 길이 추이
+    """
+    import pandas as pd
+    import metrics
+
+    st.markdown("---")
+    st.subheader("⏱️ 파이프라인 성능")
+    windows = {"최근 1시간": 1, "최근 24시간": 24, "최근 7일": 24 * 7}
+    hours = windows[st.selectbox("기간", list(windows), index=1)]
+
+    summary = metrics.stage_summary(hours)
+    if not summary:
+        st.info("아직 기록된 처리 지표가 없습니다.")
+        return
+
+    stt = next((s for s in summary if s["stage"] == "stt"), None)
+    col1, col2, col3 = st.columns(3)
+    with col1: st.metric("STT 실시간 배율 (RTF)", f"{stt['rtf']:.2f}" if stt and stt["rtf"] else "-")
+    with col2: st.metric("STT p95", f"{stt['p95']:.1f}s" if stt else "-")
+    with col3: st.metric("처리 오류", f"{sum(s['errors'] for s in summary)} 건")
+
+    st.dataframe(
+        pd.DataFrame([{
+            "단계": s["stage"], "실행": s["runs"], "오류": s["errors"],
+            "p50 (s)": round(s["p50"], 3), "p95 (s)": round(s["p95"], 3),
+            "RTF": round(s["rtf"], 3) if s["rtf"] else None,
+        } for s in summary]),
+        hide_index=True, use_container_width=True,
+    )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.caption("STT 실시간 배율 추이 (1보다 작으면 실시간보다 빠름)")
+        rtf = metrics.rtf_series("stt", hours)
+        if rtf:
+            st.line_chart(pd.DataFrame(rtf, columns=["time", "RTF"]).set_index("time"))
+    with col2:
+        st.caption("대기 중인 작업 수 추이")
+        depth = metrics.sample_series("queue_depth", hours)
+        if depth:
+            st.line_chart(pd.DataFrame(depth, columns=["time", "queue"]).set_index("time"))
 
 def main():
     load_settings() # 앱 실행 시 DB에서 설정 로드
+    rerun_overhead_ms = (time.perf_counter() - rerun_started) * 1000
 
     with st.sidebar:
         st.title("🧠 MemoRa")
@@ -55,12 +82,17 @@ def main():
         
         menu = st.radio(
             "메뉴",
-            ["Dashboard", "Analyze (분석)", "Chat (비서)", "History (기록)", "Settings (설정)"],
+            ["Dashboard", "Analyze (분석)", "Chat (비서)", "History (기록)", "Search (검색)", "Settings (설정)"],
         )
         
         st.markdown("---")
         st.caption(f"🔧 Engine: {st.session_state.whisper_model}")
         st.caption(f"🧠 LLM: {st.session_state.ollama_model}")
+        config_stats = config_service.get_stats()
+        st.caption(
+            f"⏱️ 설정/스키마 오버헤드 {rerun_overhead_ms:.1f} ms "
+            f"(스키마 초기화 {config_stats['init']['seconds'] or 0:.2f}s 1회, 설정 캐시 적중 {config_stats['hits']}회 / 로드 {config_stats['loads']}회)"
+        )
 
         # --- Disk Usage Monitoring ---
         import shutil
@@ -91,12 +123,16 @@ def main():
         with col2: st.metric("LLM Model", st.session_state.ollama_model)
         with col3: st.metric("Saved Recordings", f"{total_count} 건")
 
+        pipeline_dashboard()
+
     elif "Analyze" in menu:
         analyze_page()
     elif "Chat" in menu:
         chat_page()
     elif "History" in menu:
         history_page()
+    elif "Search" in menu:
+        search_page()
     elif "Settings" in menu:
         settings_page()
 
@@ -0,0 +1,244 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from database import SessionLocal, StageMetric, MetricSample, Job
+
+# 파이프라인 단계별 계측
+# - 각 프로세스(UI, 워커, API)는 단계 실행 결과를 stage_metrics 테이블에 한 행씩 기록
+# - 조회하는 프로세스는 새로 쌓인 행만 읽어 메모리 히스토그램에 누적 (Prometheus 카운터처럼 단조 증가)
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+QUEUE_SAMPLE_SECONDS = 30
+RETENTION_DAYS = 30
+
+_lock = threading.Lock()
+_last_id = 0
+_histograms = {} # (stage, outcome) -> {"buckets": [...], "sum": float, "count": int}
+_totals = {} # stage -> {"audio_seconds": float, "bytes": int}
+
+# --- 1. 기록 ---
+def record_stage(stage, duration, audio_seconds=None, bytes=None, outcome="ok", job_id=None):
+    """
+    단계 실행 한 건을 기록합니다. 계측 실패가 파이프라인을 멈추지 않도록 오류는 무시합니다.
+    """
+    db = SessionLocal()
+    try:
+        db.add(StageMetric(
+            stage=stage, outcome=outcome, duration=duration,
+            audio_seconds=audio_seconds, bytes=int(bytes) if bytes is not None else None, job_id=job_id,
+        ))
+        db.commit()
+    except Exception as e:
+        print(f"⚠️ 지표 기록 실패 ({stage}): {e}")
+    finally:
+        db.close()
+
+@contextmanager
+def stage_timer(stage, audio_seconds=None, bytes=None, job_id=None):
+    """
+    with 블록의 실행 시간을 기록합니다. 블록 안에서 반환된 dict에 audio_seconds/bytes/outcome을 채울 수 있습니다.
+    예외가 나면 outcome="error"로 기록하고 예외는 그대로 전달합니다.
+    """
+    info = {"audio_seconds": audio_seconds, "bytes": bytes, "outcome": "ok"}
+    started = time.perf_counter()
+    try:
+        yield info
+    except BaseException:
+        info["outcome"] = "error"
+        raise
+    finally:
+        record_stage(stage, time.perf_counter() - started, info["audio_seconds"], info["bytes"], info["outcome"], job_id)
+
+def record_sample(name, value):
+    db = SessionLocal()
+    try:
+        db.add(MetricSample(name=name, value=value))
+        db.commit()
+    except Exception as e:
+        print(f"⚠️ 지표 기록 실패 ({name}): {e}")
+    finally:
+        db.close()
+
+def count_queued_jobs():
+    db = SessionLocal()
+    try:
+        return db.query(Job).filter(Job.status == "queued").count()
+    finally:
+        db.close()
+
+def prune(days=RETENTION_DAYS):
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    db = SessionLocal()
+    try:
+        db.query(StageMetric).filter(StageMetric.created_at < cutoff).delete(synchronize_session=False)
+        db.query(MetricSample).filter(MetricSample.created_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def sample_loop(stop_event, interval=QUEUE_SAMPLE_SECONDS):
+    """
+    큐 길이를 주기적으로 기록합니다 (워커 supervisor에서 스레드로 실행). 하루에 한 번 오래된 지표를 정리합니다.
+    """
+    last_prune = 0.0
+    while not stop_event.wait(interval):
+        try:
+            record_sample("queue_depth", count_queued_jobs())
+            if time.monotonic() - last_prune > 86400:
+                prune()
+                last_prune = time.monotonic()
+        except Exception as e:
+            print(f"⚠️ 큐 길이 기록 실패: {e}")
+
+# --- 2. 메모리 히스토그램 ---
+def _fold_new_rows():
+    """
+    마지막으로 읽은 이후 쌓인 행만 히스토그램에 더합니다.
+    """
+    global _last_id
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(StageMetric.id, StageMetric.stage, StageMetric.outcome, StageMetric.duration,
+                     StageMetric.audio_seconds, StageMetric.bytes)
+            .filter(StageMetric.id > _last_id)
+            .order_by(StageMetric.id)
+            .all()
+        )
+    finally:
+        db.close()
+
+    for row_id, stage, outcome, duration, audio_seconds, size in rows:
+        hist = _histograms.setdefault((stage, outcome or "ok"), {
+            "buckets": [0] * len(HISTOGRAM_BUCKETS), "sum": 0.0, "count": 0,
+        })
+        duration = duration or 0.0
+        index = bisect.bisect_left(HISTOGRAM_BUCKETS, duration)
+        if index < len(HISTOGRAM_BUCKETS):
+            hist["buckets"][index] += 1
+        hist["sum"] += duration
+        hist["count"] += 1
+        totals = _totals.setdefault(stage, {"audio_seconds": 0.0, "bytes": 0})
+        totals["audio_seconds"] += audio_seconds or 0.0
+        totals["bytes"] += size or 0
+        _last_id = row_id
+
+def _job_counts():
+    db = SessionLocal()
+    try:
+        return dict(db.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+    finally:
+        db.close()
+
+def render_prometheus():
+    """
+    Prometheus text exposition format (0.0.4)
+    """
+    with _lock:
+        _fold_new_rows()
+        lines = [
+            "# HELP memora_stage_duration_seconds Pipeline stage duration.",
+            "# TYPE memora_stage_duration_seconds histogram",
+        ]
+        for (stage, outcome), hist in sorted(_histograms.items()):
+            labels = f'stage="{stage}",outcome="{outcome}"'
+            cumulative = 0
+            for bound, count in zip(HISTOGRAM_BUCKETS, hist["buckets"]):
+                cumulative += count
+                lines.append(f'memora_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'memora_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {hist["count"]}')
+            lines.append(f"memora_stage_duration_seconds_sum{{{labels}}} {hist['sum']:.6f}")
+            lines.append(f"memora_stage_duration_seconds_count{{{labels}}} {hist['count']}")
+
+        lines += [
+            "# HELP memora_stage_audio_seconds_total Audio seconds processed per stage.",
+            "# TYPE memora_stage_audio_seconds_total counter",
+        ]
+        lines += [f'memora_stage_audio_seconds_total{{stage="{s}"}} {t["audio_seconds"]:.3f}' for s, t in sorted(_totals.items())]
+        lines += [
+            "# HELP memora_stage_bytes_total Bytes processed per stage.",
+            "# TYPE memora_stage_bytes_total counter",
+        ]
+        lines += [f'memora_stage_bytes_total{{stage="{s}"}} {t["bytes"]}' for s, t in sorted(_totals.items())]
+
+    counts = _job_counts()
+    lines += ["# HELP memora_jobs Jobs by status.", "# TYPE memora_jobs gauge"]
+    lines += [f'memora_jobs{{status="{status}"}} {counts.get(status, 0)}' for status in ("queued", "running", "done", "failed")]
+    lines += ["# HELP memora_queue_depth Queued jobs.", "# TYPE memora_queue_depth gauge", f"memora_queue_depth {counts.get('queued', 0)}"]
+    return "\n".join(lines) + "\n"
+
+# --- 3. 대시보드용 요약 ---
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+def stage_summary(hours=24):
+    """
+    최근 hours 시간의 단계별 실행 수, 오류 수, p50/p95 지연, 실시간 배율(RTF)
+    """
+    since = datetime.utcnow() - timedelta(hours=hours)
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(StageMetric.stage, StageMetric.outcome, StageMetric.duration, StageMetric.audio_seconds)
+            .filter(StageMetric.created_at >= since)
+            .all()
+        )
+    finally:
+        db.close()
+
+    by_stage = {}
+    for stage, outcome, duration, audio_seconds in rows:
+        entry = by_stage.setdefault(stage, {"durations": [], "errors": 0, "duration_with_audio": 0.0, "audio_seconds": 0.0})
+        entry["durations"].append(duration or 0.0)
+        if outcome == "error":
+            entry["errors"] += 1
+        if audio_seconds:
+            entry["duration_with_audio"] += duration or 0.0
+            entry["audio_seconds"] += audio_seconds
+
+    summary = []
+    for stage, entry in sorted(by_stage.items()):
+        durations = sorted(entry["durations"])
+        summary.append({
+            "stage": stage,
+            "runs": len(durations),
+            "errors": entry["errors"],
+            "p50": _percentile(durations, 0.5),
+            "p95": _percentile(durations, 0.95),
+            # RTF < 1 이면 실시간보다 빠름
+            "rtf": entry["duration_with_audio"] / entry["audio_seconds"] if entry["audio_seconds"] else None,
+        })
+    return summary
+
+def rtf_series(stage="stt", hours=24):
+    """
+    [(시각, RTF), ...] 단계 실행별 실시간 배율 추이
+    """
+    since = datetime.utcnow() - timedelta(hours=hours)
+    db = SessionLocal()
+    try:
+        return [
+            (created_at, duration / audio_seconds)
+            for created_at, duration, audio_seconds in db.query(
+                StageMetric.created_at, StageMetric.duration, StageMetric.audio_seconds
+            ).filter(
+                StageMetric.stage == stage, StageMetric.created_at >= since, StageMetric.audio_seconds > 0
+            ).order_by(StageMetric.created_at)
+        ]
+    finally:
+        db.close()
+
+def sample_series(name="queue_depth", hours=24):
+    since = datetime.utcnow() - timedelta(hours=hours)
+    db = SessionLocal()
+    try:
+        return db.query(MetricSample.created_at, MetricSample.value).filter(
+            MetricSample.name == name, MetricSample.created_at >= since
+        ).order_by(MetricSample.created_at).all()
+    finally:
+        db.close()
@@ -0,0 +1,248 @@
+import gc
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from database import SessionLocal, SystemConfig
+
+# Whisper 모델 레지스트리 (프로세스 단위)
+# - 메모리 예산을 넘으면 가장 오래 쓰지 않은 모델부터 내림 (LRU)
+# - 로드 직후 짧은 무음으로 워밍업하여 첫 요청 지연 제거
+# - 일정 시간 쓰지 않은 모델은 자동으로 내림
+# - 긴 녹음 청크 변환처럼 다른 프로세스가 로드하는 모델도 reserve()로 같은 예산에 포함
+MEMORY_BUDGET_MB = int(os.getenv("MEMORA_MODEL_BUDGET_MB", "4096"))
+IDLE_TIMEOUT_SECONDS = int(os.getenv("MEMORA_MODEL_IDLE_SECONDS", "900"))
+REAPER_INTERVAL_SECONDS = 30
+STATUS_KEY_PREFIX = "_model_status:" # SystemConfig에 프로세스별 상주 모델 현황 기록
+STATUS_STALE_SECONDS = REAPER_INTERVAL_SECONDS * 4
+
+# RSS를 측정할 수 없을 때 쓰는 대략적인 상주 메모리 (MB, int8 기준)
+ESTIMATED_MEMORY_MB = {
+    "tiny": 150, "base": 250, "small": 600, "medium": 1500,
+    "large-v1": 3000, "large-v2": 3000, "large-v3": 3000, "turbo": 1700,
+}
+COMPUTE_MEMORY_FACTOR = {"int8": 1.0, "int8_float16": 1.2, "float16": 1.8, "float32": 3.5}
+
+_models = OrderedDict() # key -> {"model", "memory_mb", "loaded_at", "last_used", "load_seconds", "warmup_seconds"}
+_lock = threading.RLock()
+_busy = 0
+_reserved_mb = 0 # reserve()로 잡아 둔, 이 프로세스 밖(청크 변환 프로세스)에서 로드된 모델 메모리
+_reaper = None
+_owner = None
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _estimate_mb(key):
+    size, _, compute = key[:3]
+    base = ESTIMATED_MEMORY_MB.get(os.path.basename(str(size)), ESTIMATED_MEMORY_MB["large-v3"])
+    return base * COMPUTE_MEMORY_FACTOR.get(compute, 1.0)
+
+def _key(model_args):
+    # cpu_threads 0 = CTranslate2 기본값 (자동 튜닝 프로필이 있으면 그 값)
+    return (
+        model_args["model_size_or_path"], model_args.get("device", "cpu"), model_args.get("compute_type", "int8"),
+        int(model_args.get("cpu_threads") or 0), int(model_args.get("num_workers") or 1),
+    )
+
+def warmup(model):
+    """
+    1초 무음으로 한 번 추론하여 커널/버퍼 초기화 비용을 미리 치릅니다.
+    """
+    import numpy as np
+    segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1, vad_filter=False)
+    for _ in segments:
+        pass
+
+def _unload(key, reason):
+    entry = _models.pop(key)
+    del entry["model"]
+    gc.collect()
+    print(f"📤 Whisper 모델 해제 {key[0]} ({key[1]}/{key[2]}, 약 {entry['memory_mb']:.0f} MB): {reason}")
+
+def _evict_for(needed_mb, budget_mb):
+    while _models and sum(e["memory_mb"] for e in _models.values()) + needed_mb > budget_mb:
+        _unload(next(iter(_models)), "메모리 예산 초과 (LRU)")
+
+def get_model(model_args, budget_mb=None, do_warmup=True):
+    """
+    (크기, 장치, 정밀도)별 WhisperModel을 반환합니다. 필요하면 예산에 맞게 다른 모델을 내린 뒤 로드합니다.
+    """
+    key = _key(model_args)
+    budget_mb = budget_mb or MEMORY_BUDGET_MB
+    with _lock:
+        entry = _models.get(key)
+        if entry:
+            _models.move_to_end(key)
+            entry["last_used"] = time.time()
+            return entry["model"]
+
+        from faster_whisper import WhisperModel
+
+        estimate = _estimate_mb(key)
+        _evict_for(estimate + _reserved_mb, budget_mb)
+        if estimate > budget_mb:
+            print(f"⚠️ {key[0]} 모델(약 {estimate:.0f} MB)이 메모리 예산 {budget_mb} MB보다 큽니다.")
+
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        model = WhisperModel(key[0], device=key[1], compute_type=key[2], cpu_threads=key[3], num_workers=key[4])
+        load_seconds = time.perf_counter() - started
+        warmup_seconds = None
+        if do_warmup:
+            started = time.perf_counter()
+            warmup(model)
+            warmup_seconds = round(time.perf_counter() - started, 2)
+        rss_after = _rss_mb()
+        measured = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+
+        now = time.time()
+        _models[key] = {
+            "model": model,
+            # 같은 프로세스에서 해제 후 재로드하면 RSS가 덜 늘 수 있으므로 추정치보다 작게 잡지 않음
+            "memory_mb": max(measured or 0, estimate),
+            "loaded_at": now,
+            "last_used": now,
+            "load_seconds": round(load_seconds, 2),
+            "warmup_seconds": warmup_seconds,
+        }
+        print(f"📥 Whisper 모델 로드 {key[0]} ({key[1]}/{key[2]}): {load_seconds:.1f}s, 워밍업 {warmup_seconds}s")
+        _ensure_reaper()
+        _publish_status()
+        return model
+
+@contextmanager
+def reserve(model_args, count, budget_mb=None):
+    """
+    자식 프로세스가 각자 로드할 모델 count개를 이 프로세스의 예산에 포함시킵니다.
+    예산에 들어가는 개수로 count를 줄이고, 자리를 만들기 위해 상주 모델을 LRU로 내린 뒤 허용된 개수를 yield합니다.
+    """
+    global _reserved_mb
+    budget_mb = budget_mb or MEMORY_BUDGET_MB
+    estimate = _estimate_mb(_key(model_args))
+    count = max(1, min(count, int(budget_mb // estimate)))
+    with _lock:
+        _evict_for(count * estimate + _reserved_mb, budget_mb)
+        _reserved_mb += count * estimate
+    _publish_status()
+    try:
+        yield count
+    finally:
+        with _lock:
+            _reserved_mb -= count * estimate
+        _publish_status()
+
+def preload(model_args_list, budget_mb=None):
+    for model_args in model_args_list:
+        try:
+            get_model(model_args, budget_mb)
+        except Exception as e:
+            print(f"⚠️ 모델 미리 로드 실패 {model_args}: {e}")
+
+@contextmanager
+def hold():
+    """
+    작업 처리 중에는 유휴 해제를 멈춥니다.
+    """
+    global _busy
+    with _lock:
+        _busy += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _busy -= 1
+            # 유휴 시간은 작업이 끝난 시점부터 계산
+            if _models:
+                _models[next(reversed(_models))]["last_used"] = time.time()
+
+def unload_idle(idle_seconds=None):
+    idle_seconds = idle_seconds or IDLE_TIMEOUT_SECONDS
+    with _lock:
+        if _busy:
+            return
+        now = time.time()
+        for key in [k for k, e in _models.items() if now - e["last_used"] > idle_seconds]:
+            _unload(key, f"{idle_seconds}초 동안 사용 안 함")
+
+def _reap_loop():
+    while True:
+        time.sleep(REAPER_INTERVAL_SECONDS)
+        try:
+            unload_idle()
+            _publish_status()
+        except Exception as e:
+            print(f"⚠️ 모델 유휴 해제 오류: {e}")
+
+def _ensure_reaper():
+    global _reaper
+    if _reaper is None or not _reaper.is_alive():
+        _reaper = threading.Thread(target=_reap_loop, name="model-reaper", daemon=True)
+        _reaper.start()
+
+# --- 상주 모델 현황 ---
+def resident_models():
+    with _lock:
+        return [
+            {
+                "model": key[0], "device": key[1], "compute_type": key[2], "cpu_threads": key[3], "num_workers": key[4],
+                "memory_mb": round(e["memory_mb"], 1),
+                "load_seconds": e["load_seconds"], "warmup_seconds": e["warmup_seconds"],
+                "idle_seconds": round(time.time() - e["last_used"]),
+            }
+            for key, e in _models.items()
+        ]
+
+def set_owner(worker_id):
+    """
+    현황을 기록할 워커 이름 (UI 프로세스에서 조회용)
+    """
+    global _owner
+    _owner = worker_id
+
+def _publish_status():
+    if not _owner:
+        return
+    value = json.dumps({
+        "updated_at": time.time(), "budget_mb": MEMORY_BUDGET_MB, "rss_mb": _rss_mb(), "models": resident_models(),
+        "reserved_mb": round(_reserved_mb, 1),
+    })
+    db = SessionLocal()
+    try:
+        # 설정 변경이 아니므로 save_setting(버전 증가)을 거치지 않고 직접 기록
+        db.merge(SystemConfig(key=STATUS_KEY_PREFIX + _owner, value=value))
+        db.commit()
+    finally:
+        db.close()
+
+def get_cluster_status():
+    """
+    살아 있는 워커 프로세스별 상주 모델 현황: {worker_id: {updated_at, budget_mb, rss_mb, models}}
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(SystemConfig).filter(SystemConfig.key.like(STATUS_KEY_PREFIX + "%")).all()
+        now = time.time()
+        status = {}
+        for row in rows:
+            data = json.loads(row.value)
+            if now - data["updated_at"] > STATUS_STALE_SECONDS:
+                # 종료된 워커의 기록은 정리
+                db.delete(row)
+                continue
+            data["updated_at"] = datetime.fromtimestamp(data["updated_at"])
+            status[row.key[len(STATUS_KEY_PREFIX):]] = data
+        db.commit()
+        return status
+    finally:
+        db.close()
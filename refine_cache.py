@@ -0,0 +1,97 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from database import SessionLocal, RefineCacheEntry
+
+# 2단계 캐시: 프로세스 내 LRU -> SQLite(refine_cache 테이블)
+MEMORY_MAX_ENTRIES = 256
+DB_MAX_ENTRIES = 5000
+TTL = timedelta(days=30)
+
+_memory = OrderedDict() # key -> (result, created_at)
+_lock = threading.Lock()
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "evictions": 0}
+
+def make_key(text, prompt_type, engine, model):
+    raw = json.dumps([text, prompt_type, engine, model], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _remember(key, result, created_at):
+    with _lock:
+        _memory[key] = (result, created_at)
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_MAX_ENTRIES:
+            _memory.popitem(last=False)
+            _stats["evictions"] += 1
+
+def get(key):
+    """
+    캐시된 결과를 반환합니다. 없거나 TTL이 지났으면 None.
+    """
+    now = datetime.utcnow()
+    with _lock:
+        entry = _memory.get(key)
+        if entry and now - entry[1] < TTL:
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            return entry[0]
+        if entry:
+            del _memory[key]
+
+    db = SessionLocal()
+    try:
+        row = db.get(RefineCacheEntry, key)
+        if row and now - row.created_at < TTL:
+            row.hits = (row.hits or 0) + 1
+            row.last_used_at = now
+            db.commit()
+            _remember(key, row.result, row.created_at)
+            with _lock:
+                _stats["db_hits"] += 1
+            return row.result
+        if row:
+            db.delete(row)
+            db.commit()
+    finally:
+        db.close()
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+def put(key, prompt_type, engine, model, result):
+    now = datetime.utcnow()
+    _remember(key, result, now)
+
+    db = SessionLocal()
+    try:
+        db.merge(RefineCacheEntry(
+            key=key, prompt_type=prompt_type, engine=engine, model=model,
+            result=result, hits=0, created_at=now, last_used_at=now,
+        ))
+        db.commit()
+        _evict(db, now)
+    finally:
+        db.close()
+
+def _evict(db, now):
+    # TTL이 지난 항목 삭제 후, 최대 개수를 넘으면 가장 오래 쓰이지 않은 항목부터 삭제
+    expired = db.query(RefineCacheEntry).filter(RefineCacheEntry.created_at < now - TTL).delete()
+    overflow = db.query(RefineCacheEntry).count() - DB_MAX_ENTRIES
+    if overflow > 0:
+        stale = select(RefineCacheEntry.key).order_by(RefineCacheEntry.last_used_at).limit(overflow)
+        db.query(RefineCacheEntry).filter(RefineCacheEntry.key.in_(stale)).delete(synchronize_session=False)
+    db.commit()
+    with _lock:
+        _stats["evictions"] += expired + max(overflow, 0)
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+    stats["hit_rate"] = round((stats["memory_hits"] + stats["db_hits"]) / lookups, 3) if lookups else 0.0
+    stats["memory_entries"] = len(_memory)
+    return stats
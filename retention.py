@@ -0,0 +1,239 @@
+import os
+import time
+import shutil
+import subprocess
+from datetime import datetime, timedelta
+from database import SessionLocal, Recording, DEFAULT_SETTINGS
+from job_queue import has_active_job
+from config_service import get_settings
+from metrics import stage_timer
+
+# 저장 공간 보존 정책
+# 1) 오래된 임시 업로드 정리  2) 보관 중인 원본 삭제  3) (tier_after_days > 0이면) 오래된 MP3 보관본을 저비트레이트 Opus로 재인코딩
+# 4) (정책이 켜져 있으면) 가장 오래된 녹음의 오디오 삭제 (텍스트 기록은 유지)
+# 디스크 사용률이 high watermark를 넘으면 low watermark 아래로 내려갈 때까지 단계를 진행합니다.
+TEMP_DIR = "data/temp"
+STORAGE_DIR = "data/storage"
+ORIGINALS_DIR = "data/originals" # auto_delete가 꺼져 있을 때 분석이 끝난 원본을 옮겨 두는 곳
+RETENTION_INTERVAL_SECONDS = 3600
+OPUS_BITRATE = "16k" # 음성 전용 (VoIP 모드)
+TIERED_EXTENSION = ".opus"
+EVICT_POLICIES = ("none", "delete_audio")
+
+def _setting(settings, key, cast):
+    try:
+        return cast(settings.get(key))
+    except (TypeError, ValueError):
+        return cast(DEFAULT_SETTINGS[key])
+
+def disk_usage_percent(path="data"):
+    usage = shutil.disk_usage(path)
+    return usage.used / usage.total * 100
+
+def keep_or_discard_input(input_path, keep_original=False):
+    """
+    분석이 끝난 입력 파일을 삭제하거나(auto_delete) 원본 보관 폴더로 옮깁니다.
+    """
+    if not os.path.exists(input_path):
+        return None
+    if not keep_original:
+        os.remove(input_path)
+        return None
+    os.makedirs(ORIGINALS_DIR, exist_ok=True)
+    target = os.path.join(ORIGINALS_DIR, os.path.basename(input_path))
+    shutil.move(input_path, target)
+    return target
+
+# --- 1. 개별 정리 단계 ---
+def purge_temp(max_age_hours, now=None):
+    """
+    처리 대기/진행 중이 아닌 오래된 임시 파일(.part 포함)을 지웁니다. 반환: 확보한 바이트
+    """
+    now = now or time.time()
+    freed = 0
+    if not os.path.isdir(TEMP_DIR):
+        return 0
+    for name in os.listdir(TEMP_DIR):
+        path = os.path.join(TEMP_DIR, name)
+        if not os.path.isfile(path) or now - os.path.getmtime(path) < max_age_hours * 3600:
+            continue
+        if has_active_job(path):
+            continue
+        freed += os.path.getsize(path)
+        os.remove(path)
+        print(f"🧹 오래된 임시 파일 삭제: {name}")
+    return freed
+
+def purge_originals(target_percent=None, max_files=None):
+    """
+    보관 중인 원본을 오래된 것부터 지웁니다. target_percent가 주어지면 그 사용률 아래로 내려가면 멈춥니다.
+    """
+    if not os.path.isdir(ORIGINALS_DIR):
+        return 0
+    files = sorted(
+        (os.path.join(ORIGINALS_DIR, name) for name in os.listdir(ORIGINALS_DIR)),
+        key=os.path.getmtime,
+    )
+    freed = 0
+    for path in files[:max_files]:
+        if target_percent is not None and disk_usage_percent() < target_percent:
+            break
+        freed += os.path.getsize(path)
+        os.remove(path)
+        print(f"🧹 원본 삭제: {os.path.basename(path)}")
+    return freed
+
+def transcode_to_opus(input_path, output_path, bitrate=OPUS_BITRATE):
+    cmd = [
+        "ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", input_path,
+        "-ac", "1", "-c:a", "libopus", "-b:a", bitrate, "-application", "voip", "-f", "opus", output_path,
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Opus 인코딩 실패: {result.stderr.decode(errors='ignore')}")
+    return output_path
+
+def _tier_recording(rec_id):
+    """
+    녹음 하나를 Opus로 재인코딩하고 Recording.file_path/file_size를 갱신합니다. 반환: 확보한 바이트
+    """
+    db = SessionLocal()
+    try:
+        rec = db.get(Recording, rec_id)
+        old_path = rec.file_path
+        if not old_path or not os.path.exists(old_path) or old_path.endswith(TIERED_EXTENSION):
+            return 0
+        new_path = os.path.splitext(old_path)[0] + TIERED_EXTENSION
+        old_size = os.path.getsize(old_path)
+        # 임시 이름으로 인코딩하고 성공했을 때만 최종 이름으로 교체 (중간에 실패해도 잘린 파일이 남지 않음)
+        tmp_path = new_path + ".tmp"
+        try:
+            transcode_to_opus(old_path, tmp_path)
+            os.replace(tmp_path, new_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        new_size = os.path.getsize(new_path)
+
+        rec.file_path = new_path
+        rec.filename = os.path.basename(new_path)
+        rec.file_size = new_size / (1024*1024)
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            os.remove(new_path)
+            raise
+        # DB가 새 파일을 가리킨 뒤에 이전 파일 삭제
+        os.remove(old_path)
+        print(f"🗜️ Opus 변환: {os.path.basename(old_path)} {old_size / 1024:.0f}KB -> {new_size / 1024:.0f}KB")
+        return old_size - new_size
+    finally:
+        db.close()
+
+def _candidates(older_than=None):
+    """
+    처리 완료된 녹음을 오래된 순으로 (id, file_path)
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(Recording.id, Recording.file_path).filter(
+            Recording.processed == 1, Recording.file_path.isnot(None), Recording.file_path != ""
+        )
+        if older_than:
+            query = query.filter(Recording.created_at < older_than)
+        return query.order_by(Recording.created_at, Recording.id).all()
+    finally:
+        db.close()
+
+def tier_recordings(older_than=None, target_percent=None):
+    """
+    MP3 보관본을 Opus로 바꿉니다. older_than(datetime) 이전 녹음만, 또는 target_percent 아래로 내려갈 때까지.
+    """
+    freed = 0
+    for rec_id, path in _candidates(older_than):
+        if path.endswith(TIERED_EXTENSION):
+            continue
+        if target_percent is not None and disk_usage_percent() < target_percent:
+            break
+        try:
+            freed += _tier_recording(rec_id)
+        except Exception as e:
+            print(f"⚠️ 녹음 #{rec_id} Opus 변환 실패: {e}")
+    return freed
+
+def evict_audio(target_percent):
+    """
+    가장 오래된 녹음의 오디오 파일을 지웁니다. 텍스트/요약은 남고 file_path는 비워집니다.
+    """
+    freed = 0
+    for rec_id, path in _candidates():
+        if disk_usage_percent() < target_percent:
+            break
+        db = SessionLocal()
+        try:
+            rec = db.get(Recording, rec_id)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            rec.file_path = ""
+            rec.file_size = 0
+            db.commit()
+            if os.path.exists(path):
+                os.remove(path)
+            freed += size
+            print(f"🗑️ 오디오 삭제 (기록 유지): {os.path.basename(path)}")
+        finally:
+            db.close()
+    return freed
+
+# --- 2. 실행 ---
+def run_retention(settings=None):
+    """
+    보존 정책을 한 번 실행하고 단계별 확보 용량과 전후 디스크 사용률을 반환합니다.
+    """
+    settings = settings or get_settings()
+    high = _setting(settings, "disk_high_watermark", float)
+    low = _setting(settings, "disk_low_watermark", float)
+    tier_days = _setting(settings, "tier_after_days", float)
+    temp_hours = _setting(settings, "temp_max_age_hours", float)
+    policy = settings.get("evict_policy") if settings.get("evict_policy") in EVICT_POLICIES else "none"
+
+    # tier_after_days가 0이면 Opus 재인코딩을 하지 않음 (기본값, 사용자가 직접 켜야 함)
+    tiering = tier_days > 0
+
+    report = {"before_percent": round(disk_usage_percent(), 1), "freed": {}}
+    with stage_timer("retention") as info:
+        # 평상시: 나이 기준 정리
+        report["freed"]["temp"] = purge_temp(temp_hours)
+        if tiering:
+            report["freed"]["tier_by_age"] = tier_recordings(older_than=datetime.utcnow() - timedelta(days=tier_days))
+
+        # 디스크 압박: low watermark 아래로 내려갈 때까지 단계적으로 확보
+        report["pressure"] = disk_usage_percent() >= high
+        if report["pressure"]:
+            report["freed"]["originals"] = purge_originals(target_percent=low)
+            if tiering:
+                report["freed"]["tier_by_pressure"] = tier_recordings(target_percent=low)
+            if policy == "delete_audio" and disk_usage_percent() >= low:
+                report["freed"]["evicted_audio"] = evict_audio(target_percent=low)
+        info["bytes"] = sum(report["freed"].values())
+
+    report["after_percent"] = round(disk_usage_percent(), 1)
+    return report
+
+def retention_loop(stop_event, interval=RETENTION_INTERVAL_SECONDS):
+    """
+    워커 supervisor에서 스레드로 실행합니다.
+    """
+    # 시작 직후 한 번 실행하고 이후 interval마다 반복
+    while True:
+        try:
+            settings = get_settings()
+            if settings.get("retention_enabled", True):
+                report = run_retention(settings)
+                if any(report["freed"].values()):
+                    print(f"💾 보존 정책 실행: {report['before_percent']}% -> {report['after_percent']}% ({report['freed']})")
+        except Exception as e:
+            print(f"⚠️ 보존 정책 실행 실패: {e}")
+        if stop_event.wait(interval):
+            return
@@ -0,0 +1,94 @@
+from datetime import datetime
+from sqlalchemy import text
+from database import engine
+
+# trigram 토크나이저는 3글자 이상만 색인 검색 가능. 더 짧은 검색어는 LIKE로 처리
+MIN_MATCH_LENGTH = 3
+
+# 녹음별 최신 버전 Transcript만 검색 대상으로 삼음
+LATEST_VERSION_FILTER = "t.version = (SELECT MAX(version) FROM transcripts WHERE recording_id = t.recording_id)"
+
+def _to_datetime(value):
+    # raw SQL 결과라 SQLite는 DateTime 컬럼을 문자열로 돌려줌
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+def _fts_phrase(query):
+    # 사용자 입력을 FTS5 문법이 아닌 하나의 문구로 취급
+    return '"' + query.replace('"', '""') + '"'
+
+def search_transcripts(query, limit=20):
+    """
+    전체 텍스트 기준으로 녹음을 관련도 순(bm25)으로 찾습니다.
+    반환: [{transcript_id, recording_id, filename, file_path, created_at, score}, ...]
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    if len(query) >= MIN_MATCH_LENGTH:
+        sql = f"""
+            SELECT t.id, r.id, r.filename, r.file_path, r.created_at, bm25(transcripts_fts) AS score
+            FROM transcripts_fts
+            JOIN transcripts t ON t.id = transcripts_fts.rowid
+            JOIN recordings r ON r.id = t.recording_id
+            WHERE transcripts_fts MATCH :q AND {LATEST_VERSION_FILTER}
+            ORDER BY score LIMIT :limit
+        """
+        params = {"q": _fts_phrase(query), "limit": limit}
+    else:
+        sql = f"""
+            SELECT t.id, r.id, r.filename, r.file_path, r.created_at, 0 AS score
+            FROM transcripts t JOIN recordings r ON r.id = t.recording_id
+            WHERE t.full_text LIKE :q AND {LATEST_VERSION_FILTER}
+            ORDER BY r.created_at DESC LIMIT :limit
+        """
+        params = {"q": f"%{query}%", "limit": limit}
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), params).fetchall()
+    return [
+        {"transcript_id": r[0], "recording_id": r[1], "filename": r[2], "file_path": r[3], "created_at": _to_datetime(r[4]), "score": r[5]}
+        for r in rows
+    ]
+
+def search_segments(query, transcript_ids=None, limit=50):
+    """
+    세그먼트 단위로 검색하여 타임스탬프와 함께 반환합니다.
+    반환: [{transcript_id, start, end, text, snippet, score}, ...]
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    id_filter = ""
+    params = {"limit": limit}
+    if transcript_ids:
+        id_filter = f"AND s.transcript_id IN ({', '.join(str(int(i)) for i in transcript_ids)})"
+
+    if len(query) >= MIN_MATCH_LENGTH:
+        sql = f"""
+            SELECT s.transcript_id, s.start, s."end", s.text,
+                   highlight(segments_fts, 0, '**', '**'), bm25(segments_fts) AS score
+            FROM segments_fts
+            JOIN segments s ON s.id = segments_fts.rowid
+            WHERE segments_fts MATCH :q {id_filter}
+            ORDER BY score LIMIT :limit
+        """
+        params["q"] = _fts_phrase(query)
+    else:
+        sql = f"""
+            SELECT s.transcript_id, s.start, s."end", s.text, s.text, 0 AS score
+            FROM segments s
+            WHERE s.text LIKE :q {id_filter}
+            ORDER BY s.transcript_id, s.idx LIMIT :limit
+        """
+        params["q"] = f"%{query}%"
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), params).fetchall()
+    return [
+        {"transcript_id": r[0], "start": r[1], "end": r[2], "text": r[3], "snippet": r[4], "score": r[5]}
+        for r in rows
+    ]
@@ -1,91 +1,563 @@
 import os
-import requests
-from pydub import AudioSegment, effects
-import openai
+import json
+import time
+import hashlib
+import bisect
+import subprocess
+import multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import llm_client
+import refine_cache
+import model_registry
+from metrics import stage_timer
+from retention import keep_or_discard_input
+from database import save_refine_result
 from faster_whisper import WhisperModel
 
-# --- 1. 오디오 최적화 파이프라인 ---
-def optimize_audio(input_path, output_folder="data/storage"):
-    os.makedirs(output_folder, exist_ok=True)
+SAMPLE_RATE = 16000 # Whisper 입력 규격 (16kHz mono)
+LONG_AUDIO_SECONDS = 20 * 60 # 이보다 긴 녹음은 청크 병렬 변환
+CHUNK_SECONDS = 5 * 60
+BATCH_CLIP_SECONDS = 30 # Whisper 한 윈도우 길이 (배치 추론 단위)
+DEFAULT_BEAM_SIZE = 5 # 자동 튜닝 프로필이 있으면 config["beam_size"]가 우선
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a")
+ARCHIVE_BITRATE = "64k"
+# 보관본 규격: High-pass(200Hz) -> 라우드니스 정규화(EBU R128, 스트리밍) -> 16kHz mono
+# loudnorm은 내부적으로 192kHz로 처리하므로 마지막에 다시 16kHz로 리샘플링
+ARCHIVE_FILTERS = f"highpass=f=200,loudnorm=I=-16:TP=-1.5:LRA=11,aresample={SAMPLE_RATE}"
+
+def file_sha256(path, block_size=1024 * 1024):
+    """
+    파일 전체를 메모리에 올리지 않고 블록 단위로 SHA-256을 계산합니다.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def get_optimized_path(input_path, output_folder="data/storage"):
     filename = os.path.basename(input_path)
     name_without_ext = os.path.splitext(filename)[0]
-    output_path = os.path.join(output_folder, f"{name_without_ext}_optimized.mp3")
-    
+    return os.path.join(output_folder, f"{name_without_ext}_optimized.mp3")
+
+def probe_audio(path):
+    """
+    ffprobe로 길이(초), 샘플레이트, 채널 수, 코덱을 읽습니다. 읽지 못한 값은 None
+    """
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "format=duration:stream=sample_rate,channels,codec_name",
+        "-print_format", "json", path,
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe 실패: {result.stderr.decode(errors='ignore')}")
+    data = json.loads(result.stdout or b"{}")
+    stream = (data.get("streams") or [{}])[0]
+    duration = data.get("format", {}).get("duration")
+    return {
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+        "sample_rate": int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+        "channels": stream.get("channels"),
+        "codec": stream.get("codec_name"),
+    }
+
+def probe_duration(path):
     try:
-        audio = AudioSegment.from_file(input_path)
-        audio = audio.set_channels(1).set_frame_rate(16000)
-        audio = effects.normalize(audio)
-        audio = audio.high_pass_filter(200)
-        audio.export(output_path, format="mp3", bitrate="64k")
-        
-        if os.path.exists(input_path):
-            os.remove(input_path)
-        return output_path
+        return probe_audio(path)["duration"]
     except Exception as e:
-        print(f"❌ Error optimizing audio: {e}")
+        print(f"⚠️ 길이 확인 실패 ({os.path.basename(path)}): {e}")
         return None
 
+# --- 1. 오디오 최적화 파이프라인 ---
+def optimize_audio(input_path, output_folder="data/storage", keep_original=False):
+    """
+    디코딩 -> 필터 -> MP3 인코딩을 FFmpeg 필터 그래프 하나로 스트리밍 처리합니다.
+    녹음 길이와 상관없이 메모리 사용량이 일정하며, 완성된 파일만 보관 경로에 나타납니다.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    output_path = get_optimized_path(input_path, output_folder)
+    tmp_path = output_path + ".tmp"
+    cmd = [
+        "ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", input_path,
+        "-vn", "-af", ARCHIVE_FILTERS, "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-b:a", ARCHIVE_BITRATE, "-f", "mp3", tmp_path,
+    ]
+
+    with stage_timer("optimize", bytes=os.path.getsize(input_path) if os.path.exists(input_path) else None) as info:
+        try:
+            info["audio_seconds"] = probe_duration(input_path)
+            result = subprocess.run(cmd, capture_output=True)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.decode(errors="ignore").strip())
+            os.replace(tmp_path, output_path)
+
+            keep_or_discard_input(input_path, keep_original)
+            return output_path
+        except Exception as e:
+            info["outcome"] = "error"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            print(f"❌ Error optimizing audio: {e}")
+            return None
+
+def decode_audio(input_path, sample_rate=SAMPLE_RATE):
+    """
+    FFmpeg로 입력 파일을 한 번만 디코딩하여 16kHz mono float32 PCM(numpy)으로 반환합니다.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", input_path,
+        "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "pipe:1",
+    ]
+    with stage_timer("decode", bytes=os.path.getsize(input_path)) as info:
+        result = subprocess.run(cmd, capture_output=True, check=True)
+        audio = np.frombuffer(result.stdout, dtype=np.float32)
+        info["audio_seconds"] = audio.size / sample_rate
+    return audio
+
+def encode_archive(audio, output_path, sample_rate=SAMPLE_RATE, bitrate=ARCHIVE_BITRATE):
+    """
+    PCM 버퍼를 optimize_audio와 같은 필터 그래프로 MP3 인코딩합니다 (동일한 보관 규격).
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-y", "-loglevel", "error",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+        "-af", ARCHIVE_FILTERS, "-ar", str(sample_rate),
+        "-b:a", bitrate, output_path,
+    ]
+    with stage_timer("encode", audio_seconds=audio.size / sample_rate) as info:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        # 버퍼를 복사하지 않고 그대로 파이프에 흘려보냄
+        _, stderr = proc.communicate(memoryview(audio).cast("B"))
+        if proc.returncode != 0:
+            raise RuntimeError(f"MP3 인코딩 실패: {stderr.decode(errors='ignore')}")
+        info["bytes"] = os.path.getsize(output_path)
+    return output_path
+
+def optimize_and_transcribe_stream(model, input_path, output_folder="data/storage", model_args=None, offset=0.0, keep_original=False,
+                                   beam_size=DEFAULT_BEAM_SIZE):
+    """
+    Decode-once 파이프라인: 입력을 한 번만 디코딩한 PCM 버퍼를
+    Whisper에 메모리로 직접 넘기고, 같은 버퍼로 MP3 보관 인코딩을 병렬 수행합니다.
+    세그먼트를 만들어지는 대로 yield하며, 모두 끝나면 보관본 인코딩을 기다린 뒤 원본을 삭제(또는 보관)합니다.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    output_path = get_optimized_path(input_path, output_folder)
+
+    audio = decode_audio(input_path)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        archive = pool.submit(encode_archive, audio, output_path)
+        yield from transcribe_audio_stream(model, audio, offset=offset, model_args=model_args, beam_size=beam_size)
+        archive.result()
+
+    keep_or_discard_input(input_path, keep_original)
+
+def optimize_and_transcribe(model, input_path, output_folder="data/storage", model_args=None):
+    """
+    optimize_and_transcribe_stream의 결과를 모아서 반환합니다.
+    반환: (optimized_path, full_text, segments_list)
+    """
+    segments_list = list(optimize_and_transcribe_stream(model, input_path, output_folder, model_args))
+    full_text = " ".join(seg["text"] for seg in segments_list)
+    return get_optimized_path(input_path, output_folder), full_text, segments_list
+
 # --- 2. AI STT 엔진 (Whisper) ---
-def transcribe_audio(model, file_path):
+def transcribe_audio_stream(model, audio, offset=0.0, model_args=None, beam_size=DEFAULT_BEAM_SIZE):
     """
-    Faster-Whisper를 사용하여 음성을 텍스트로 변환하고 세그먼트 정보를 반환합니다.
+    세그먼트를 만들어지는 대로 {start, end, text} 형태로 yield하는 스트리밍 STT.
+    offset(초)이 주어지면 그 지점부터 이어서 변환하고 타임스탬프에 offset을 더합니다 (중단 후 재개용).
+    model_args가 주어지고 남은 길이가 길면 transcribe_long_audio_stream으로 코어 병렬 변환합니다.
+    audio: 파일 경로 또는 16kHz mono float32 numpy 배열
+    model: WhisperModel 또는 모델을 돌려주는 함수 (긴 녹음 경로에서는 호출하지 않아 부모 프로세스에 모델을 올리지 않음)
     """
-    segments, info = model.transcribe(file_path, beam_size=5)
-    
-    full_text = ""
-    segments_list = []
-    
+    if offset or model_args:
+        if isinstance(audio, str):
+            audio = decode_audio(audio)
+        audio = audio[int(offset * SAMPLE_RATE):]
+
+    if model_args and len(audio) > LONG_AUDIO_SECONDS * SAMPLE_RATE:
+        yield from transcribe_long_audio_stream(audio, model_args, offset=offset, beam_size=beam_size)
+        return
+
+    if callable(model):
+        model = model()
+    segments, info = model.transcribe(audio, beam_size=beam_size)
     for segment in segments:
-        full_text += segment.text + " "
-        segments_list.append({
-            "start": round(segment.start, 2),
-            "end": round(segment.end, 2),
+        yield {
+            "start": round(segment.start + offset, 2),
+            "end": round(segment.end + offset, 2),
             "text": segment.text.strip()
-        })
-    
-    return full_text.strip(), segments_list
+        }
 
-# --- 3. AI Refiner (Ollama & OpenAI) ---
-def refine_text_with_ai(text, config, prompt_type="fix"):
+def transcribe_audio(model, file_path):
     """
-    로컬 Ollama 또는 외부 API를 사용하여 텍스트 분석
-    config: { 'ollama_url': ..., 'ollama_model': ..., 'api_key': ... }
+    Faster-Whisper를 사용하여 음성을 텍스트로 변환하고 세그먼트 정보를 반환합니다.
+    file_path 대신 16kHz mono float32 numpy 배열도 받을 수 있습니다.
+    """
+    segments_list = list(transcribe_audio_stream(model, file_path))
+    full_text = " ".join(seg["text"] for seg in segments_list)
+    return full_text, segments_list
+
+# --- 2-1. 긴 녹음: VAD 무음 지점 분할 + 프로세스 병렬 변환 ---
+def split_on_silence(audio, chunk_seconds=CHUNK_SECONDS, sample_rate=SAMPLE_RATE):
+    """
+    VAD로 찾은 발화 구간 사이의 무음 지점에서만 잘라 chunk_seconds 근처 길이의 청크를 만듭니다.
+    반환: [(start_sample, end_sample), ...]
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    # 한 발화가 청크 길이를 넘으면 VAD가 직접 끊도록 max_speech_duration_s 지정
+    vad_options = VadOptions(min_silence_duration_ms=500, max_speech_duration_s=chunk_seconds)
+    speech = get_speech_timestamps(audio, vad_options)
+
+    target = chunk_seconds * sample_rate
+    chunks = []
+    chunk_start = 0
+    for prev, nxt in zip(speech, speech[1:]):
+        if nxt["end"] - chunk_start > target:
+            # 두 발화 사이 무음의 가운데에서 자름
+            cut = (prev["end"] + nxt["start"]) // 2
+            if cut > chunk_start:
+                chunks.append((chunk_start, cut))
+                chunk_start = cut
+    chunks.append((chunk_start, len(audio)))
+    return chunks
+
+# 청크 변환 프로세스마다 하나씩 로드되는 모델
+_chunk_model = None
+
+def _init_chunk_worker(model_args):
+    global _chunk_model
+    _chunk_model = WhisperModel(**model_args)
+
+def _transcribe_chunk(audio_chunk, offset, beam_size=DEFAULT_BEAM_SIZE):
+    segments_list = list(transcribe_audio_stream(_chunk_model, audio_chunk, beam_size=beam_size))
+    for seg in segments_list:
+        seg["start"] = round(seg["start"] + offset, 2)
+        seg["end"] = round(seg["end"] + offset, 2)
+    return segments_list
+
+def transcribe_long_audio_stream(audio, model_args, offset=0.0, workers=None, threads_per_worker=2, chunk_seconds=CHUNK_SECONDS,
+                                 beam_size=DEFAULT_BEAM_SIZE):
     """
-    system_prompts = {
-        "fix": "너는 전문 에디터야. 아래 텍스트의 오탈자를 수정하고 문맥을 자연스럽게 다듬어줘.",
-        "summarize": "너는 문서 요약 전문가야. 아래 내용을 핵심 요약(Bullet point) 해줘.",
-        "action_item": "아래 내용에서 주요 키워드나 '중요 사항'을 추출해서 목록으로 만들어줘."
+    긴 PCM 버퍼를 무음 지점에서 청크로 나누어 프로세스 풀에서 병렬로 변환합니다.
+    각 청크의 시작 시각(+offset)만큼 타임스탬프를 보정하고, 청크 순서대로 세그먼트를 yield합니다.
+    model_args: WhisperModel 생성 인자 (model_size_or_path, device, compute_type)
+    workers를 주지 않으면 호스트의 코어를 큐 워커 수(MEMORA_WORKERS)로 나눈 몫 안에서 프로세스 수를 정하고,
+    모델 메모리 예산(model_registry.reserve)에 맞게 다시 줄입니다.
+    """
+    chunks = split_on_silence(audio, chunk_seconds)
+    if workers is None:
+        # 큐 워커마다 각자 풀을 띄울 수 있으므로 이 워커 몫의 코어만 사용
+        queue_workers = max(1, int(os.getenv("MEMORA_WORKERS", "1")))
+        cores = max(1, (os.cpu_count() or 1) // queue_workers)
+        workers = max(1, cores // threads_per_worker)
+    workers = max(1, min(workers, len(chunks)))
+
+    # CTranslate2 스레드가 떠 있는 부모를 fork하지 않도록 spawn 사용
+    ctx = multiprocessing.get_context("spawn")
+    # 청크 프로세스는 코어를 나눠 쓰므로 프로필의 스레드/워커 수 대신 threads_per_worker 사용
+    init_args = {**model_args, "cpu_threads": threads_per_worker, "num_workers": 1}
+    # 청크 프로세스마다 모델을 하나씩 올리므로 이 프로세스의 모델 예산에 포함 (예산에 맞게 프로세스 수를 줄임)
+    with model_registry.reserve(init_args, workers) as workers, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_chunk_worker, initargs=(init_args,)) as pool:
+        # pool.map은 완료 순서와 무관하게 청크 순서대로 결과를 돌려줌
+        results = pool.map(
+            _transcribe_chunk,
+            [audio[start:end] for start, end in chunks],
+            [offset + start / SAMPLE_RATE for start, _ in chunks],
+            [beam_size] * len(chunks),
+        )
+        for chunk_segments in results:
+            yield from chunk_segments
+
+def transcribe_long_audio(audio, model_args, workers=None, threads_per_worker=2, chunk_seconds=CHUNK_SECONDS):
+    """
+    transcribe_long_audio_stream의 결과를 모아 (full_text, segments_list)로 반환합니다.
+    """
+    segments_list = list(transcribe_long_audio_stream(
+        audio, model_args, workers=workers, threads_per_worker=threads_per_worker, chunk_seconds=chunk_seconds
+    ))
+    full_text = " ".join(seg["text"] for seg in segments_list)
+    return full_text, segments_list
+
+# --- 2-2. 다중 파일 배치 추론 ---
+def _batch_clips(audio, sample_rate=SAMPLE_RATE):
+    """
+    파일 하나를 30초 이하 클립들로 나눕니다. 짧은 파일은 통째로 하나의 클립.
+    """
+    max_len = BATCH_CLIP_SECONDS * sample_rate
+    if len(audio) <= max_len:
+        return [(0, len(audio))]
+    clips = []
+    for start, end in split_on_silence(audio, BATCH_CLIP_SECONDS, sample_rate):
+        # 무음이 길게 이어진 청크는 30초 단위로 다시 자름
+        for clip_start in range(start, end, max_len):
+            clips.append((clip_start, min(clip_start + max_len, end)))
+    return clips
+
+def transcribe_batch(model, inputs, batch_size=16, beam_size=DEFAULT_BEAM_SIZE):
+    """
+    여러 개의 짧은 파일(또는 청크)을 하나의 모델로 묶어 배치 추론합니다.
+    모든 입력을 30초 이하 클립으로 나눠 하나의 버퍼에 이어 붙이고, clip_timestamps로
+    BatchedInferencePipeline에 넘긴 뒤 결과 세그먼트를 원래 파일로 되돌려 분배합니다.
+    inputs: {key: 파일 경로 또는 16kHz mono float32 배열}
+    반환: ({key: (full_text, segments_list)}, stats)
+    """
+    from faster_whisper import BatchedInferencePipeline
+
+    started = time.perf_counter()
+    audios = {key: decode_audio(value) if isinstance(value, str) else value for key, value in inputs.items()}
+    keys = [key for key, audio in audios.items() if len(audio) > 0]
+
+    buffers, clip_timestamps, clip_owner = [], [], []
+    file_offset = {}
+    position = 0
+    for key in keys:
+        audio = audios[key]
+        file_offset[key] = position
+        for start, end in _batch_clips(audio):
+            # clip_timestamps는 이어 붙인 버퍼 기준 샘플 단위
+            clip_timestamps.append({"start": position + start, "end": position + end})
+            clip_owner.append(key)
+        buffers.append(audio)
+        position += len(audio)
+
+    segments_by_key = {key: [] for key in audios}
+    if buffers:
+        pipeline = BatchedInferencePipeline(model=model)
+        segments, info = pipeline.transcribe(
+            np.concatenate(buffers),
+            beam_size=beam_size,
+            vad_filter=False,
+            clip_timestamps=clip_timestamps,
+            batch_size=batch_size,
+        )
+        clip_starts = [clip["start"] / SAMPLE_RATE for clip in clip_timestamps]
+        for segment in segments:
+            # 세그먼트 중간 지점이 속한 클립의 주인 파일로 분배
+            middle = (segment.start + segment.end) / 2
+            key = clip_owner[max(0, bisect.bisect_right(clip_starts, middle) - 1)]
+            offset = file_offset[key] / SAMPLE_RATE
+            segments_by_key[key].append({
+                "start": round(segment.start - offset, 2),
+                "end": round(segment.end - offset, 2),
+                "text": segment.text.strip()
+            })
+
+    results = {
+        key: (" ".join(seg["text"] for seg in segments_list), segments_list)
+        for key, segments_list in segments_by_key.items()
     }
-    system_prompt = system_prompts.get(prompt_type, "fix")
 
-    # 1. Ollama 사용 (우선순위)
-    if config.get("ollama_url") and config.get("ollama_model"):
-        try:
-            url = f"{config['ollama_url']}/api/generate"
-            payload = {
-                "model": config["ollama_model"],
-                "prompt": f"{system_prompt}\n\n텍스트: {text}",
-                "stream": False
-            }
-            response = requests.post(url, json=payload, timeout=30)
-            if response.status_code == 200:
-                return response.json().get("response", "응답 없음")
-        except Exception as e:
-            print(f"Ollama 호출 실패: {e}")
+    audio_seconds = position / SAMPLE_RATE
+    wall_seconds = time.perf_counter() - started
+    stats = {
+        "files": len(audios),
+        "audio_seconds": round(audio_seconds, 2),
+        "wall_seconds": round(wall_seconds, 2),
+        # 처리량: 벽시계 1초당 변환한 오디오 초
+        "throughput": round(audio_seconds / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    }
+    return results, stats
+
+# --- 3. AI Refiner (Ollama & OpenAI) ---
+OPENAI_MODEL = "gpt-4o-mini"
+REFINE_TIMEOUT = 30
+
+SYSTEM_PROMPTS = {
+    "fix": "너는 전문 에디터야. 아래 텍스트의 오탈자를 수정하고 문맥을 자연스럽게 다듬어줘.",
+    "summarize": "너는 문서 요약 전문가야. 아래 내용을 핵심 요약(Bullet point) 해줘.",
+    "action_item": "아래 내용에서 주요 키워드나 '중요 사항'을 추출해서 목록으로 만들어줘.",
+    # 긴 녹음 map-reduce의 reduce 단계
+    "summarize_reduce": "너는 문서 요약 전문가야. 아래는 긴 녹음을 구간별로 요약한 내용이야. 중복을 합치고 전체 흐름이 보이도록 핵심 요약(Bullet point)으로 정리해줘.",
+    "action_item_reduce": "아래는 긴 녹음의 구간별 '중요 사항' 목록이야. 중복을 합치고 중요도 순으로 하나의 목록으로 정리해줘.",
+}
+
+class RefineError(Exception):
+    pass
+
+def _refined(result, transcript_id, prompt_type):
+    # 요약/중요 사항 결과는 Transcript.summary / tags에 반영하여 History에서 재생성하지 않도록 함
+    save_refine_result(transcript_id, prompt_type, result)
+    return result
 
-    # 2. API Key가 있는 경우 OpenAI/Gemini (Fallback)
+def _engines(config):
+    """
+    사용할 엔진 순서: (engine, model). Ollama 우선, API Key가 있으면 OpenAI/Gemini로 Fallback
+    """
+    engines = []
+    if config.get("ollama_url") and config.get("ollama_model"):
+        engines.append(("ollama", config["ollama_model"]))
     if config.get("api_key"):
-        client = openai.OpenAI(api_key=config["api_key"])
+        engines.append(("openai", OPENAI_MODEL))
+    return engines
+
+def _engine_stream(engine, model, text, system_prompt, config, stats):
+    timeout = config.get("timeout", REFINE_TIMEOUT)
+    if engine == "ollama":
+        prompt = f"{system_prompt}\n\n텍스트: {text}"
+        return llm_client.stream_generate(config["ollama_url"], model, prompt, timeout=timeout, stats=stats)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": text}
+    ]
+    return llm_client.stream_openai_chat(config["api_key"], model, messages, timeout=timeout, stats=stats)
+
+def refine_text_stream(text, config, prompt_type="fix", use_cache=True, transcript_id=None, stats=None):
+    """
+    AI Refiner 토큰 스트리밍. 캐시에 있으면 결과 전체를 한 번에 yield합니다.
+    첫 토큰 전에 실패한 엔진은 다음 엔진으로 넘어가고, 모두 실패하면 RefineError를 발생시킵니다.
+    stats dict를 넘기면 엔진/모델, TTFT, tokens/sec가 기록됩니다.
+    """
+    stats = stats if stats is not None else {}
+    with stage_timer("refine") as info:
+        size = 0
+        for token in _refine_stream(text, config, prompt_type, use_cache, transcript_id, stats):
+            size += len(token.encode("utf-8"))
+            yield token
+        info["bytes"] = size
+        if stats.get("cached"):
+            info["outcome"] = "cached"
+
+def _refine_stream(text, config, prompt_type, use_cache, transcript_id, stats):
+    system_prompt = SYSTEM_PROMPTS.get(prompt_type, SYSTEM_PROMPTS["fix"])
+    errors = []
+
+    for engine, model in _engines(config):
+        cache_key = refine_cache.make_key(text, prompt_type, engine, model)
+        cached = refine_cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            stats.update({"engine": engine, "model": model, "cached": True})
+            yield _refined(cached, transcript_id, prompt_type)
+            return
+
+        tokens = []
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": text}
-                ]
-            )
-            return response.choices[0].message.content
+            for token in _engine_stream(engine, model, text, system_prompt, config, stats):
+                tokens.append(token)
+                yield token
         except Exception as e:
-            return f"API 호출 오류: {e}"
+            if tokens:
+                raise RefineError(f"{engine} 응답 중단: {e}")
+            print(f"{engine} 호출 실패: {e}")
+            errors.append(f"{engine}: {e}")
+            continue
+
+        result = "".join(tokens) or "응답 없음"
+        refine_cache.put(cache_key, prompt_type, engine, model, result)
+        _refined(result, transcript_id, prompt_type)
+        return
+
+    if errors:
+        raise RefineError(f"API 호출 오류: {'; '.join(errors)}")
+    raise RefineError("연결 가능한 AI 엔진(Ollama 또는 API Key)이 없습니다.")
+
+def _refine(text, config, prompt_type="fix", use_cache=True, transcript_id=None):
+    """
+    refine_text_stream의 결과를 모아 반환합니다. 모든 엔진이 실패하면 RefineError.
+    """
+    return "".join(refine_text_stream(text, config, prompt_type, use_cache, transcript_id))
+
+def refine_text_with_ai(text, config, prompt_type="fix", use_cache=True, transcript_id=None):
+    """
+    로컬 Ollama 또는 외부 API를 사용하여 텍스트 분석
+    config: { 'ollama_url': ..., 'ollama_model': ..., 'api_key': ..., 'timeout': ... }
+    같은 (텍스트, 모드, 엔진, 모델) 요청은 refine_cache에서 바로 반환합니다.
+    transcript_id가 주어지면 성공한 결과를 해당 Transcript에 저장합니다.
+    """
+    try:
+        return _refine(text, config, prompt_type, use_cache, transcript_id)
+    except RefineError as e:
+        return str(e)
+
+# --- 3-1. 긴 녹음용 Map-Reduce 요약 ---
+MAP_CHUNK_TOKENS = 1500 # 작은 로컬 모델(gemma2:2b 등)의 컨텍스트에 여유 있게 들어가는 크기
+MAP_MAX_WORKERS = 3
+MAP_TIMEOUT = 120
+
+def estimate_tokens(text):
+    # 한국어 기준 대략 1토큰 ≈ 2자 (토크나이저 없이 보수적으로 추정)
+    return max(1, len(text) // 2)
+
+def _format_offset(seconds):
+    seconds = int(seconds or 0)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+def split_segments_by_tokens(segments, max_tokens=MAP_CHUNK_TOKENS):
+    """
+    세그먼트 경계를 유지하면서 토큰 예산 안에 들어가도록 묶습니다.
+    반환: [{"start", "end", "text"}, ...]
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for seg in segments:
+        seg_tokens = estimate_tokens(seg["text"])
+        if current and current_tokens + seg_tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(seg)
+        current_tokens += seg_tokens
+    if current:
+        chunks.append(current)
+    return [
+        {"start": chunk[0]["start"], "end": chunk[-1]["end"], "text": " ".join(seg["text"] for seg in chunk)}
+        for chunk in chunks
+    ]
+
+def text_to_segments(text):
+    """
+    타임스탬프가 없는 (사용자가 수정한) 텍스트를 문장 단위 의사 세그먼트로 나눕니다.
+    """
+    import re
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?。])\s+|\n+", text) if s.strip()]
+    return [{"start": 0, "end": 0, "text": s} for s in sentences]
+
+def refine_long_text(segments, config, prompt_type="summarize", max_workers=MAP_MAX_WORKERS,
+                     chunk_tokens=MAP_CHUNK_TOKENS, on_progress=None, transcript_id=None, use_cache=True):
+    """
+    LLM 컨텍스트보다 긴 스크립트를 세그먼트 경계에서 나누어(map) 제한된 워커 풀로 동시에 처리한 뒤
+    하나로 합칩니다(reduce). 'fix' 모드는 교정된 구간을 순서대로 이어 붙입니다.
+    on_progress(done, total, index, partial_result): 구간이 끝날 때마다 호출 (호출한 스레드에서 실행)
+    use_cache=False면 map/reduce 모든 요청이 refine_cache를 건너뜁니다 (벤치마크용)
+    """
+    chunks = split_segments_by_tokens(segments, chunk_tokens)
+    map_config = {**config, "timeout": max(config.get("timeout", REFINE_TIMEOUT), MAP_TIMEOUT)}
+    if len(chunks) <= 1:
+        text = chunks[0]["text"] if chunks else ""
+        return refine_text_with_ai(text, map_config, prompt_type, use_cache, transcript_id)
+
+    partials = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_refine, chunk["text"], map_config, prompt_type, use_cache): i for i, chunk in enumerate(chunks)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                partials[i] = future.result()
+            except RefineError as e:
+                partials[i] = f"(이 구간 처리 실패: {e})"
+            if on_progress:
+                on_progress(done, len(chunks), i, partials[i])
+
+    if prompt_type == "fix":
+        return "\n\n".join(partials)
 
-    return "연결 가능한 AI 엔진(Ollama 또는 API Key)이 없습니다."
\ No newline at end of file
+    # reduce: 구간별 결과를 시간 순으로 합쳐 한 번 더 정리. 합친 결과도 길면 계층적으로 반복
+    reduce_type = f"{prompt_type}_reduce" if f"{prompt_type}_reduce" in SYSTEM_PROMPTS else prompt_type
+    partial_segments = [
+        {"start": chunk["start"], "end": chunk["end"], "text": f"[{_format_offset(chunk['start'])}~{_format_offset(chunk['end'])}] {partial}"}
+        for chunk, partial in zip(chunks, partials)
+    ]
+    while True:
+        groups = split_segments_by_tokens(partial_segments, chunk_tokens)
+        # 더 이상 줄어들지 않으면 (구간 결과 하나하나가 예산보다 큼) 그대로 마지막 reduce
+        if len(groups) == 1 or len(groups) >= len(partial_segments):
+            text = " ".join(seg["text"] for seg in partial_segments)
+            return refine_text_with_ai(text, map_config, reduce_type, use_cache, transcript_id)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            reduced = list(pool.map(lambda g: refine_text_with_ai(g["text"], map_config, reduce_type, use_cache), groups))
+        partial_segments = [
+            {"start": g["start"], "end": g["end"], "text": f"[{_format_offset(g['start'])}~{_format_offset(g['end'])}] {r}"}
+            for g, r in zip(groups, reduced)
+        ]
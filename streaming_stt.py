@@ -0,0 +1,264 @@
+import os
+import wave
+import numpy as np
+from datetime import datetime
+from database import create_transcript, append_segments, finalize_recording, load_segments, mark_recording_failed
+from services import SAMPLE_RATE, get_optimized_path, optimize_audio, file_sha256
+
+# 실시간 스트리밍 STT (회의 중 실시간 자막)
+# - 들어오는 16kHz mono PCM을 버퍼에 쌓고, STEP_SECONDS마다 버퍼 전체(겹치는 창)를 다시 디코딩
+# - 연속된 두 번의 디코딩 결과가 일치하는 앞부분(LocalAgreement)만 확정하고 나머지는 partial로 표시
+# - 확정된 단어가 문장 끝에 닿으면 final 세그먼트({start, end, text})로 내보내고, 버퍼는 그 지점까지 잘라 길이를 제한
+STEP_SECONDS = 1.0 # 이만큼 새 오디오가 쌓일 때마다 디코딩
+MAX_BUFFER_SECONDS = 15.0 # 버퍼가 이보다 길어지면 확정된 지점까지 잘라냄
+MAX_SEGMENT_SECONDS = 12.0 # 문장 끝이 없어도 이 길이가 되면 세그먼트를 끊음
+PROMPT_CHARS = 200 # 다음 창 디코딩에 initial_prompt로 넘길 확정 텍스트 길이
+SENTENCE_END = (".", "?", "!", "。", "？", "！")
+PCM_FORMATS = {"s16le": (np.int16, 32768.0), "f32le": (np.float32, 1.0)}
+LIVE_DIR = "data/live" # 저장 모드의 녹음 원본 (감시 폴더와 분리)
+
+def _normalize(word):
+    return word.strip().strip(".,?!。，？！").lower()
+
+def _text(words):
+    return "".join(w["text"] for w in words).strip()
+
+class LiveTranscriber:
+    """
+    feed(bytes)로 PCM을 넣으면 이벤트 목록을 돌려줍니다.
+    {"type": "partial", start, end, text}: 아직 바뀔 수 있는 현재 문장
+    {"type": "final", start, end, text}: 확정된 세그먼트 (기존 세그먼트와 같은 형태 + type)
+    """
+
+    def __init__(self, model, pcm_format="s16le", language=None, step_seconds=STEP_SECONDS,
+                 max_buffer_seconds=MAX_BUFFER_SECONDS, beam_size=1):
+        if pcm_format not in PCM_FORMATS:
+            raise ValueError(f"지원하지 않는 PCM 형식: {pcm_format} ({', '.join(PCM_FORMATS)})")
+        self.model = model
+        self.pcm_format = pcm_format
+        self.language = language
+        self.step_samples = int(step_seconds * SAMPLE_RATE)
+        self.max_buffer_seconds = max_buffer_seconds
+        self.beam_size = beam_size
+
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_offset = 0.0 # buffer[0]의 절대 시각(초)
+        self.total_samples = 0
+        self._leftover = b"" # 샘플 경계에서 잘린 바이트
+        self._since_decode = 0
+        self.hypothesis = [] # 직전 디코딩에서 확정되지 않은 단어
+        self.committed = [] # 확정됐지만 아직 세그먼트로 내보내지 않은 단어
+        self.committed_until = 0.0
+        self.segments = [] # 내보낸 final 세그먼트
+
+    @property
+    def total_seconds(self):
+        return self.total_samples / SAMPLE_RATE
+
+    def to_float(self, data):
+        dtype, scale = PCM_FORMATS[self.pcm_format]
+        data = self._leftover + data
+        usable = len(data) - len(data) % np.dtype(dtype).itemsize
+        self._leftover = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=dtype)
+        return samples.astype(np.float32) / scale if scale != 1.0 else samples
+
+    def feed(self, data):
+        samples = self.to_float(data)
+        return self.feed_samples(samples)
+
+    def feed_samples(self, samples):
+        self.buffer = np.concatenate([self.buffer, samples])
+        self.total_samples += samples.size
+        self._since_decode += samples.size
+        if self._since_decode < self.step_samples:
+            return []
+        self._since_decode = 0
+        return self._process()
+
+    def finish(self):
+        """
+        스트림 끝: 남은 버퍼를 마지막으로 디코딩하고 모든 단어를 확정합니다.
+        """
+        if self.buffer.size == 0:
+            return self._cut_segments(final=True)
+        return self._process(final=True)
+
+    # --- 디코딩 ---
+    def _prompt(self):
+        text = " ".join(seg["text"] for seg in self.segments[-3:])
+        text = f"{text} {_text(self.committed)}".strip()
+        return text[-PROMPT_CHARS:] or None
+
+    def _decode(self):
+        """
+        버퍼 전체를 디코딩하여 아직 확정되지 않은 구간의 단어를 절대 시각으로 반환합니다.
+        """
+        segments, _ = self.model.transcribe(
+            self.buffer,
+            language=self.language,
+            beam_size=self.beam_size,
+            word_timestamps=True,
+            condition_on_previous_text=False,
+            initial_prompt=self._prompt(),
+            vad_filter=False,
+        )
+        words = []
+        for segment in segments:
+            for w in segment.words or []:
+                start, end = w.start + self.buffer_offset, w.end + self.buffer_offset
+                # 이미 확정된 구간과 겹치는 단어는 버림
+                if end <= self.committed_until + 0.05:
+                    continue
+                words.append({"start": start, "end": end, "text": w.word})
+        return words
+
+    def _process(self, final=False):
+        words = self._decode()
+        if final:
+            agreed = words
+        else:
+            # LocalAgreement-2: 이전 결과와 이번 결과가 같은 앞부분만 확정
+            agreed = []
+            for prev, cur in zip(self.hypothesis, words):
+                if _normalize(prev["text"]) != _normalize(cur["text"]):
+                    break
+                agreed.append(cur)
+        self.hypothesis = words[len(agreed):]
+        if agreed:
+            self.committed += agreed
+            self.committed_until = agreed[-1]["end"]
+
+        events = self._cut_segments(final)
+        # 한 문장도 확정되지 못한 채 버퍼가 너무 길어지면 현재 결과를 그대로 확정
+        if not final and self.buffer.size > 2 * self.max_buffer_seconds * SAMPLE_RATE and self.hypothesis:
+            self.committed += self.hypothesis
+            self.committed_until = self.hypothesis[-1]["end"]
+            self.hypothesis = []
+            events += self._cut_segments(final=True)
+        self._trim()
+
+        pending = self.committed + self.hypothesis
+        if pending and not final:
+            events.append({
+                "type": "partial",
+                "start": round(pending[0]["start"], 2),
+                "end": round(pending[-1]["end"], 2),
+                "text": _text(pending),
+            })
+        return events
+
+    def _cut_segments(self, final=False):
+        """
+        확정된 단어를 문장 끝(또는 최대 길이)에서 끊어 final 세그먼트로 내보냅니다.
+        """
+        events = []
+        start = 0
+        for i, w in enumerate(self.committed):
+            too_long = w["end"] - self.committed[start]["start"] >= MAX_SEGMENT_SECONDS
+            if w["text"].strip().endswith(SENTENCE_END) or too_long:
+                events.append(self._emit(self.committed[start:i + 1]))
+                start = i + 1
+        if final and start < len(self.committed):
+            events.append(self._emit(self.committed[start:]))
+            start = len(self.committed)
+        self.committed = self.committed[start:]
+        return [e for e in events if e["text"]]
+
+    def _emit(self, words):
+        segment = {"start": round(words[0]["start"], 2), "end": round(words[-1]["end"], 2), "text": _text(words)}
+        if segment["text"]:
+            self.segments.append(segment)
+        return {"type": "final", **segment}
+
+    def _trim(self):
+        """
+        버퍼가 길어지면 마지막 final 세그먼트 끝까지 잘라냅니다 (확정 안 된 단어는 다음 창에서 다시 디코딩).
+        """
+        if self.buffer.size <= self.max_buffer_seconds * SAMPLE_RATE or not self.segments:
+            return
+        cut_at = self.segments[-1]["end"]
+        cut = int((cut_at - self.buffer_offset) * SAMPLE_RATE)
+        if cut <= 0:
+            return
+        self.buffer = self.buffer[cut:]
+        self.buffer_offset += cut / SAMPLE_RATE
+
+# --- 저장 모드: 실시간 변환과 동시에 기록으로 저장 ---
+class LiveSession:
+    """
+    LiveTranscriber + (save=True이면) 원본 WAV 기록, final 세그먼트 즉시 저장, 종료 시 보관본 생성.
+    """
+
+    def __init__(self, model, pcm_format="s16le", language=None, save=False, output_folder="data/storage"):
+        self.transcriber = LiveTranscriber(model, pcm_format=pcm_format, language=language)
+        self.output_folder = output_folder
+        self.recording_id = self.transcript_id = None
+        self._wav = None
+        if save:
+            os.makedirs(LIVE_DIR, exist_ok=True)
+            self.wav_path = os.path.join(LIVE_DIR, f"live_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.wav")
+            self._wav = wave.open(self.wav_path, "wb")
+            self._wav.setnchannels(1)
+            self._wav.setsampwidth(2)
+            self._wav.setframerate(SAMPLE_RATE)
+            self.recording_id, self.transcript_id = create_transcript(get_optimized_path(self.wav_path, output_folder))
+
+    def _handle(self, samples, events):
+        if self._wav is not None:
+            if samples is not None and samples.size:
+                self._wav.writeframes((np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
+            finals = [{k: e[k] for k in ("start", "end", "text")} for e in events if e["type"] == "final"]
+            if finals:
+                append_segments(self.transcript_id, finals)
+        return events
+
+    def feed(self, data):
+        samples = self.transcriber.to_float(data)
+        return self._handle(samples, self.transcriber.feed_samples(samples))
+
+    def abort(self):
+        """
+        저장 모드에서 기록을 완료하지 못했을 때: 녹음 파일을 닫고 처리 중 기록을 실패로 표시합니다.
+        """
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+        if self.recording_id:
+            mark_recording_failed(self.recording_id)
+
+    def finish(self, config=None):
+        """
+        남은 세그먼트를 내보내고, 저장 모드면 보관본을 만들어 기록을 완료합니다.
+        반환: (events, {"recording_id", "transcript_id", "duration"} 또는 None)
+        실패하면 기록을 실패로 표시한 뒤 예외를 다시 던집니다.
+        """
+        try:
+            return self._finish(config)
+        except Exception:
+            self.abort()
+            raise
+
+    def _finish(self, config):
+        events = self._handle(None, self.transcriber.finish())
+        if self._wav is None:
+            return events, None
+
+        self._wav.close()
+        self._wav = None
+        content_hash = file_sha256(self.wav_path)
+        archive_path = optimize_audio(self.wav_path, output_folder=self.output_folder)
+        if not archive_path:
+            raise RuntimeError("오디오 변환 실패 (FFmpeg 설치 여부를 확인하세요)")
+        recording_id, transcript_id = finalize_recording(
+            self.recording_id, self.transcript_id, archive_path, content_hash, self.transcriber.total_seconds
+        )
+        if config and config.get("ollama_url"):
+            try:
+                from vector_index import index_transcript
+                index_transcript(transcript_id, load_segments(transcript_id), config)
+            except Exception as e:
+                print(f"⚠️ 벡터 인덱스 추가 실패 (transcript #{transcript_id}): {e}")
+        return events, {
+            "recording_id": recording_id, "transcript_id": transcript_id, "duration": self.transcriber.total_seconds,
+        }
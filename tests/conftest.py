@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_drive import FakeDrive, start_fake_drive
+
+# database.py creates data/db relative to the working directory on import: keep it out of the repo
+os.chdir(tempfile.mkdtemp(prefix="memora-tests-"))
+
+# gdrive_service reads GDRIVE_API_URL at import time, so the fake server must be up first
+_server = start_fake_drive(FakeDrive())
+os.environ["GDRIVE_API_URL"] = _server.url
+
+@pytest.fixture
+def drive():
+    _server.drive = FakeDrive()
+    return _server.drive
+
+@pytest.fixture
+def settings():
+    return {}
+
+@pytest.fixture
+def gdrive(monkeypatch, settings):
+    """
+    gdrive_service with its SystemConfig access replaced by an in-memory dict
+    """
+    pytest.importorskip("requests")
+    pytest.importorskip("google.auth")
+    pytest.importorskip("sqlalchemy")
+    import gdrive_service
+
+    assert gdrive_service.DRIVE_API_URL == _server.url
+    monkeypatch.setattr(gdrive_service, "get_setting", lambda key, default=None: settings.get(key, default))
+    monkeypatch.setattr(gdrive_service, "save_setting", lambda key, value: settings.__setitem__(key, str(value)))
+    monkeypatch.setattr(gdrive_service, "find_transcript_by_hash", lambda content_hash: None)
+    return gdrive_service
+
+@pytest.fixture
+def session():
+    requests = pytest.importorskip("requests")
+    with requests.Session() as s:
+        yield s
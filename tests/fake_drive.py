@@ -0,0 +1,140 @@
+import json
+import hashlib
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal local stand-in for the Drive v3 REST endpoints used by gdrive_service:
+# files.list (paginated), changes.getStartPageToken, changes.list, files.get?alt=media (with Range).
+PAGE_SIZE = 2 # small on purpose so listings span several pages
+
+class FakeDrive:
+    def __init__(self, page_size=PAGE_SIZE):
+        self.page_size = page_size
+        self.files = {} # id -> metadata + "content"
+        self.changes = [] # file ids, change n has page token str(n + 1)
+        self.requests = [] # (path, query, headers) of every request
+        self.disconnect_after = {} # file id -> bytes to send before dropping the connection (once)
+        self.lock = threading.Lock()
+
+    def add_file(self, file_id, name, content, folder="folder1", mime_type="audio/mpeg"):
+        with self.lock:
+            self.files[file_id] = {
+                "id": file_id,
+                "name": name,
+                "mimeType": mime_type,
+                "parents": [folder],
+                "trashed": False,
+                "size": str(len(content)),
+                "md5Checksum": hashlib.md5(content).hexdigest(),
+                "sha256Checksum": hashlib.sha256(content).hexdigest(),
+                "content": content,
+            }
+            self.changes.append(file_id)
+
+    def metadata(self, file_id):
+        return {k: v for k, v in self.files[file_id].items() if k != "content"}
+
+    def requests_to(self, path):
+        return [r for r in self.requests if r[0] == path]
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        drive = self.server.drive
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        path = url.path[len(self.server.prefix):]
+        drive.requests.append((path, query, dict(self.headers)))
+
+        if path == "/files":
+            self._list_files(drive, query)
+        elif path == "/changes/startPageToken":
+            self._send_json({"startPageToken": str(len(drive.changes) + 1)})
+        elif path == "/changes":
+            self._list_changes(drive, query)
+        elif path.startswith("/files/") and query.get("alt") == "media":
+            self._download(drive, path[len("/files/"):])
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _page(self, items, query):
+        page_size = min(int(query.get("pageSize", 100)), self.server.drive.page_size)
+        start = int(query.get("pageToken") or 0)
+        page = items[start:start + page_size]
+        next_token = str(start + page_size) if start + page_size < len(items) else None
+        return page, next_token
+
+    def _list_files(self, drive, query):
+        # q looks like: '<folder>' in parents and trashed = false
+        folder = query.get("q", "").split("'")[1]
+        items = [drive.metadata(i) for i, f in sorted(drive.files.items()) if folder in f["parents"] and not f["trashed"]]
+        page, next_token = self._page(items, query)
+        data = {"files": page}
+        if next_token:
+            data["nextPageToken"] = next_token
+        self._send_json(data)
+
+    def _list_changes(self, drive, query):
+        start = int(query["pageToken"]) - 1
+        pending = drive.changes[start:]
+        page = pending[:drive.page_size]
+        data = {"changes": [{"fileId": i, "removed": False, "file": drive.metadata(i)} for i in page]}
+        if len(pending) > len(page):
+            data["nextPageToken"] = str(start + len(page) + 1)
+        else:
+            data["newStartPageToken"] = str(len(drive.changes) + 1)
+        self._send_json(data)
+
+    def _download(self, drive, file_id):
+        content = drive.files[file_id]["content"]
+        offset = 0
+        range_header = self.headers.get("Range")
+        if range_header:
+            offset = int(range_header.split("=")[1].split("-")[0])
+            if offset >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        body = content[offset:]
+        self.send_response(206 if range_header else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        if range_header:
+            self.send_header("Content-Range", f"bytes {offset}-{len(content) - 1}/{len(content)}")
+        self.end_headers()
+
+        cut = drive.disconnect_after.pop(file_id, None)
+        if cut is not None:
+            # Send part of the body, then drop the connection mid-stream
+            self.wfile.write(body[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+def start_fake_drive(drive, prefix="/drive/v3"):
+    """
+    Serves `drive` on a background thread. Base URL (for GDRIVE_API_URL): server.url
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.drive = drive
+    server.prefix = prefix
+    server.url = f"http://127.0.0.1:{server.server_address[1]}{prefix}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
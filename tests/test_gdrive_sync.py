@@ -0,0 +1,93 @@
+import os
+
+FOLDER = "folder1"
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_list_folder_follows_pagination(gdrive, drive, session):
+    for i in range(5):
+        drive.add_file(f"f{i}", f"memo{i}.mp3", b"audio %d" % i)
+    drive.add_file("other", "elsewhere.mp3", b"x", folder="folder2")
+
+    items = gdrive.list_folder(session, FOLDER)
+
+    assert sorted(item["name"] for item in items) == [f"memo{i}.mp3" for i in range(5)]
+    # page size 2 -> 3 pages, each later page requested with the previous nextPageToken
+    listings = drive.requests_to("/files")
+    assert len(listings) == 3
+    assert [q.get("pageToken") for _, q, _ in listings] == [None, "2", "4"]
+
+def test_first_sync_stores_token_and_later_syncs_use_changes(gdrive, drive, session, settings, tmp_path):
+    drive.add_file("a", "a.mp3", b"first recording")
+    drive.add_file("b", "b.m4a", b"second recording")
+    drive.add_file("doc", "notes.txt", b"not audio", mime_type="text/plain")
+
+    result = gdrive.sync_from_gdrive(FOLDER, str(tmp_path), session=session)
+
+    assert result.startswith("Successfully synced 2")
+    assert sorted(os.listdir(tmp_path)) == ["a.mp3", "b.m4a"]
+    # Token taken before the listing: 3 changes so far -> "4"
+    assert settings[f"gdrive_page_token:{FOLDER}"] == "4"
+    assert drive.requests_to("/changes") == []
+
+    drive.add_file("c", "c.wav", b"third recording")
+    drive.requests.clear()
+    result = gdrive.sync_from_gdrive(FOLDER, str(tmp_path), session=session)
+
+    assert result.startswith("Successfully synced 1")
+    assert _read(tmp_path / "c.wav") == b"third recording"
+    # Second run reads deltas from the stored token instead of listing the folder
+    assert drive.requests_to("/files") == []
+    assert [q["pageToken"] for _, q, _ in drive.requests_to("/changes")] == ["4"]
+    assert settings[f"gdrive_page_token:{FOLDER}"] == "5"
+
+def test_changes_list_follows_next_page_token(gdrive, drive, session):
+    token = gdrive.get_start_page_token(session)
+    for i in range(5):
+        drive.add_file(f"f{i}", f"memo{i}.mp3", b"%d" % i)
+    drive.add_file("other", "elsewhere.mp3", b"x", folder="folder2")
+
+    items, next_token = gdrive.list_changes(session, token, FOLDER)
+
+    assert sorted(item["id"] for item in items) == [f"f{i}" for i in range(5)]
+    assert next_token == "7"
+    assert len(drive.requests_to("/changes")) == 3
+
+def test_download_resumes_with_range_after_disconnect(gdrive, drive, session, tmp_path):
+    content = bytes(range(256)) * 64
+    drive.add_file("big", "long.mp3", content)
+    drive.disconnect_after["big"] = 5000
+
+    path = gdrive.download_file(session, drive.metadata("big"), str(tmp_path))
+
+    assert _read(path) == content
+    assert not os.path.exists(path + ".part")
+    downloads = drive.requests_to("/files/big")
+    assert len(downloads) == 2
+    assert "Range" not in downloads[0][2]
+    assert downloads[1][2]["Range"] == "bytes=5000-"
+
+def test_sync_skips_files_unchanged_by_md5(gdrive, drive, session, settings, tmp_path):
+    drive.add_file("a", "a.mp3", b"same content")
+    drive.add_file("b", "b.mp3", b"new remote content")
+    # a.mp3 is already here with identical bytes, b.mp3 exists locally but differs from Drive
+    (tmp_path / "a.mp3").write_bytes(b"same content")
+    (tmp_path / "b.mp3").write_bytes(b"old local content")
+
+    result = gdrive.sync_from_gdrive(FOLDER, str(tmp_path), session=session)
+
+    assert result.startswith("Successfully synced 1")
+    assert drive.requests_to("/files/a") == []
+    assert _read(tmp_path / "b.mp3") == b"new remote content"
+
+    # Once the inbox copy is consumed by the pipeline, the remembered md5 still prevents a re-download
+    os.remove(tmp_path / "a.mp3")
+    os.remove(tmp_path / "b.mp3")
+    settings.pop(f"gdrive_page_token:{FOLDER}")
+    drive.requests.clear()
+    result = gdrive.sync_from_gdrive(FOLDER, str(tmp_path), session=session)
+
+    assert result == "No new audio files found in the specified folder."
+    assert [r for r in drive.requests if r[0].startswith("/files/")] == []
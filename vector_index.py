@@ -0,0 +1,194 @@
+import os
+import json
+import fcntl
+import numpy as np
+import llm_client
+from contextlib import contextmanager
+from sqlalchemy import func
+from database import SessionLocal, Transcript, Recording, get_segments_by_index
+
+# 세그먼트 임베딩 인덱스 (append-only 파일 + memmap)
+# - segments.f32: 정규화된 float32 벡터 (N x dim)
+# - segments.ids: int64 (transcript_id, segment 순번) 쌍 (N x 2)
+INDEX_DIR = "data/index"
+VECTORS_PATH = os.path.join(INDEX_DIR, "segments.f32")
+IDS_PATH = os.path.join(INDEX_DIR, "segments.ids")
+META_PATH = os.path.join(INDEX_DIR, "meta.json")
+LOCK_PATH = os.path.join(INDEX_DIR, ".lock")
+
+EMBED_BATCH_SIZE = 64
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+
+# --- 1. 임베딩 (Ollama 로컬 임베딩 엔드포인트) ---
+def embed_texts(texts, config):
+    """
+    Ollama /api/embed로 텍스트 목록을 임베딩하여 L2 정규화된 (N x dim) float32 배열로 반환합니다.
+    """
+    url = f"{config['ollama_url']}/api/embed"
+    model = config.get("embed_model") or DEFAULT_EMBED_MODEL
+    vectors = []
+    for i in range(0, len(texts), EMBED_BATCH_SIZE):
+        response = llm_client.post_json(url, {"model": model, "input": texts[i:i + EMBED_BATCH_SIZE]}, timeout=120)
+        vectors.extend(response["embeddings"])
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+# --- 2. 증분 추가 (여러 워커 프로세스가 동시에 추가하므로 파일 잠금) ---
+@contextmanager
+def _index_lock():
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    with open(LOCK_PATH, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _read_meta():
+    if not os.path.exists(META_PATH):
+        return None
+    with open(META_PATH) as f:
+        return json.load(f)
+
+def _row_count(dim):
+    """
+    벡터/ID 파일 중 온전히 기록된 행 수 (추가 도중 중단된 꼬리는 무시)
+    """
+    if not os.path.exists(VECTORS_PATH) or not os.path.exists(IDS_PATH):
+        return 0
+    return min(os.path.getsize(VECTORS_PATH) // (dim * 4), os.path.getsize(IDS_PATH) // 16)
+
+def _indexed_transcript_ids(dim):
+    rows = _row_count(dim)
+    if rows == 0:
+        return set()
+    ids = np.memmap(IDS_PATH, dtype=np.int64, mode="r", shape=(rows, 2))
+    return set(np.unique(ids[:, 0]).tolist())
+
+def index_transcript(transcript_id, segments, config):
+    """
+    새 Transcript의 세그먼트 임베딩을 인덱스 끝에 추가합니다 (전체 재구축 없음).
+    이미 색인된 transcript는 건너뜁니다. 추가된 행 수를 반환합니다.
+    """
+    items = [(i, seg["text"]) for i, seg in enumerate(segments or []) if seg.get("text", "").strip()]
+    if not items:
+        return 0
+    vectors = embed_texts([t for _, t in items], config)
+    model = config.get("embed_model") or DEFAULT_EMBED_MODEL
+
+    with _index_lock():
+        meta = _read_meta()
+        if meta is None:
+            meta = {"model": model, "dim": int(vectors.shape[1])}
+            with open(META_PATH, "w") as f:
+                json.dump(meta, f)
+        elif meta["model"] != model or meta["dim"] != vectors.shape[1]:
+            raise ValueError(f"인덱스 임베딩 모델({meta['model']})과 현재 모델({model})이 다릅니다. 인덱스를 재구축하세요.")
+
+        dim = meta["dim"]
+        if transcript_id in _indexed_transcript_ids(dim):
+            return 0
+
+        # 이전에 중단된 추가 작업의 꼬리를 잘라 두 파일의 행을 맞춤
+        rows = _row_count(dim)
+        for path, row_bytes in ((VECTORS_PATH, dim * 4), (IDS_PATH, 16)):
+            if os.path.exists(path):
+                os.truncate(path, rows * row_bytes)
+
+        ids = np.asarray([(transcript_id, i) for i, _ in items], dtype=np.int64)
+        with open(VECTORS_PATH, "ab") as f:
+            f.write(vectors.tobytes())
+        with open(IDS_PATH, "ab") as f:
+            f.write(ids.tobytes())
+    return len(items)
+
+# --- 3. 검색 (memmap 행렬에 대한 벡터화 코사인 top-k) ---
+class VectorIndex:
+    def __init__(self):
+        self._size = None
+        self.vectors = None
+        self.ids = None
+
+    def _refresh(self):
+        # 다른 프로세스가 행을 추가했으면 memmap을 다시 엶
+        meta = _read_meta()
+        if meta is None:
+            self.vectors, self.ids = None, None
+            return
+        size = (os.path.getsize(VECTORS_PATH) if os.path.exists(VECTORS_PATH) else 0,
+                os.path.getsize(IDS_PATH) if os.path.exists(IDS_PATH) else 0)
+        if size == self._size:
+            return
+        self._size = size
+        rows = _row_count(meta["dim"])
+        if rows == 0:
+            self.vectors, self.ids = None, None
+            return
+        self.vectors = np.memmap(VECTORS_PATH, dtype=np.float32, mode="r", shape=(rows, meta["dim"]))
+        self.ids = np.memmap(IDS_PATH, dtype=np.int64, mode="r", shape=(rows, 2))
+
+    def search(self, query_vector, k=5):
+        """
+        반환: [(transcript_id, segment 순번, score), ...] (점수 내림차순)
+        """
+        self._refresh()
+        if self.vectors is None:
+            return []
+        scores = self.vectors @ query_vector
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[i, 0]), int(self.ids[i, 1]), float(scores[i])) for i in top]
+
+_index = VectorIndex()
+
+def retrieve_segments(query, config, k=5, context=1):
+    """
+    질문과 가장 가까운 세그먼트 k개를 찾아 앞뒤 context개 세그먼트와 함께 반환합니다.
+    삭제되었거나 최신 버전이 아닌 Transcript의 결과는 제외합니다.
+    반환: [{transcript_id, filename, start, end, text, score}, ...]
+    """
+    query_vector = embed_texts([query], config)[0]
+    candidates = _index.search(query_vector, k * 4)
+    if not candidates:
+        return []
+
+    db = SessionLocal()
+    try:
+        transcript_ids = {tid for tid, _, _ in candidates}
+        latest = (
+            db.query(Transcript.recording_id, func.max(Transcript.version).label("version"))
+            .group_by(Transcript.recording_id)
+            .subquery()
+        )
+        rows = (
+            db.query(Transcript.id, Recording.filename)
+            .join(Recording, Recording.id == Transcript.recording_id)
+            .join(latest, (latest.c.recording_id == Transcript.recording_id) & (latest.c.version == Transcript.version))
+            .filter(Transcript.id.in_(transcript_ids))
+            .all()
+        )
+        filenames = dict(rows)
+    finally:
+        db.close()
+
+    results = []
+    for tid, idx, score in candidates:
+        if tid not in filenames:
+            continue
+        # 히트 주변 세그먼트만 segments 테이블에서 읽음
+        window = get_segments_by_index(tid, max(0, idx - context), idx + context)
+        if not any(seg["index"] == idx for seg in window):
+            continue
+        results.append({
+            "transcript_id": tid,
+            "filename": filenames[tid],
+            "start": window[0]["start"],
+            "end": window[-1]["end"],
+            "text": " ".join(seg["text"] for seg in window),
+            "score": score,
+        })
+        if len(results) >= k:
+            break
+    return results
@@ -1,15 +1,43 @@
 import streamlit as st
 import os
-from faster_whisper import WhisperModel
-from services import optimize_audio, refine_text_with_ai, transcribe_audio
-from database import SessionLocal, Recording, Transcript, init_db
+import time
+import hashlib
+import refine_cache
+from services import refine_text_stream, refine_long_text, estimate_tokens, text_to_segments, MAP_CHUNK_TOKENS
+from database import SessionLocal, Recording, Transcript, init_db, find_transcript_by_hash, load_segments
+from job_queue import enqueue_job, get_job, count_jobs_ahead, pipeline_config
 
-# DB 초기화는 main.py에서 수행하므로 여기선 생략 가능하지만 안전을 위해 유지
+# DB 초기화는 main.py에서 수행하지만 안전을 위해 유지 (프로세스당 한 번만 실제 실행됨)
 init_db()
 
-@st.cache_resource
-def load_model(size, device, compute):
-    return WhisperModel(size, device=device, compute_type=compute)
+POLL_INTERVAL = 2
+
+STAGE_LABELS = {
+    "batch_transcribe": "📦 여러 파일을 묶어서 배치 변환 중...",
+    "decode_once": "📝 음성을 디코딩하여 텍스트로 변환 중... (MP3 보관 인코딩 병렬 진행)",
+    "optimize": "💾 오디오 최적화 진행 중...",
+    "transcribe": "📝 Whisper AI가 음성을 텍스트로 변환 중...",
+    "archive": "🗂️ 데이터베이스 저장 중...",
+}
+
+def current_pipeline_config():
+    """
+    워커에 넘길 STT 설정 (작업 등록 시점의 세션 설정을 스냅샷)
+    """
+    return pipeline_config(st.session_state)
+
+def _load_transcript(transcript_id):
+    db = SessionLocal()
+    try:
+        trans = db.get(Transcript, transcript_id)
+        if trans:
+            rec = db.get(Recording, trans.recording_id)
+            st.session_state.current_script = trans.full_text
+            st.session_state.current_segments = load_segments(trans.id)
+            st.session_state.current_transcript_id = trans.id
+            st.session_state.optimized_path = rec.file_path if rec else None
+    finally:
+        db.close()
 
 def analyze_page():
     st.header("🎙️ 음성 분석 및 AI 검토")
@@ -25,70 +53,72 @@ def analyze_page():
     uploaded_file = st.file_uploader("음성 파일 업로드 (자동 최적화)", type=["mp3", "wav", "m4a"])
 
     if uploaded_file:
-        os.makedirs("data/temp", exist_ok=True)
-        temp_path = os.path.join("data/temp", uploaded_file.name)
-        
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
         if st.button("🚀 분석 시작", type="primary"):
-            status = st.status("작업 진행 중...", expanded=True)
-            
-            # [Step 1] Optimize
-            status.write("💾 오디오 최적화 진행 중...")
-            optimized_path = optimize_audio(temp_path, output_folder="data/storage")
-            
-            if not optimized_path:
-                status.error("오디오 변환 실패 (FFmpeg 설치 여부를 확인하세요)")
-                status.update(label="작업 실패", state="error")
-                return
-
-            try:
-                # [Step 2] Analyze (STT)
-                status.write("📝 Whisper AI가 음성을 텍스트로 변환 중...")
-                
-                w_size = st.session_state.get("whisper_model", "base")
-                w_device = st.session_state.get("whisper_device", "cpu")
-                w_compute = st.session_state.get("whisper_compute", "int8")
-                
-                model = load_model(w_size, w_device, w_compute)
-                full_text, segments_list = transcribe_audio(model, optimized_path)
-                
-                status.write("✅ 분석 완료!")
-                
-                st.session_state.current_script = full_text
-                st.session_state.current_segments = segments_list
-                st.session_state.optimized_path = optimized_path
-
-                # [Step 3] DB Archive
-                status.write("🗂️ 데이터베이스 저장 중...")
+            # 같은 내용의 파일이 이미 분석되었으면 STT 없이 기존 결과를 재사용
+            content_hash = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+            existing = find_transcript_by_hash(content_hash)
+            if existing and existing[1]:
+                _load_transcript(existing[1])
+                st.info("이미 분석된 파일입니다. 저장된 결과를 불러왔습니다.")
+            else:
+                # 작업 등록 시에만 임시 파일을 기록 (rerun마다 다시 쓰지 않음)
+                os.makedirs("data/temp", exist_ok=True)
+                temp_path = os.path.join("data/temp", uploaded_file.name)
+                with open(temp_path, "wb") as f:
+                    f.write(uploaded_file.getbuffer())
+
+                st.session_state.current_job_id = enqueue_job("analyze", {
+                    "input_path": temp_path,
+                    "output_folder": "data/storage",
+                    "content_hash": content_hash,
+                    "config": current_pipeline_config(),
+                })
+
+    # 2. 작업 상태 폴링 (실제 처리는 worker.py 프로세스에서 수행)
+    job_id = st.session_state.get("current_job_id")
+    if job_id:
+        job = get_job(job_id)
+        if job is None:
+            del st.session_state.current_job_id
+        elif job["status"] in ("queued", "running"):
+            status = st.status(f"작업 #{job_id} 진행 중...", expanded=True)
+            if job["status"] == "queued":
+                status.write(f"⏳ 대기 중 (앞선 작업 {count_jobs_ahead(job_id)}건)")
+            else:
+                status.write(STAGE_LABELS.get(job["result"].get("stage"), "⚙️ 처리 중..."))
+            if job["result"].get("progress"):
+                status.write(f"📂 진행: {job['result']['progress']}")
+            if job["attempts"] > 1:
+                status.write(f"🔁 재시도 {job['attempts']}/{job['max_attempts']} (이전 오류: {job['error']})")
+            st.caption("브라우저를 닫아도 작업은 계속 진행됩니다.")
+
+            # 워커가 배치로 커밋한 세그먼트를 실시간으로 표시
+            partial_id = job["result"].get("transcript_id")
+            if partial_id:
                 db = SessionLocal()
-                
-                new_rec = Recording(
-                    filename=os.path.basename(optimized_path),
-                    file_path=optimized_path,
-                    file_size=os.path.getsize(optimized_path) / (1024*1024),
-                    processed=1
-                )
-                db.add(new_rec)
-                db.commit()
-                db.refresh(new_rec)
-                
-                new_trans = Transcript(
-                    recording_id=new_rec.id,
-                    full_text=full_text,
-                    segments_json=segments_list,
-                    version=1
-                )
-                db.add(new_trans)
-                db.commit()
-                db.close()
-                
-                status.update(label="모든 작업 완료!", state="complete", expanded=False)
-
-            except Exception as e:
-                status.error(f"오류 발생: {e}")
-                status.update(label="작업 중단", state="error")
+                try:
+                    partial = db.get(Transcript, partial_id)
+                    if partial and partial.full_text:
+                        status.write(f"🕒 {job['result'].get('checkpoint', 0):.0f}초 지점까지 저장됨")
+                        st.text_area("실시간 변환 결과", value=partial.full_text, height=300, disabled=True)
+                finally:
+                    db.close()
+            time.sleep(POLL_INTERVAL)
+            st.rerun()
+        elif job["status"] == "done" and job["kind"] == "analyze_batch":
+            del st.session_state.current_job_id
+            stats = job["result"].get("stats", {})
+            st.success(f"✅ 일괄 분석 완료! {len(job['result'].get('files', {}))}건 저장 (처리량 {stats.get('throughput', 0)}x 실시간)")
+        elif job["status"] == "done":
+            _load_transcript(job["result"].get("transcript_id"))
+            del st.session_state.current_job_id
+            if job["result"].get("duplicate"):
+                st.info("이미 분석된 파일입니다. 저장된 결과를 불러왔습니다.")
+            else:
+                st.success("✅ 분석 완료! 데이터베이스에 저장되었습니다.")
+        else:
+            del st.session_state.current_job_id
+            st.error(f"작업 실패: {job['error']}")
 
     # --- 결과 검토 및 AI 요청 UI ---
     if "current_script" in st.session_state:
@@ -123,11 +153,46 @@ def analyze_page():
                                 "ollama_model": st.session_state.get("ollama_model"),
                                 "api_key": refiner_api_key
                             }
-                            result = refine_text_with_ai(script_area, ai_config, mode_map[refiner_mode])
+                            transcript_id = st.session_state.get("current_transcript_id")
+                            call_stats = {}
+                            if estimate_tokens(script_area) > MAP_CHUNK_TOKENS:
+                                # 긴 스크립트: 구간별로 나눠 동시에 처리한 뒤 합침 (진행 상황/부분 결과 표시)
+                                segments = st.session_state.get("current_segments") or []
+                                if script_area != st.session_state.current_script or not segments:
+                                    segments = text_to_segments(script_area)
+                                progress = st.progress(0.0, text="구간별 분석 중...")
+                                partial_box = st.expander("구간별 부분 결과", expanded=False)
+
+                                def _on_progress(done, total, index, partial):
+                                    progress.progress(done / total, text=f"구간별 분석 중... ({done}/{total})")
+                                    partial_box.markdown(f"**구간 {index + 1}**\n\n{partial}")
+
+                                result = refine_long_text(
+                                    segments, ai_config, mode_map[refiner_mode],
+                                    on_progress=_on_progress, transcript_id=transcript_id
+                                )
+                                progress.progress(1.0, text="구간 결과 통합 완료")
+                            else:
+                                # 토큰이 생성되는 대로 표시
+                                stream_placeholder = st.empty()
+                                result = ""
+                                for token in refine_text_stream(
+                                    script_area, ai_config, mode_map[refiner_mode],
+                                    transcript_id=transcript_id, stats=call_stats
+                                ):
+                                    result += token
+                                    stream_placeholder.markdown(result + "▌")
+                                stream_placeholder.empty()
                             
                             st.success("검토 완료!")
                             st.text_area("AI 분석 결과", value=result, height=200)
                             st.caption("결과 복사:")
                             st.code(result, language="text")
+                            if call_stats.get("cached"):
+                                st.caption(f"⚡ 캐시된 결과 ({call_stats['engine']} / {call_stats['model']})")
+                            elif call_stats.get("ttft") is not None:
+                                st.caption(f"⏱️ {call_stats['engine']} / {call_stats['model']} · 첫 토큰 {call_stats['ttft']:.2f}s · {call_stats.get('tokens_per_sec', 0)} tok/s")
+                            stats = refine_cache.get_stats()
+                            st.caption(f"캐시 적중률 {stats['hit_rate']:.0%} (메모리 {stats['memory_hits']} / DB {stats['db_hits']} / 미스 {stats['misses']})")
                         except Exception as e:
                             st.error(f"AI 요청 실패: {e}")
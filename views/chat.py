@@ -1,7 +1,17 @@
 import streamlit as st
-import requests
 import os
-import json
+import chat_engine
+from vector_index import retrieve_segments
+
+def build_grounded_prompt(prompt, hits):
+    context = "\n".join(
+        f"[{hit['filename']} {hit['start']:.0f}s-{hit['end']:.0f}s] {hit['text']}" for hit in hits
+    )
+    return (
+        "아래는 사용자가 저장한 음성 녹음에서 찾은 관련 구간이야. 답변에 도움이 되면 참고하고, "
+        "참고한 경우 어느 녹음인지 알려줘.\n\n"
+        f"{context}\n\n질문: {prompt}"
+    )
 
 def chat_page():
     st.header("💬 AI 비서와 대화하기")
@@ -10,13 +20,26 @@ def chat_page():
     current_model = st.session_state.get("ollama_model", "gemma2:2b")
     st.caption(f"Current Engine: {current_model}")
 
+    OLLAMA_URL = st.session_state.get("ollama_url", os.getenv("OLLAMA_URL", "http://localhost:11434"))
+
+    # messages: 화면 표시용, chat_conversation: 모델에 보내는 대화 (요약 + 이전 턴)
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "chat_conversation" not in st.session_state:
+        st.session_state.chat_conversation = chat_engine.new_conversation()
+    conversation = st.session_state.chat_conversation
+
+    if st.session_state.messages and st.button("🧹 새 대화", help="대화 기록과 요약을 지우고 새로 시작합니다."):
+        st.session_state.messages = []
+        st.session_state.chat_conversation = chat_engine.new_conversation()
+        st.rerun()
 
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
 
+    use_recordings = st.toggle("🎙️ 저장된 녹음 내용 참고", value=True, help="질문과 관련된 녹음 구간을 찾아 답변에 활용합니다.")
+
     if prompt := st.chat_input("무엇을 도와드릴까요?"):
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
@@ -25,25 +48,46 @@ def chat_page():
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
             full_response = ""
-            
-            OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
-            
+
+            # 관련 녹음 구간을 찾아 프롬프트에 주입
+            llm_prompt = prompt
+            if use_recordings:
+                try:
+                    hits = retrieve_segments(prompt, {
+                        "ollama_url": OLLAMA_URL,
+                        "embed_model": st.session_state.get("embed_model"),
+                    })
+                except Exception as e:
+                    hits = []
+                    st.caption(f"⚠️ 녹음 검색 실패: {e}")
+                if hits:
+                    llm_prompt = build_grounded_prompt(prompt, hits)
+                    with st.expander(f"📎 참고한 녹음 구간 {len(hits)}개"):
+                        for hit in hits:
+                            st.markdown(f"- **{hit['filename']}** `{hit['start']:.0f}s-{hit['end']:.0f}s` {hit['text']}")
+
             try:
-                payload = {
-                    "model": current_model, # 동적 모델 적용
-                    "prompt": prompt,
-                    "stream": True
-                }
-                with requests.post(f"{OLLAMA_URL}/api/generate", json=payload, stream=True) as response:
-                    for line in response.iter_lines():
-                        if line:
-                            data = json.loads(line.decode("utf-8"))
-                            if "response" in data:
-                                full_response += data["response"]
-                                message_placeholder.markdown(full_response + "▌")
-                                
+                call_stats = {}
+                # 이전 대화와 함께 /api/chat으로 스트리밍 (같은 앞부분은 Ollama KV 캐시 재사용)
+                for token in chat_engine.stream_reply(conversation, OLLAMA_URL, current_model, llm_prompt, stats=call_stats):
+                    full_response += token
+                    message_placeholder.markdown(full_response + "▌")
+
                 message_placeholder.markdown(full_response)
+                if call_stats.get("ttft") is not None:
+                    caption = f"⏱️ 첫 토큰 {call_stats['ttft']:.2f}s · {call_stats.get('tokens_per_sec', 0)} tok/s"
+                    if call_stats.get("prompt_tokens") is not None:
+                        caption += f" · 새로 계산한 프롬프트 {call_stats['prompt_tokens']} 토큰"
+                    st.caption(caption)
                 st.session_state.messages.append({"role": "assistant", "content": full_response})
 
+                # 답변을 보여준 뒤 오래된 턴을 요약으로 접음 (다음 질문의 첫 토큰 지연에 영향 없음)
+                try:
+                    with st.spinner("이전 대화 요약 중..."):
+                        if chat_engine.compact(conversation, OLLAMA_URL, current_model):
+                            st.caption(f"🗂️ 이전 대화를 요약했습니다 ({conversation['compactions']}회)")
+                except Exception as e:
+                    st.caption(f"⚠️ 대화 요약 실패: {e}")
+
             except Exception as e:
                 st.error(f"AI 서버({OLLAMA_URL}) 연결 오류: {e}")
\ No newline at end of file
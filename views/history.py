@@ -1,33 +1,67 @@
 import streamlit as st
-from database import SessionLocal, Recording, Transcript
+from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import defer
+from database import SessionLocal, Recording, Transcript, RECORDING_FAILED
+
+PAGE_SIZE = 20
+
+def _latest_transcript_page(db, cursor=None, limit=PAGE_SIZE):
+    """
+    녹음별 최신 버전 Transcript를 한 번의 조인 쿼리로 가져옵니다 (N+1 쿼리 제거).
+    cursor=(created_at, id): 이전 페이지 마지막 행 기준 keyset 페이지네이션.
+    무거운 full_text 컬럼은 지연 로딩합니다.
+    """
+    latest = (
+        db.query(Transcript.recording_id, func.max(Transcript.version).label("version"))
+        .group_by(Transcript.recording_id)
+        .subquery()
+    )
+    query = (
+        db.query(Recording, Transcript)
+        .outerjoin(latest, latest.c.recording_id == Recording.id)
+        .outerjoin(Transcript, and_(Transcript.recording_id == latest.c.recording_id, Transcript.version == latest.c.version))
+        .options(defer(Transcript.full_text), defer(Transcript.segments_json))
+    )
+    if cursor:
+        created_at, rec_id = cursor
+        query = query.filter(or_(
+            Recording.created_at < created_at,
+            and_(Recording.created_at == created_at, Recording.id < rec_id),
+        ))
+    return query.order_by(Recording.created_at.desc(), Recording.id.desc()).limit(limit + 1).all()
 
 def history_page():
     st.header("🗂️ 음성녹음 기록 (History)")
-    
+
+    # 페이지별 시작 cursor 스택 (첫 페이지는 None)
+    if "history_cursors" not in st.session_state:
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+
     db = SessionLocal()
-    # 최신순으로 정렬하여 데이터 가져오기 (Recording과 Transcript 조인 가능성 고려)
     try:
-        # 간단하게 Recording 정보를 먼저 가져오고, 클릭 시 Transcript를 가져오거나 한꺼번에 가져옴
-        recordings = db.query(Recording).order_by(Recording.created_at.desc()).all()
-        
-        if not recordings:
+        rows = _latest_transcript_page(db, cursors[-1])
+        has_next = len(rows) > PAGE_SIZE
+        rows = rows[:PAGE_SIZE]
+
+        if not rows and len(cursors) == 1:
             st.info("아직 저장된 기록이 없습니다. 'Analyze' 메뉴에서 음성을 분석해보세요.")
             return
 
-        for rec in recordings:
-            # 해당 레코딩의 최신 트랜스크립트 가져오기
-            trans = db.query(Transcript).filter(Transcript.recording_id == rec.id).order_by(Transcript.version.desc()).first()
-            
+        for rec, trans in rows:
             with st.expander(f"🎵 {rec.filename} ({rec.created_at.strftime('%Y-%m-%d %H:%M')})", expanded=False):
                 col1, col2 = st.columns([3, 1])
                 with col1:
                     st.caption(f"파일 경로: {rec.file_path} | 용량: {rec.file_size:.2f} MB")
+                    if rec.processed == RECORDING_FAILED:
+                        st.caption("❌ 변환 실패 (실패 전까지 저장된 내용만 표시됩니다)")
+                    elif not rec.processed:
+                        st.caption("⏳ 변환 진행 중 (지금까지 저장된 내용만 표시됩니다)")
                 with col2:
                     if st.button("삭제", key=f"del_{rec.id}"):
                         # 삭제 로직 (실제 파일은 남겨둘지 선택 가능하지만 여기선 DB만 처리하는 예시)
+                        db.query(Transcript).filter(Transcript.recording_id == rec.id).delete()
                         db.delete(rec)
-                        # 연관된 트랜스크립트도 삭제 (CASCADE 설정에 따라 자동일 수 있음)
-                        if trans: db.delete(trans)
                         db.commit()
                         st.rerun()
 
@@ -38,10 +72,28 @@ def history_page():
                             st.markdown(trans.summary)
                         else:
                             st.info("요약 정보가 없습니다. 상세 분석을 진행해주세요.")
-                    
+                        if trans.tags:
+                            st.markdown("**📌 중요 사항**")
+                            st.markdown(trans.tags)
+
                     with tab2:
-                        st.text_area("전체 내용", trans.full_text, height=300, key=f"text_{rec.id}")
+                        # 전체 텍스트는 사용자가 요청할 때만 불러옴
+                        if st.toggle("전체 텍스트 불러오기", key=f"load_{rec.id}"):
+                            st.text_area("전체 내용", trans.full_text, height=300, key=f"text_{rec.id}")
                 else:
                     st.warning("변환된 텍스트 정보가 없습니다.")
+
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if len(cursors) > 1 and st.button("◀ 이전", use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col_page:
+            st.caption(f"{len(cursors)} 페이지")
+        with col_next:
+            if has_next and st.button("다음 ▶", use_container_width=True):
+                last_rec = rows[-1][0]
+                cursors.append((last_rec.created_at, last_rec.id))
+                st.rerun()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
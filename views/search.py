@@ -0,0 +1,52 @@
+import streamlit as st
+import os
+import time
+from search_service import search_transcripts, search_segments
+from database import get_segments_in_range
+
+# 재생 시작 지점부터 미리 보여줄 구간 길이(초)
+PREVIEW_SECONDS = 60
+
+def _format_time(seconds):
+    seconds = int(seconds or 0)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def search_page():
+    st.header("🔍 녹음 내용 검색")
+    st.caption("말한 내용으로 녹음을 찾고, 해당 시점부터 바로 재생합니다.")
+
+    query = st.text_input("검색어", placeholder="예: 다음 주 회의, 예산")
+    if not query.strip():
+        return
+
+    started = time.perf_counter()
+    recordings = search_transcripts(query)
+    hits = search_segments(query, [r["transcript_id"] for r in recordings], limit=200) if recordings else []
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    st.caption(f"{len(recordings)}개 녹음, {len(hits)}개 구간 ({elapsed_ms:.0f} ms)")
+    if not recordings:
+        st.info("검색 결과가 없습니다.")
+        return
+
+    hits_by_transcript = {}
+    for hit in hits:
+        hits_by_transcript.setdefault(hit["transcript_id"], []).append(hit)
+
+    for rec in recordings:
+        rec_hits = sorted(hits_by_transcript.get(rec["transcript_id"], []), key=lambda h: h["start"] or 0)
+        with st.expander(f"🎵 {rec['filename']} ({rec['created_at']:%Y-%m-%d %H:%M}) · {len(rec_hits)}개 구간", expanded=True):
+            for hit in rec_hits:
+                col1, col2 = st.columns([6, 1])
+                with col1:
+                    st.markdown(f"`{_format_time(hit['start'])} - {_format_time(hit['end'])}` {hit['snippet']}")
+                with col2:
+                    if st.button("▶", key=f"play_{rec['transcript_id']}_{hit['start']}"):
+                        st.session_state.search_play = (rec["transcript_id"], hit["start"])
+
+            play = st.session_state.get("search_play")
+            if play and play[0] == rec["transcript_id"] and rec["file_path"] and os.path.exists(rec["file_path"]):
+                st.audio(rec["file_path"], start_time=int(play[1] or 0))
+                # 재생 위치 이후 구간만 읽어 자막처럼 표시 (전체 세그먼트를 불러오지 않음)
+                for seg in get_segments_in_range(rec["transcript_id"], play[1] or 0, (play[1] or 0) + PREVIEW_SECONDS):
+                    st.caption(f"`{_format_time(seg['start'])}` {seg['text']}")
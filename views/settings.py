@@ -2,6 +2,26 @@ import streamlit as st
 import os
 from database import save_setting
 
+def _number_setting(label, key, min_value, max_value):
+    """
+    문자열로 저장되는 숫자 설정용 입력 (위젯 값은 별도 키에 두고 바뀌면 저장)
+    """
+    widget_key = f"_{key}_input"
+
+    def _save():
+        st.session_state[key] = str(st.session_state[widget_key])
+        save_setting(key, st.session_state[key])
+
+    st.number_input(
+        label,
+        min_value=min_value,
+        max_value=max_value,
+        value=min(max_value, max(min_value, int(float(st.session_state.get(key) or min_value)))),
+        step=1,
+        key=widget_key,
+        on_change=_save,
+    )
+
 def settings_page():
     st.header("⚙️ 시스템 설정 (Zero-Config)")
     st.caption("서버 재시작 없이 AI 엔진과 시스템 동작 방식을 즉시 변경합니다.")
@@ -21,7 +41,7 @@ def settings_page():
                 ["tiny", "base", "small", "medium", "large-v3"],
                 key="whisper_model",
                 on_change=lambda: save_setting("whisper_model", st.session_state.whisper_model),
-                help="N100 등 저전력 서버는 'tiny' 또는 'base' 권장"
+                help="클수록 정확하지만 느립니다. 서버에서 실제 속도는 자동 튜닝(autotune.py)으로 측정하세요."
             )
             # 하드웨어 가속 설정
             st.selectbox(
@@ -33,11 +53,54 @@ def settings_page():
             )
             st.selectbox(
                 "정밀도 (Compute Type)",
-                ["int8", "float16", "float32"],
+                ["auto", "int8", "float16", "float32"],
                 key="whisper_compute",
                 on_change=lambda: save_setting("whisper_compute", st.session_state.whisper_compute),
-                help="int8은 메모리를 적게 사용합니다 (N100 권장)."
+                help="auto는 자동 튜닝 프로필의 정밀도를 사용합니다 (프로필이 없으면 장치에 맞게 자동 선택). 직접 고른 값은 프로필보다 우선합니다. int8은 메모리를 적게 사용합니다."
+            )
+            st.toggle(
+                "자동 튜닝 프로필 사용",
+                key="whisper_autotune",
+                on_change=lambda: save_setting("whisper_autotune", st.session_state.whisper_autotune),
+                help="이 서버에서 측정한 정밀도/스레드/beam 조합을 분석에, 동시 워커 수는 실시간/API 변환에만 적용합니다."
+            )
+            from autotune import load_profile, host_fingerprint, uses_profile_compute
+            profile = load_profile(st.session_state.whisper_model, st.session_state.whisper_device)
+            if profile and profile.get("host") == host_fingerprint():
+                best = profile["best"]
+                live = profile.get("live", best)
+                st.caption(
+                    f"⚙️ 튜닝 프로필 ({profile['measured_at']}): {best['compute_type']} · 스레드 {best['cpu_threads']} · "
+                    f"beam {best['beam_size']} → {1 / best['rtf']:.1f}x 실시간, peak {best['peak_rss_mb']:.0f} MB · "
+                    f"실시간/API 워커 {live['num_workers']}"
+                )
+                if st.session_state.get("whisper_autotune", True) and best["compute_type"] != st.session_state.whisper_compute:
+                    if uses_profile_compute({"whisper_compute": st.session_state.whisper_compute}):
+                        st.caption(f"↪️ 정밀도 auto → 프로필의 **{best['compute_type']}**로 적용됩니다.")
+                    else:
+                        st.caption(f"↪️ 정밀도는 직접 고른 **{st.session_state.whisper_compute}**를 사용합니다 (프로필: {best['compute_type']}).")
+            else:
+                st.caption("⚙️ 이 서버/모델의 튜닝 프로필이 없습니다. `python autotune.py`로 측정하세요.")
+            st.toggle(
+                "긴 녹음 병렬 변환",
+                key="long_audio_parallel",
+                on_change=lambda: save_setting("long_audio_parallel", st.session_state.long_audio_parallel),
+                help="20분 이상 녹음을 무음 구간에서 나누어 CPU 코어별로 동시에 변환합니다."
             )
+            with st.expander("📊 워커 상주 모델 현황"):
+                from model_registry import get_cluster_status
+                status = get_cluster_status()
+                if not status:
+                    st.caption("현재 메모리에 올라간 모델이 없습니다.")
+                for worker_id, info in status.items():
+                    # reserved_mb: 긴 녹음 청크 변환 프로세스가 올린 모델
+                    used = sum(m["memory_mb"] for m in info["models"]) + info.get("reserved_mb", 0)
+                    st.caption(f"**{worker_id}** · 모델 {used:.0f} / {info['budget_mb']} MB · 프로세스 RSS {info['rss_mb'] or 0:.0f} MB")
+                    for m in info["models"]:
+                        st.caption(
+                            f"- {m['model']} ({m['device']}/{m['compute_type']}, 스레드 {m.get('cpu_threads') or '기본'}) 약 {m['memory_mb']:.0f} MB · "
+                            f"로드 {m['load_seconds']}s · 워밍업 {m['warmup_seconds']}s · 유휴 {m['idle_seconds']}s"
+                        )
 
         with col2:
             st.markdown("#### 🧠 LLM (Ollama)")
@@ -55,20 +118,26 @@ def settings_page():
                 placeholder="예: gemma2:2b, llama3",
                 help="Ollama에 설치된 모델 이름을 입력하세요."
             )
+            st.text_input(
+                "임베딩 모델명 (녹음 검색용)",
+                key="embed_model",
+                on_change=lambda: save_setting("embed_model", st.session_state.embed_model),
+                placeholder="예: nomic-embed-text, bge-m3",
+                help="Chat 비서가 저장된 녹음을 찾아 참고할 때 사용하는 Ollama 임베딩 모델입니다."
+            )
             
             if st.button("🔌 Ollama 연결 테스트", use_container_width=True):
                 import requests
+                import llm_client
                 try:
                     url = f"{st.session_state.ollama_url}/api/tags"
-                    response = requests.get(url, timeout=5)
-                    if response.status_code == 200:
-                        models = [m['name'] for m in response.json().get('models', [])]
-                        if st.session_state.ollama_model in models:
-                            st.success(f"연결 성공! '{st.session_state.ollama_model}' 모델이 준비되었습니다.")
-                        else:
-                            st.warning(f"연결 성공! 하지만 '{st.session_state.ollama_model}' 모델이 없습니다. (설치된 모델: {', '.join(models)})")
+                    models = [m['name'] for m in llm_client.get_json(url, timeout=5).get('models', [])]
+                    if st.session_state.ollama_model in models:
+                        st.success(f"연결 성공! '{st.session_state.ollama_model}' 모델이 준비되었습니다.")
                     else:
-                        st.error(f"연결 실패 (HTTP {response.status_code})")
+                        st.warning(f"연결 성공! 하지만 '{st.session_state.ollama_model}' 모델이 없습니다. (설치된 모델: {', '.join(models)})")
+                except requests.HTTPError as e:
+                    st.error(f"연결 실패 (HTTP {e.response.status_code})")
                 except Exception as e:
                     st.error(f"연결 오류: {e}\nURL: {st.session_state.ollama_url}")
 
@@ -90,18 +159,56 @@ def settings_page():
             on_change=lambda: save_setting("auto_delete", st.session_state.auto_delete),
             help="활성화 시, 분석이 끝나면 용량이 큰 원본 파일은 삭제합니다."
         )
+
+        st.text_input(
+            "감시 폴더 (자동 분석)",
+            key="watch_folders",
+            on_change=lambda: save_setting("watch_folders", st.session_state.watch_folders),
+            placeholder="/data/inbox, /mnt/recorder",
+            help="쉼표로 구분합니다. data/inbox(드라이브에서 가져온 파일)는 항상 감시되며, 워커를 --watch 옵션으로 실행해야 동작합니다."
+        )
+
+        with st.expander("🧹 보존 정책 (디스크 사용률 기반 자동 정리)"):
+            st.toggle(
+                "자동 정리 사용",
+                key="retention_enabled",
+                on_change=lambda: save_setting("retention_enabled", st.session_state.retention_enabled),
+                help="워커가 한 시간마다 오래된 임시 파일을 정리하고, Opus 압축을 켰다면 오래된 녹음을 Opus로 압축합니다."
+            )
+            col1, col2 = st.columns(2)
+            with col1:
+                _number_setting("정리 시작 사용률 (%)", "disk_high_watermark", 50, 99)
+                _number_setting("Opus 압축 대상 (일 경과, 0 = 사용 안 함)", "tier_after_days", 0, 3650)
+            with col2:
+                _number_setting("정리 목표 사용률 (%)", "disk_low_watermark", 10, 98)
+                _number_setting("임시 파일 보관 (시간)", "temp_max_age_hours", 1, 720)
+
+            policies = {"none": "오디오 유지", "delete_audio": "오래된 오디오 삭제 (텍스트 유지)"}
+            st.selectbox(
+                "디스크가 부족할 때",
+                options=list(policies),
+                format_func=policies.get,
+                key="evict_policy",
+                on_change=lambda: save_setting("evict_policy", st.session_state.evict_policy),
+            )
+
+            if st.button("지금 정리 실행", use_container_width=True):
+                from retention import run_retention
+                with st.spinner("정리 중..."):
+                    report = run_retention()
+                freed_mb = sum(report["freed"].values()) / (1024*1024)
+                st.success(f"{freed_mb:.1f}MB 확보 (디스크 {report['before_percent']}% → {report['after_percent']}%)")
         
         col1, col2 = st.columns(2)
         with col1:
-            if st.button("🗑️ 임시 파일 삭제", help="data/temp 폴더의 모든 파일을 삭제합니다.", use_container_width=True):
-                temp_dir = "data/temp"
-                if os.path.exists(temp_dir):
-                    files = os.listdir(temp_dir)
-                    for f in files:
-                        os.remove(os.path.join(temp_dir, f))
-                    st.success(f"{len(files)}개의 임시 파일을 삭제했습니다.")
+            if st.button("🗑️ 임시 파일 삭제", help="data/temp 폴더에서 대기/진행 중인 작업의 입력을 제외한 파일을 삭제합니다.", use_container_width=True):
+                from retention import purge_temp
+                # 업로드는 data/temp에서 작업 큐를 기다리므로 등록된 작업의 입력 파일은 남김
+                freed = purge_temp(0)
+                if freed:
+                    st.success(f"임시 파일 {freed / (1024*1024):.1f}MB를 삭제했습니다.")
                 else:
-                    st.info("삭제할 임시 폴더가 없습니다.")
+                    st.info("삭제할 임시 파일이 없습니다.")
         
         with col2:
             if st.button("🚨 모든 기록 초기화", help="DB와 저장된 모든 오디오 파일을 삭제합니다.", type="secondary", use_container_width=True):
@@ -152,6 +259,33 @@ def settings_page():
         with col2:
              st.caption("폴더 내의 신규 오디오 파일(.mp3, .m4a, .wav)을 자동으로 수집합니다.")
 
+        if st.button("📦 가져온 파일 일괄 분석", help="data/inbox의 오디오 중 아직 등록되지 않은 파일을 하나의 모델로 묶어 배치 변환합니다."):
+            from services import AUDIO_EXTENSIONS
+            from job_queue import enqueue_job, has_active_job
+            from views.analyze import current_pipeline_config
+
+            inbox_dir = "data/inbox"
+            audio = [
+                os.path.join(inbox_dir, f) for f in sorted(os.listdir(inbox_dir)) if f.lower().endswith(AUDIO_EXTENSIONS)
+            ] if os.path.exists(inbox_dir) else []
+            # 감시 폴더(워커 --watch)가 이미 개별 작업으로 등록한 파일은 제외
+            files = [path for path in audio if not has_active_job(path)]
+            watched = len(audio) - len(files)
+            if files:
+                st.session_state.current_job_id = enqueue_job("analyze_batch", {
+                    "input_paths": files,
+                    "output_folder": "data/storage",
+                    "config": current_pipeline_config(),
+                })
+                st.success(f"{len(files)}개 파일을 일괄 분석 작업으로 등록했습니다. 'Analyze' 메뉴에서 진행 상황을 확인하세요.")
+            if watched:
+                st.info(
+                    f"{watched}개 파일은 감시 폴더가 이미 개별 분석 작업으로 등록해 처리 중이라 건너뛰었습니다. "
+                    "워커를 --watch로 실행 중이면 가져온 파일은 자동으로 분석되므로 이 버튼이 필요 없습니다."
+                )
+            elif not files:
+                st.info("분석할 오디오 파일이 없습니다.")
+
         st.text_input("Telegram Bot Token", 
                      placeholder="토큰 입력 (준비 중)", 
                      disabled=True,
@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import argparse
+import threading
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import init_db, find_transcript_by_hash
+from config_service import get_settings
+from job_queue import enqueue_job, has_active_job, pipeline_config
+
+DEFAULT_WATCH_DIR = "data/inbox" # Google Drive 동기화 등 외부에서 가져온 파일
+# 업로드 화면/API가 직접 작업을 등록하는 임시 폴더는 감시하지 않음 (같은 파일이 두 번 등록되지 않도록)
+UPLOAD_STAGING_DIR = "data/temp"
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a")
+STABLE_SECONDS = 3.0 # 크기/수정시각이 이 시간 동안 그대로면 쓰기가 끝난 것으로 판단
+POLL_INTERVAL = 1.0
+FOLDER_REFRESH_SECONDS = 30.0
+
+def _is_audio(path):
+    name = os.path.basename(path)
+    return not name.startswith(".") and name.lower().endswith(AUDIO_EXTENSIONS)
+
+class _IngestHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.track(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.track(event.src_path)
+
+    def on_moved(self, event):
+        # Drive 동기화는 .part로 받은 뒤 최종 이름으로 rename
+        if not event.is_directory:
+            self.watcher.track(event.dest_path)
+
+class FolderWatcher:
+    """
+    감시 폴더에 새로 들어온 오디오를 쓰기가 끝날 때까지(크기 안정화) 기다렸다가 분석 작업으로 등록합니다.
+    실제 동시 처리 수는 작업 큐를 소비하는 워커 프로세스 수로 제한됩니다.
+    """
+    def __init__(self, extra_folders=None, stable_seconds=STABLE_SECONDS):
+        self.extra_folders = list(extra_folders or [])
+        self.stable_seconds = stable_seconds
+        self.observer = Observer()
+        self.handler = _IngestHandler(self)
+        self.watched = set()
+        self.pending = {} # path -> (size, mtime, 마지막 변화 시각)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def folders(self):
+        configured = get_settings().get("watch_folders") or ""
+        folders = [DEFAULT_WATCH_DIR] + self.extra_folders + [f.strip() for f in configured.split(",") if f.strip()]
+        staging = os.path.realpath(UPLOAD_STAGING_DIR)
+        return [f for f in dict.fromkeys(os.path.realpath(f) for f in folders) if f != staging]
+
+    def _refresh_folders(self):
+        for folder in self.folders():
+            if folder in self.watched:
+                continue
+            os.makedirs(folder, exist_ok=True)
+            self.observer.schedule(self.handler, folder, recursive=False)
+            self.watched.add(folder)
+            print(f"👀 감시 시작: {folder}")
+            # 감시 시작 전에 이미 들어와 있던 파일도 처리
+            for name in os.listdir(folder):
+                self.track(os.path.join(folder, name))
+
+    def track(self, path):
+        if not _is_audio(path):
+            return
+        with self.lock:
+            self.pending.setdefault(os.path.realpath(path), (-1, -1, time.monotonic()))
+
+    def _poll(self):
+        now = time.monotonic()
+        ready = []
+        with self.lock:
+            for path, (size, mtime, since) in list(self.pending.items()):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    del self.pending[path]
+                    continue
+                if (stat.st_size, stat.st_mtime) != (size, mtime):
+                    self.pending[path] = (stat.st_size, stat.st_mtime, now)
+                elif stat.st_size > 0 and now - since >= self.stable_seconds:
+                    del self.pending[path]
+                    ready.append(path)
+
+        if ready:
+            config = pipeline_config(get_settings())
+            for path in ready:
+                self._enqueue(path, config)
+
+    def _enqueue(self, path, config):
+        from services import file_sha256
+
+        # 다른 경로(업로드 화면, 일괄 분석 등)에서 이미 등록된 파일은 건너뜀
+        if has_active_job(path):
+            return
+        # 같은 내용이 이미 등록/분석되었으면 건너뜀 (다른 이름으로 복사된 경우)
+        content_hash = file_sha256(path)
+        existing = find_transcript_by_hash(content_hash)
+        if (existing and existing[1]) or has_active_job(content_hash=content_hash):
+            print(f"⏭️ 이미 분석(등록)된 내용이라 건너뜀: {os.path.basename(path)}")
+            return
+        job_id = enqueue_job("analyze", {
+            "input_path": path, "output_folder": "data/storage", "content_hash": content_hash, "config": config,
+        })
+        print(f"📥 자동 등록: {os.path.basename(path)} -> Job #{job_id}")
+
+    def run(self):
+        self._refresh_folders()
+        self.observer.start()
+        last_refresh = time.monotonic()
+        try:
+            while not self.stop_event.wait(POLL_INTERVAL):
+                try:
+                    self._poll()
+                    if time.monotonic() - last_refresh >= FOLDER_REFRESH_SECONDS:
+                        self._refresh_folders()
+                        last_refresh = time.monotonic()
+                except Exception as e:
+                    print(f"⚠️ 감시 폴더 처리 오류: {e}")
+        finally:
+            self.observer.stop()
+            self.observer.join()
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name="memora-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stop_event.set()
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoRa 감시 폴더 자동 수집")
+    parser.add_argument("folders", nargs="*", help=f"{DEFAULT_WATCH_DIR} 외에 추가로 감시할 폴더")
+    parser.add_argument("--stable-seconds", type=float, default=STABLE_SECONDS)
+    args = parser.parse_args()
+
+    init_db()
+    watcher = FolderWatcher(args.folders, args.stable_seconds)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import threading
+import traceback
+import multiprocessing
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import (
+    engine, init_db, save_transcript, find_transcript_by_hash,
+    create_transcript, append_segments, get_transcript_checkpoint, finalize_recording, load_segments,
+)
+import model_registry
+from metrics import stage_timer, sample_loop
+from retention import keep_or_discard_input, retention_loop
+from autotune import apply_profile
+from job_queue import LEASE_SECONDS, claim_job, renew_lease, update_job_result, complete_job, fail_job
+
+POLL_INTERVAL = 2.0
+
+def get_model_args(config):
+    return {
+        "model_size_or_path": config.get("whisper_model", "base"),
+        "device": config.get("whisper_device", "cpu"),
+        "compute_type": config.get("whisper_compute", "int8"),
+        "cpu_threads": int(config.get("whisper_cpu_threads", 0)),
+        "num_workers": int(config.get("whisper_num_workers", 1)),
+    }
+
+def get_model(config):
+    # 워커 프로세스별 모델 레지스트리 (메모리 예산 LRU + 유휴 해제)
+    return model_registry.get_model(get_model_args(config))
+
+# --- 1. 파이프라인: optimize -> transcribe -> DB archive ---
+def _index_transcript(transcript_id, config):
+    """
+    Chat 검색용 벡터 인덱스에 새 Transcript를 추가합니다. 실패해도 분석 작업은 성공으로 둡니다.
+    """
+    if not config.get("ollama_url"):
+        return
+    try:
+        from vector_index import index_transcript
+        index_transcript(transcript_id, load_segments(transcript_id), config)
+    except Exception as e:
+        print(f"⚠️ 벡터 인덱스 추가 실패 (transcript #{transcript_id}): {e}")
+
+def _check_duplicate(input_path, content_hash):
+    """
+    이미 분석된 원본이면 임시 파일을 지우고 기존 기록의 id를 반환합니다.
+    """
+    existing = find_transcript_by_hash(content_hash)
+    if existing and existing[1]:
+        if os.path.exists(input_path):
+            os.remove(input_path)
+        return {"recording_id": existing[0], "transcript_id": existing[1], "duplicate": True}
+    return None
+
+SEGMENT_BATCH_SIZE = 20 # 이만큼 쌓이거나
+SEGMENT_FLUSH_SECONDS = 5.0 # 이 시간이 지나면 DB에 커밋
+
+def _persist_stream(job_id, worker_id, transcript_id, stream):
+    """
+    STT 스트림의 세그먼트를 배치로 Transcript에 이어 붙이고, 마지막 커밋 시각을 job에 기록합니다.
+    """
+    batch = []
+    last_flush = time.monotonic()
+
+    def _flush():
+        nonlocal batch, last_flush
+        if batch:
+            with stage_timer("db_write", job_id=job_id):
+                checkpoint = append_segments(transcript_id, batch)
+                update_job_result(job_id, worker_id, checkpoint=checkpoint)
+            batch = []
+        last_flush = time.monotonic()
+
+    for segment in stream:
+        batch.append(segment)
+        if len(batch) >= SEGMENT_BATCH_SIZE or time.monotonic() - last_flush >= SEGMENT_FLUSH_SECONDS:
+            _flush()
+    _flush()
+
+def run_analyze_job(job, worker_id):
+    from services import (
+        optimize_audio, optimize_and_transcribe_stream, transcribe_audio_stream, get_optimized_path, file_sha256,
+        probe_duration,
+    )
+
+    payload = job["payload"]
+    progress = job["result"]
+    # 이 호스트에서 측정한 튜닝 프로필이 있으면 적용
+    config = apply_profile(payload.get("config", {}))
+    beam_size = int(config.get("beam_size", 5))
+    input_path = payload["input_path"]
+    output_folder = payload.get("output_folder", "data/storage")
+    archive_path = get_optimized_path(input_path, output_folder)
+
+    # 가장 비싼 STT 단계 전에 내용 해시로 중복 확인 (원본이 지워진 재시도에서도 쓰도록 result에 보관)
+    content_hash = payload.get("content_hash") or progress.get("content_hash")
+    if not content_hash and os.path.exists(input_path):
+        content_hash = file_sha256(input_path)
+        update_job_result(job["id"], worker_id, content_hash=content_hash)
+    duplicate = _check_duplicate(input_path, content_hash)
+    if duplicate:
+        return duplicate
+
+    # 처리 중 기록을 먼저 만들고, 재시도라면 이전 시도의 기록에 마지막 커밋 지점부터 이어서 저장
+    recording_id, transcript_id = progress.get("recording_id"), progress.get("transcript_id")
+    if not transcript_id:
+        recording_id, transcript_id = create_transcript(archive_path)
+        update_job_result(job["id"], worker_id, recording_id=recording_id, transcript_id=transcript_id)
+    offset = get_transcript_checkpoint(transcript_id)
+    if offset:
+        print(f"🔁 [{worker_id}] Job #{job['id']} {offset:.1f}초 지점부터 재개")
+
+    # 긴 녹음 병렬 변환 경로에서는 청크 프로세스가 각자 모델을 올리므로 부모 모델은 실제로 필요할 때만 로드
+    model = lambda: get_model(config)
+    # auto_delete가 꺼져 있으면 분석이 끝난 원본을 data/originals에 보관 (retention.py가 디스크 압박 시 정리)
+    keep_original = not config.get("auto_delete", True)
+    # 긴 녹음 병렬 변환이 켜져 있으면 청크별 프로세스가 쓸 모델 인자를 넘김
+    model_args = get_model_args(config) if config.get("long_audio_parallel", True) else None
+
+    if not os.path.exists(input_path) and os.path.exists(archive_path):
+        # 이전 시도에서 보관 인코딩까지 끝나고 원본이 지워진 경우: 보관본으로 STT만 이어서 수행
+        optimized_path = archive_path
+        update_job_result(job["id"], worker_id, stage="transcribe", optimized_path=optimized_path)
+        stream = transcribe_audio_stream(model, optimized_path, offset=offset, model_args=model_args, beam_size=beam_size)
+    elif config.get("pipeline_mode", "decode_once") == "decode_once":
+        optimized_path = archive_path
+        update_job_result(job["id"], worker_id, stage="decode_once")
+        stream = optimize_and_transcribe_stream(
+            model, input_path, output_folder, model_args, offset=offset, keep_original=keep_original, beam_size=beam_size
+        )
+    else:
+        # 기존 방식: MP3로 최적화한 뒤 보관본을 다시 디코딩하여 STT
+        update_job_result(job["id"], worker_id, stage="optimize")
+        optimized_path = optimize_audio(input_path, output_folder=output_folder, keep_original=keep_original)
+        if not optimized_path:
+            raise RuntimeError("오디오 변환 실패 (FFmpeg 설치 여부를 확인하세요)")
+        update_job_result(job["id"], worker_id, stage="transcribe")
+        stream = transcribe_audio_stream(model, optimized_path, offset=offset, beam_size=beam_size)
+
+    # STT 시간에는 같은 스트림 안에서 일어나는 디코딩/세그먼트 저장도 포함됨 (각각 decode, db_write로도 기록)
+    with stage_timer("stt", job_id=job["id"]) as info:
+        _persist_stream(job["id"], worker_id, transcript_id, stream)
+        info["audio_seconds"] = get_transcript_checkpoint(transcript_id) - offset
+
+    update_job_result(job["id"], worker_id, stage="archive", optimized_path=optimized_path)
+    # 원본은 이미 지워졌을 수 있으므로 길이는 보관본에서 읽음
+    duration = probe_duration(optimized_path)
+    with stage_timer("db_write", job_id=job["id"]):
+        recording_id, transcript_id = finalize_recording(recording_id, transcript_id, optimized_path, content_hash, duration)
+    _index_transcript(transcript_id, config)
+    return {"recording_id": recording_id, "transcript_id": transcript_id}
+
+BATCH_GROUP_SIZE = 32 # 한 번에 메모리에 올려 배치 추론할 파일 수
+
+def run_batch_job(job, worker_id):
+    """
+    여러 파일을 decode-once 후 하나의 모델로 배치 추론합니다.
+    이미 저장된 파일은 result["files"]에 기록되어 재시도 시 건너뜁니다.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from services import decode_audio, encode_archive, transcribe_batch, get_optimized_path, file_sha256, SAMPLE_RATE
+
+    payload = job["payload"]
+    config = apply_profile(payload.get("config", {}))
+    output_folder = payload.get("output_folder", "data/storage")
+    os.makedirs(output_folder, exist_ok=True)
+    model = get_model(config)
+
+    done = dict(job["result"].get("files", {}))
+    pending = []
+    hashes = {}
+    for path in payload["input_paths"]:
+        if path in done or not os.path.exists(path):
+            continue
+        hashes[path] = file_sha256(path)
+        duplicate = _check_duplicate(path, hashes[path])
+        if duplicate:
+            done[path] = duplicate["transcript_id"]
+        else:
+            pending.append(path)
+    totals = {"files": 0, "audio_seconds": 0.0, "wall_seconds": 0.0}
+
+    for i in range(0, len(pending), BATCH_GROUP_SIZE):
+        group = pending[i:i + BATCH_GROUP_SIZE]
+        update_job_result(job["id"], worker_id, stage="decode_once", progress=f"{len(done)}/{len(payload['input_paths'])}")
+        audios = {path: decode_audio(path) for path in group}
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            archives = {
+                path: pool.submit(encode_archive, audio, get_optimized_path(path, output_folder))
+                for path, audio in audios.items()
+            }
+            update_job_result(job["id"], worker_id, stage="batch_transcribe")
+            with stage_timer("stt_batch", job_id=job["id"]) as info:
+                results, stats = transcribe_batch(
+                    model, audios, batch_size=int(config.get("batch_size", 16)), beam_size=int(config.get("beam_size", 5))
+                )
+                info["audio_seconds"] = stats["audio_seconds"]
+
+            update_job_result(job["id"], worker_id, stage="archive")
+            for path in group:
+                full_text, segments_list = results[path]
+                archive_path = archives[path].result()
+                with stage_timer("db_write", job_id=job["id"]):
+                    _, transcript_id = save_transcript(
+                        archive_path, full_text, segments_list, hashes[path], duration=audios[path].size / SAMPLE_RATE
+                    )
+                keep_or_discard_input(path, not config.get("auto_delete", True))
+                done[path] = transcript_id
+                _index_transcript(transcript_id, config)
+            update_job_result(job["id"], worker_id, files=done)
+
+        for key in totals:
+            totals[key] += stats[key]
+        print(f"📦 [{worker_id}] Job #{job['id']} 배치 {len(group)}건: {stats['throughput']}x 실시간")
+
+    totals["throughput"] = round(totals["audio_seconds"] / totals["wall_seconds"], 2) if totals["wall_seconds"] else 0.0
+    return {"files": done, "stats": totals}
+
+JOB_HANDLERS = {
+    "analyze": run_analyze_job,
+    "analyze_batch": run_batch_job,
+}
+
+def _heartbeat(job_id, worker_id, stop_event):
+    while not stop_event.wait(LEASE_SECONDS / 3):
+        if not renew_lease(job_id, worker_id):
+            break
+
+def run_job(job, worker_id):
+    handler = JOB_HANDLERS.get(job["kind"])
+    if handler is None:
+        fail_job(job["id"], worker_id, f"알 수 없는 작업 종류: {job['kind']}")
+        return
+
+    stop_event = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job["id"], worker_id, stop_event), daemon=True)
+    heartbeat.start()
+    try:
+        with model_registry.hold():
+            result = handler(job, worker_id)
+        complete_job(job["id"], worker_id, **(result or {}))
+        print(f"✅ [{worker_id}] Job #{job['id']} 완료")
+    except Exception as e:
+        traceback.print_exc()
+        fail_job(job["id"], worker_id, e)
+        print(f"❌ [{worker_id}] Job #{job['id']} 실패 (시도 {job['attempts']}/{job['max_attempts']}): {e}")
+    finally:
+        stop_event.set()
+
+# --- 2. 워커 프로세스 풀 ---
+def worker_loop(index, preload=False):
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # fork로 물려받은 부모의 DB 커넥션은 사용하지 않음
+    engine.dispose(close=False)
+    init_db()
+    model_registry.set_owner(worker_id)
+    print(f"👷 Worker {worker_id} 시작")
+
+    if preload:
+        # 현재 설정의 모델을 미리 올리고 워밍업하여 첫 작업의 로딩 지연 제거
+        from config_service import get_settings
+        model_registry.preload([get_model_args(apply_profile(get_settings()))])
+
+    while True:
+        job = claim_job(worker_id)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        run_job(job, worker_id)
+
+def _spawn(index, preload=False):
+    # daemon=False: 장시간 STT 중에도 자식 프로세스 생성이 가능하도록
+    proc = multiprocessing.Process(target=worker_loop, args=(index, preload), name=f"memora-worker-{index}", daemon=False)
+    proc.start()
+    return proc
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoRa 백그라운드 작업 워커")
+    parser.add_argument(
+        "--workers", type=int,
+        default=int(os.getenv("MEMORA_WORKERS", max(1, (os.cpu_count() or 2) // 2))),
+        help="동시에 실행할 워커 프로세스 수",
+    )
+    parser.add_argument("--watch", action="store_true", help="감시 폴더에 들어온 오디오를 자동으로 작업 등록")
+    parser.add_argument(
+        "--preload", action="store_true", default=os.getenv("MEMORA_PRELOAD_MODEL", "False") == "True",
+        help="시작 시 현재 설정의 Whisper 모델을 미리 로드하고 워밍업",
+    )
+    args = parser.parse_args()
+
+    init_db()
+    # 긴 녹음 청크 병렬 변환이 호스트의 큐 워커 수에 맞게 프로세스 수를 나누도록 (services.transcribe_long_audio_stream)
+    os.environ["MEMORA_WORKERS"] = str(args.workers)
+    procs = {i: _spawn(i, args.preload) for i in range(args.workers)}
+    running = True
+
+    watcher = None
+    if args.watch:
+        from watcher import FolderWatcher
+        # 등록만 담당하고 실제 처리량은 워커 수(--workers)로 제한됨
+        watcher = FolderWatcher()
+        watcher.start()
+
+    # 대시보드의 큐 길이 추이용 샘플링
+    sampler_stop = threading.Event()
+    threading.Thread(target=sample_loop, args=(sampler_stop,), name="metrics-sampler", daemon=True).start()
+    # 디스크 사용률 기반 보존 정책 (오래된 임시 파일 정리, Opus 재인코딩, 정책에 따른 오디오 삭제)
+    threading.Thread(target=retention_loop, args=(sampler_stop,), name="retention", daemon=True).start()
+
+    def _shutdown(signum, frame):
+        nonlocal running
+        running = False
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    # 죽은 워커는 다시 띄움. 처리 중이던 작업은 lease 만료 후 다른 워커가 이어받음
+    while running:
+        for i, proc in list(procs.items()):
+            if not proc.is_alive():
+                print(f"⚠️ Worker {i} 종료됨 (exit={proc.exitcode}), 재시작합니다.")
+                procs[i] = _spawn(i, args.preload)
+        time.sleep(POLL_INTERVAL)
+
+    if watcher:
+        watcher.stop()
+    sampler_stop.set()
+    for proc in procs.values():
+        proc.terminate()
+    for proc in procs.values():
+        proc.join(timeout=10)
+
+if __name__ == "__main__":
+    main()